@@ -0,0 +1,153 @@
+"""Recall and latency of the IVF vector index against exact search, on synthetic embeddings.
+
+    python -m bench.ann --n 100000 --dim 768 --nprobe 1,4,8,16,32
+    python -m bench.ann --n 1000000 --dim 256 --queries 200 --dtype float16 --store /tmp/ann_store
+    python -m bench.ann --n 100000 --quantization none,int8,binary --nprobe 16
+    python -m bench.ann --n 1000000 --dim 256 --window 0.01
+
+Vectors are drawn around random cluster centres (like topical journal entries)
+so that the partitioning behaves as it would on real data. Queries are perturbed
+copies of held-out vectors. Recall@k is the share of the exact top-k found by
+the index. With --quantization, each code format is compared on recall, latency,
+and the memory of what is scanned (codes instead of floats). Build time includes k-means training. With --store the index is also
+written as a snapshot and reopened memory-mapped, to time a warm start. With
+--window, entries get consecutive hourly timestamps and each query is also run
+restricted to a random date range holding that share of the entries.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from services import embedding_store
+from services.search_filters import SearchFilter
+from services.vector_index import IVFIndex, normalize
+
+
+def synthetic(n: int, dim: int, clusters: int, spread: float, rng: np.random.Generator) -> np.ndarray:
+    centres = normalize(rng.standard_normal((clusters, dim), dtype=np.float32))
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        stop = min(n, start + 100000)
+        labels = rng.integers(0, clusters, stop - start)
+        noise = rng.standard_normal((stop - start, dim), dtype=np.float32) * (spread / np.sqrt(dim))
+        vectors[start:stop] = normalize(centres[labels] + noise)
+    return vectors
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q)) * 1000
+
+
+def _reopen(index: IVFIndex, store: str, query: np.ndarray, k: int) -> IVFIndex:
+    embedding_store.VECTOR_STORE_DIR = store
+    start = time.perf_counter()
+    arrays, meta = index.export()
+    meta["synced_until"] = "1970-01-01T00:00:00"
+    name = embedding_store.write_snapshot(arrays, meta)
+    written = time.perf_counter() - start
+    start = time.perf_counter()
+    reopened = IVFIndex.from_arrays(*embedding_store.open_snapshot(name))
+    reopened.search(query, k)
+    warm = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(store, name, f)) for f in os.listdir(os.path.join(store, name)))
+    print(f"snapshot {name}: {size / 2**20:.0f} MiB written in {written:.1f}s; "
+          f"reopened and first search in {warm * 1000:.1f}ms")
+    return reopened
+
+
+def run(n: int, dim: int, queries: int, k: int, nprobes: List[int], nlist: int, seed: int,
+        dtype: str = "float32", store: str = "", quantizations: Sequence[str] = ("none",),
+        window: float = 0.0) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    vectors = synthetic(n + queries, dim, clusters=max(16, n // 500), spread=1.0, rng=rng)
+    base, held_out = vectors[:n], vectors[n:]
+    query_vectors = normalize(held_out + rng.standard_normal(held_out.shape, dtype=np.float32) * (0.2 / np.sqrt(dim)))
+    ids = [str(i) for i in range(n)]
+
+    index = IVFIndex(dim, dtype)
+    start = time.perf_counter()
+    index.add(ids, base, [(i * 3600, []) for i in range(n)] if window else None)
+    added = time.perf_counter() - start
+    index.train(nlist or None)
+    built = time.perf_counter() - start
+    print(f"{n} vectors x {dim} dims: added in {added:.1f}s, trained {len(index.centroids)} lists in "
+          f"{built - added:.1f}s ({len(index) * dim * index.dtype.itemsize / 2**20:.0f} MiB of {dtype} vectors)")
+    if store:
+        index = _reopen(index, store, query_vectors[0], k)
+
+    exact, exact_times = [], []
+    for q in query_vectors:
+        t = time.perf_counter()
+        exact.append({item_id for item_id, _ in index.search_exact(q, k)})
+        exact_times.append(time.perf_counter() - t)
+    rows = [{"mode": "exact", "nprobe": "-", "recall": 1.0,
+             "p50_ms": _percentile(exact_times, 50), "p95_ms": _percentile(exact_times, 95),
+             "scan_mib": index.memory_bytes()["vectors"] / 2**20}]
+
+    for quantization in quantizations:
+        variant = index if quantization == index.quantization else IVFIndex.from_arrays(*index.export(), quantization)
+        memory = variant.memory_bytes()
+        scanned = memory["codes"] if quantization != "none" else memory["vectors"]
+        for nprobe in nprobes:
+            found, times = 0, []
+            for q, truth in zip(query_vectors, exact):
+                t = time.perf_counter()
+                hits = variant.search(q, k, nprobe)
+                times.append(time.perf_counter() - t)
+                found += len(truth & {item_id for item_id, _ in hits})
+            rows.append({"mode": f"ivf/{quantization}", "nprobe": nprobe, "recall": found / (k * len(query_vectors)),
+                         "p50_ms": _percentile(times, 50), "p95_ms": _percentile(times, 95),
+                         "scan_mib": scanned / 2**20})
+
+    if window:
+        epoch, span = datetime(1970, 1, 1), max(1, int(n * window))
+        filtered = []
+        for q in query_vectors:
+            first = int(rng.integers(0, n - span + 1))
+            filters = SearchFilter(since=epoch + timedelta(hours=first), until=epoch + timedelta(hours=first + span - 1))
+            scores = base[first:first + span] @ q
+            filtered.append((q, filters, {str(first + i) for i in np.argsort(-scores)[:k]}))
+        for nprobe in nprobes:
+            found, times = 0, []
+            for q, filters, truth in filtered:
+                t = time.perf_counter()
+                hits = index.search(q, k, nprobe, filters=filters)
+                times.append(time.perf_counter() - t)
+                found += len(truth & {item_id for item_id, _ in hits})
+            rows.append({"mode": f"window/{window:g}", "nprobe": nprobe, "recall": found / (k * len(filtered)),
+                         "p50_ms": _percentile(times, 50), "p95_ms": _percentile(times, 95),
+                         "scan_mib": span * dim * index.dtype.itemsize / 2**20})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IVF vector index against exact search")
+    parser.add_argument("--n", type=int, default=100000, help="indexed vectors (e.g. 100000 or 1000000)")
+    parser.add_argument("--dim", type=int, default=768, help="embedding dimensions")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32", help="comma separated probe counts")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists; 0 = 4*sqrt(n)")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--store", default="", help="directory to write a snapshot to and search it memory-mapped")
+    parser.add_argument("--quantization", default="none",
+                        help="comma separated index codes to compare: none,int8,binary (candidates re-ranked on floats)")
+    parser.add_argument("--window", type=float, default=0.0,
+                        help="also search restricted to a date range holding this share of entries (e.g. 0.01)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = run(args.n, args.dim, args.queries, args.k, [int(p) for p in args.nprobe.split(",")],
+               args.nlist, args.seed, args.dtype, args.store, args.quantization.split(","), args.window)
+    print(f"{'mode':<11} {'nprobe':>6} {f'recall@{args.k}':>10} {'p50 ms':>8} {'p95 ms':>8} {'scan MiB':>9}")
+    for row in rows:
+        print(f"{row['mode']:<11} {row['nprobe']:>6} {row['recall']:>10.3f} {row['p50_ms']:>8.2f} "
+              f"{row['p95_ms']:>8.2f} {row['scan_mib']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
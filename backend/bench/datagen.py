@@ -0,0 +1,185 @@
+"""Seeded synthetic journals, tasks and goals for benchmarks.
+
+Run from the backend directory against a scratch database:
+    DB_NAME=journal_bench python -m bench.datagen --scale 100k
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+from bench.fake_llm import fake_embedding
+from services.task_dates import day_key, parse_task_date
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+PEOPLE = ["Asha", "Ravi", "Meera", "Arjun", "Priya", "Kiran", "Neha", "Vikram", "Sara", "Dev"]
+PLACES = ["market", "office", "gym", "park", "library", "cafe", "temple", "beach", "college", "home"]
+ACTIONS = ["walked", "studied", "cooked", "met", "ran", "read", "painted", "coded", "shopped", "relaxed"]
+EMOTIONS = ["happy", "tired", "calm", "stressed", "excited", "grateful", "anxious", "proud"]
+MOODS = ["good", "neutral", "low", "great"]
+TAGS = ["work", "health", "family", "learning", "fun", "chores"]
+TASK_VERBS = ["finish", "submit", "call", "buy", "review", "practice", "clean", "plan", "write", "solve"]
+TASK_OBJECTS = ["report", "groceries", "assignment", "slides", "questions", "budget", "essay", "code", "room", "trip"]
+GOALS = [
+    ("Exercise 3x/week", "Go to the gym or run three times every week"),
+    ("Read more books", "Read for thirty minutes in the library or at home"),
+    ("Learn to cook", "Cook a new dish at home every weekend"),
+    ("Ship side project", "Code on the side project every evening"),
+    ("Stay in touch", "Call or meet family and friends regularly"),
+]
+
+# Entry texts are drawn from a bounded pool so embeddings can be computed once
+# per distinct text even at the 1M scale.
+TEXT_POOL_SIZE = 5000
+
+
+def _entry_text(rng: random.Random) -> Dict[str, Any]:
+    person, place, action, emotion = rng.choice(PEOPLE), rng.choice(PLACES), rng.choice(ACTIONS), rng.choice(EMOTIONS)
+    second_place, second_action = rng.choice(PLACES), rng.choice(ACTIONS)
+    text = (f"Today I {action} at the {place} with {person} and felt {emotion}. "
+            f"Later I {second_action} near the {second_place}.")
+    return {
+        "text": text,
+        "structured_events": {
+            "actions": [action, second_action],
+            "places": [place, second_place],
+            "people": [person],
+            "emotions": [emotion],
+        },
+    }
+
+
+def _text_pool(seed: int, dim: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(TEXT_POOL_SIZE):
+        item = _entry_text(rng)
+        item["embedding"] = fake_embedding(item["text"], dim, seed)
+        pool.append(item)
+    return pool
+
+
+def journal_entries(count: int, seed: int = 42, dim: int = 768, days: int = 730) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    pool = _text_pool(seed, dim)
+    start = datetime.now() - timedelta(days=days)
+    for i in range(count):
+        item = rng.choice(pool)
+        ts = start + timedelta(seconds=int(days * 86400 * i / max(count, 1)) + rng.randint(0, 3600))
+        yield {
+            "timestamp": ts,
+            "raw_text": item["text"],
+            "english_text": item["text"],
+            "structured_events": item["structured_events"],
+            "embedding_vector": item["embedding"],
+            "summary": None,
+            "tags": rng.sample(TAGS, 2),
+            "sentiment": None,
+            "mood": rng.choice(MOODS),
+            "goal_ids": [],
+            "day": ts.strftime("%Y-%m-%d"),
+        }
+
+
+def tasks(count: int, seed: int = 42, days: int = 730) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed + 1)
+    start = datetime.now() - timedelta(days=days)
+    for i in range(count):
+        scheduled = start + timedelta(days=int((days + 14) * i / max(count, 1)))
+        created = scheduled - timedelta(days=rng.randint(0, 3))
+        status = rng.choices(["completed", "pending", "in_progress", "cancelled"], [6, 3, 1, 0.5])[0]
+        quantitative = rng.random() < 0.15
+        total = rng.choice([20, 50, 100]) if quantitative else 0
+        yield {
+            "name": f"{rng.choice(TASK_VERBS)} {rng.choice(TASK_OBJECTS)}",
+            "description": None,
+            "raw_input": None,
+            "created_at": created,
+            "updated_at": created,
+            "scheduled_date": parse_task_date(scheduled.date()),
+            "scheduled_day": day_key(parse_task_date(scheduled.date())),
+            "scheduled_time": rng.choice([None, "09:00", "14:00", "18:30"]),
+            "due_date": None,
+            "completed_at": scheduled + timedelta(hours=rng.randint(1, 20)) if status == "completed" else None,
+            "status": status,
+            "priority": rng.choice(["low", "medium", "medium", "high", "urgent"]),
+            "recurrence": "none",
+            "is_quantitative": quantitative,
+            "quantitative_progress": {"total": total, "completed": rng.randint(0, total), "unit": "questions"} if quantitative else None,
+            "needs_clarification": False,
+            "extraction_confidence": round(rng.uniform(0.6, 1.0), 2),
+            "detected_keywords": [],
+            "tags": [],
+        }
+
+
+def goals(count: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed + 2)
+    now = datetime.utcnow()
+    for i in range(count):
+        title, description = GOALS[i % len(GOALS)]
+        yield {
+            "title": title if i < len(GOALS) else f"{title} #{i // len(GOALS) + 1}",
+            "description": description,
+            "start_date": now - timedelta(days=rng.randint(30, 365)),
+            "target_date": now + timedelta(days=rng.randint(30, 365)),
+            "status": rng.choice(["active", "active", "active", "paused", "completed"]),
+            "progress_total": 0,
+            "progress_count": 0,
+            "recent_progress": [],
+            "created_at": now - timedelta(days=rng.randint(30, 365)),
+        }
+
+
+async def _insert(collection, docs: Iterator[Dict[str, Any]], total: int, batch_size: int = 5000):
+    batch: List[Dict[str, Any]] = []
+    inserted = 0
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+            print(f"  {collection.name}: {inserted}/{total}")
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    print(f"  {collection.name}: {inserted}/{total} done")
+
+
+async def seed(scale: str = "1k", seed_value: int = 42, dim: int = 768, drop: bool = True) -> Dict[str, int]:
+    """Populate the configured database (DB_NAME) with data at the given scale."""
+    from database import db, journal_collection, tasks_collection, ensure_indexes
+
+    if db.name == "journal_db":
+        raise SystemExit("Refusing to seed the default journal_db; set DB_NAME to a scratch database")
+
+    count = SCALES[scale]
+    goal_count = max(len(GOALS), count // 10_000)
+    if drop:
+        for name in ("journal_entries", "tasks", "task_history", "goals", "goal_progress",
+                     "daily_summaries", "weekly_summaries", "monthly_summaries", "precomputed"):
+            await db[name].drop()
+
+    print(f"Seeding {db.name} at scale {scale} (seed={seed_value})")
+    await _insert(journal_collection, journal_entries(count, seed_value, dim), count)
+    await _insert(tasks_collection, tasks(count, seed_value), count)
+    await _insert(db["goals"], goals(goal_count, seed_value), goal_count)
+    await ensure_indexes()
+    return {"journal_entries": count, "tasks": count, "goals": goal_count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a benchmark database with synthetic data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dim", type=int, default=768, help="embedding dimensions")
+    parser.add_argument("--keep", action="store_true", help="append instead of dropping existing collections")
+    args = parser.parse_args()
+    asyncio.run(seed(args.scale, args.seed, args.dim, drop=not args.keep))
+
+
+if __name__ == "__main__":
+    main()
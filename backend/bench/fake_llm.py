@@ -0,0 +1,217 @@
+"""Deterministic stand-ins for the Gemini model and embedding API.
+
+Outputs depend only on the prompt (and seed), so two benchmark runs against the
+same data issue the same Mongo work. Latency is simulated with a blocking sleep,
+like the real synchronous SDK call it replaces.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FakeLLMConfig:
+    def __init__(self, latency_ms: float = 300.0, per_kchar_ms: float = 2.0, jitter_ms: float = 0.0,
+                 embed_latency_ms: float = 40.0, dim: int = 768, seed: int = 0):
+        self.latency_ms = latency_ms          # fixed cost per generate_content call
+        self.per_kchar_ms = per_kchar_ms      # extra cost per 1000 prompt characters
+        self.jitter_ms = jitter_ms            # deterministic +/- jitter derived from the prompt
+        self.embed_latency_ms = embed_latency_ms
+        self.dim = dim
+        self.seed = seed
+
+
+def _rng(text: str, seed: int) -> random.Random:
+    digest = hashlib.sha1(f"{seed}:{text}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+@lru_cache(maxsize=50000)
+def _word_vector(word: str, dim: int, seed: int) -> Tuple[float, ...]:
+    rng = _rng(word, seed)
+    return tuple(rng.gauss(0.0, 1.0) for _ in range(dim))
+
+
+def fake_embedding(text: str, dim: int = 768, seed: int = 0) -> List[float]:
+    """Unit-length pseudo-random vector; texts sharing words get correlated vectors."""
+    vec = [0.0] * dim
+    words = re.findall(r"[a-z]+", text.lower()) or [text]
+    for word in words:
+        for i, x in enumerate(_word_vector(word, dim, seed)):
+            vec[i] += x
+    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / norm for x in vec]
+
+
+class _UsageMetadata:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = max(1, len(prompt) // 4)
+        self.candidates_token_count = max(1, len(text) // 4)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, prompt: str, text: str):
+        self.text = text
+        self.usage_metadata = _UsageMetadata(prompt, text)
+
+
+def _quoted(prompt: str) -> str:
+    match = re.search(r'"([^"]+)"', prompt)
+    return match.group(1) if match else ""
+
+
+def _respond(prompt: str, rng: random.Random) -> str:
+    """Produce a plausible, well-formed answer for each prompt the services send."""
+    if "multilingual journal assistant" in prompt:
+        text = _quoted(prompt)
+        words = re.findall(r"[A-Za-z]+", text)
+        return json.dumps({
+            "language": "English",
+            "english_text": text,
+            "structured_events": {
+                "actions": [w.lower() for w in words[1:3]],
+                "places": [w for w in words if w[:1].isupper()][:1],
+                "people": [],
+                "emotions": [rng.choice(["happy", "tired", "calm", "stressed"])],
+            },
+        })
+
+    if "task extraction assistant" in prompt:
+        today = re.search(r"Today's date is (\d{4}-\d{2}-\d{2})", prompt)
+        text = _quoted(prompt)
+        parts = [p.strip() for p in re.split(r"\band\b|,", text) if p.strip()] or [text]
+        return json.dumps({
+            "tasks": [{
+                "name": part[:80],
+                "description": None,
+                "scheduled_date": today.group(1) if today else None,
+                "scheduled_time": None,
+                "due_date": None,
+                "priority": "medium",
+                "recurrence": "none",
+                "recurrence_details": None,
+                "is_quantitative": bool(re.search(r"\d+", part)),
+                "quantitative_total": int(re.search(r"\d+", part).group()) if re.search(r"\d+", part) else None,
+                "quantitative_unit": None,
+                "confidence": 0.9,
+                "detected_keywords": [],
+            } for part in parts],
+            "needs_clarification": False,
+            "clarification_question": None,
+            "overall_confidence": 0.9,
+        })
+
+    if "completion statement" in prompt:
+        said = set(re.findall(r"[a-z]{4,}", _quoted(prompt).lower()))
+        matched = [
+            task_id for task_id, name in re.findall(r"ID: (\S+), Name: ([^,]+),", prompt)
+            if said & set(re.findall(r"[a-z]{4,}", name.lower()))
+        ]
+        return json.dumps({
+            "matched_task_ids": matched,
+            "confidence": 0.9 if matched else 0.2,
+            "needs_clarification": not matched,
+            "clarification_question": None if matched else "Which task did you complete?",
+        })
+
+    if "updating progress" in prompt:
+        said = prompt.split("User said:", 1)[-1]
+        numbers = re.findall(r"\d+", said)
+        return json.dumps({
+            "amount_completed": int(numbers[0]) if numbers else 0,
+            "is_increment": True,
+            "confidence": 0.9,
+        })
+
+    if "Suggest breaking it" in prompt:
+        return json.dumps({
+            "should_break_down": True,
+            "reason": "Multi-step task",
+            "suggested_subtasks": [{"name": f"Step {i + 1}", "estimated_time": "30 mins"} for i in range(3)],
+        })
+
+    if "Analyze productivity patterns" in prompt:
+        return json.dumps({
+            "most_productive_day": rng.choice(["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]),
+            "completion_rate": round(rng.uniform(30, 90), 1),
+            "insights": ["You complete more tasks early in the week."],
+            "suggestions": ["Schedule demanding tasks on your most productive day."],
+        })
+
+    words = ["progress", "week", "friends", "work", "rest", "walk", "focus", "family", "learning", "calm"]
+    sentences = [" ".join(rng.choice(words) for _ in range(12)).capitalize() + "." for _ in range(4)]
+    return " ".join(sentences)
+
+
+class FakeModel:
+    """Drop-in for `genai.GenerativeModel` covering the calls the services make."""
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None, model_name: str = "fake-gemini"):
+        self.config = config or FakeLLMConfig()
+        self.model_name = model_name
+        self.calls = 0
+
+    def _latency_seconds(self, prompt: str, rng: random.Random) -> float:
+        ms = self.config.latency_ms + self.config.per_kchar_ms * len(prompt) / 1000.0
+        if self.config.jitter_ms:
+            ms += rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        return max(0.0, ms) / 1000.0
+
+    def generate_content(self, prompt: Any, **kwargs: Any) -> FakeResponse:
+        prompt = str(prompt)
+        rng = _rng(prompt, self.config.seed)
+        self.calls += 1
+        time.sleep(self._latency_seconds(prompt, rng))
+        return FakeResponse(prompt, _respond(prompt, rng))
+
+    async def generate_content_async(self, prompt: Any, **kwargs: Any) -> FakeResponse:
+        prompt = str(prompt)
+        rng = _rng(prompt, self.config.seed)
+        self.calls += 1
+        await asyncio.sleep(self._latency_seconds(prompt, rng))
+        return FakeResponse(prompt, _respond(prompt, rng))
+
+
+class FakeEmbedder:
+    """Drop-in for `genai.embed_content`."""
+
+    def __init__(self, config: Optional[FakeLLMConfig] = None):
+        self.config = config or FakeLLMConfig()
+        self.calls = 0
+
+    def __call__(self, model: str = None, content: str = "", task_type: str = None, **kwargs: Any) -> Dict[str, Any]:
+        self.calls += 1
+        time.sleep(self.config.embed_latency_ms / 1000.0)
+        return {"embedding": fake_embedding(str(content), self.config.dim, self.config.seed)}
+
+
+_originals: Dict[str, Any] = {}
+
+
+def install(config: Optional[FakeLLMConfig] = None) -> Dict[str, Any]:
+    """Serve every model tier from the fake model and swap the fake in for `genai.embed_content`."""
+    from services import gemini_service, metrics, model_tiers
+
+    config = config or FakeLLMConfig()
+    if not _originals:
+        _originals["embed_content"] = gemini_service.genai.embed_content
+    fakes = {"model": FakeModel(config), "embedder": FakeEmbedder(config)}
+    model_tiers.use_model(metrics.instrument_model(fakes["model"]))
+    gemini_service.genai.embed_content = fakes["embedder"]
+    return fakes
+
+
+def uninstall():
+    from services import gemini_service, model_tiers
+
+    if not _originals:
+        return
+    model_tiers.use_model(None)
+    gemini_service.genai.embed_content = _originals["embed_content"]
+    _originals.clear()
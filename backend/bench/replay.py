@@ -0,0 +1,109 @@
+"""Replay recorded production traffic against the current build, offline.
+
+Record on a live server with:
+    LLM_TRANSPORT=record LLM_CASSETTE=traffic.jsonl.gz uvicorn main:app
+then replay the HTTP requests in that cassette, serving every Gemini call from it:
+    DB_NAME=journal_bench python -m bench.replay traffic.jsonl.gz --speed 10 --latency-scale 1.0
+
+`--speed` compresses the recorded inter-arrival times (0 sends as fast as
+`--concurrency` allows). The report compares replayed latency with the latency
+recorded in production.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+
+def _endpoint(record: Dict[str, Any]) -> str:
+    return f"{record['method']} {record['path']}"
+
+
+async def replay(args) -> int:
+    # The transport is chosen at import time, so configure it before importing the app.
+    os.environ["LLM_TRANSPORT"] = "replay"
+    os.environ["LLM_CASSETTE"] = args.cassette
+    os.environ["LLM_REPLAY_LATENCY_SCALE"] = str(args.latency_scale)
+
+    from database import db
+    if db.name == "journal_db":
+        print("Refusing to replay against the default journal_db; set DB_NAME to a scratch database")
+        return 2
+
+    import httpx
+    from main import app
+    from services import llm_transport
+    from bench.run import summarize
+
+    records = [r for r in llm_transport.Cassette.read(args.cassette) if r.get("kind") == "http"]
+    records.sort(key=lambda r: r.get("at", 0))
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        print("No HTTP requests in cassette")
+        return 2
+
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    origin = records[0].get("at", 0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        wall_start = time.perf_counter()
+
+        async def send(record: Dict[str, Any]):
+            if args.speed > 0:
+                delay = (record.get("at", 0) - origin) / args.speed - (time.perf_counter() - wall_start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with semaphore:
+                url = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+                body = record.get("body")
+                start = time.perf_counter()
+                try:
+                    response = await client.request(
+                        record["method"], url, content=body.encode("utf-8") if body else None,
+                        headers={"content-type": "application/json"} if body else None,
+                    )
+                    failed = response.status_code >= 400
+                except Exception:
+                    failed = True
+                name = _endpoint(record)
+                latencies.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+                errors[name] = errors.get(name, 0) + (1 if failed else 0)
+
+        await asyncio.gather(*[send(r) for r in records])
+        wall = time.perf_counter() - wall_start
+
+    recorded: Dict[str, List[float]] = {}
+    for r in records:
+        recorded.setdefault(_endpoint(r), []).append(r.get("ms", 0.0))
+
+    print(f"Replayed {len(records)} requests in {wall:.1f}s ({len(records) / wall:.1f} req/s)")
+    stats = llm_transport.replay_stats()
+    print(f"LLM responses replayed: {stats['hits']}, misses (served by local fallbacks): {stats['misses']}\n")
+    print(f"{'endpoint':<36}{'n':>6}{'rec p50':>10}{'p50':>10}{'rec p95':>10}{'p95':>10}{'errors':>8}")
+    for name in sorted(latencies):
+        now = summarize(latencies[name], errors[name], wall, 0)
+        before = summarize(recorded[name], 0, wall, 0)
+        print(f"{name:<36}{now['requests']:>6}{before['p50_ms']:>10.1f}{now['p50_ms']:>10.1f}"
+              f"{before['p95_ms']:>10.1f}{now['p95_ms']:>10.1f}{now['errors']:>8}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded traffic cassette against the app")
+    parser.add_argument("cassette")
+    parser.add_argument("--speed", type=float, default=0.0, help="time compression factor; 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded LLM latency")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N requests")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(replay(args)))
+
+
+if __name__ == "__main__":
+    main()
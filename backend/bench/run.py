@@ -0,0 +1,224 @@
+"""Scenario benchmarks against the FastAPI app with Gemini replaced by deterministic fakes.
+
+Seed a scratch database first (see bench.datagen), then run from the backend directory:
+    DB_NAME=journal_bench python -m bench.run --scenarios search,timeline --requests 200
+    DB_NAME=journal_bench python -m bench.run --baseline bench/baseline.json --save-baseline
+
+Requests go through the ASGI app in-process (no network), so the numbers cover
+routing, services, MongoDB and the simulated LLM latency.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bench.datagen import ACTIONS, PEOPLE, PLACES, TASK_OBJECTS, TASK_VERBS
+from bench.fake_llm import FakeLLMConfig, install
+
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+def _journal(rng: random.Random) -> Request:
+    text = f"Today I {rng.choice(ACTIONS)} at the {rng.choice(PLACES)} with {rng.choice(PEOPLE)}."
+    return "POST", "/api/journal", {"raw_text": text}
+
+
+def _search(rng: random.Random) -> Request:
+    return "GET", f"/api/search?q={rng.choice(ACTIONS)}+{rng.choice(PLACES)}&k=5", None
+
+
+def _query(rng: random.Random) -> Request:
+    return "POST", "/api/query", {"question": f"When did I last go to the {rng.choice(PLACES)}?"}
+
+
+def _timeline(rng: random.Random) -> Request:
+    return "GET", "/api/timeline", None
+
+
+def _tasks_extract(rng: random.Random) -> Request:
+    text = (f"{rng.choice(TASK_VERBS)} the {rng.choice(TASK_OBJECTS)} today and "
+            f"{rng.choice(TASK_VERBS)} the {rng.choice(TASK_OBJECTS)} tomorrow")
+    return "POST", "/api/tasks/extract", {"text": text}
+
+
+def _tasks_complete(rng: random.Random) -> Request:
+    return "POST", "/api/tasks/complete", {"text": f"I finished the {rng.choice(TASK_OBJECTS)}"}
+
+
+def _tasks_insights(rng: random.Random) -> Request:
+    return "GET", f"/api/tasks/insights?days={rng.choice([7, 30, 90])}", None
+
+
+SCENARIOS: Dict[str, Callable[[random.Random], Request]] = {
+    "journal": _journal,
+    "search": _search,
+    "query": _query,
+    "timeline": _timeline,
+    "tasks_extract": _tasks_extract,
+    "tasks_complete": _tasks_complete,
+    "tasks_insights": _tasks_insights,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies_ms: List[float], errors: int, wall_seconds: float, llm_calls: int) -> Dict[str, Any]:
+    values = sorted(latencies_ms)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "mean_ms": round(sum(values) / count, 2) if count else 0.0,
+        "throughput_rps": round(count / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "llm_calls_per_request": round(llm_calls / count, 2) if count else 0.0,
+    }
+
+
+async def run_scenario(client, name: str, requests: int, concurrency: int, seed: int, fakes: Dict[str, Any]) -> Dict[str, Any]:
+    rng = random.Random(f"{seed}:{name}")
+    planned = [SCENARIOS[name](rng) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in planned:
+        queue.put_nowait(item)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                method, path, payload = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=payload)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    calls_before = fakes["model"].calls + fakes["embedder"].calls
+    wall_start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - wall_start
+    llm_calls = fakes["model"].calls + fakes["embedder"].calls - calls_before
+    return summarize(latencies, errors, wall, llm_calls)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print a per-scenario diff and return the list of regressions beyond `tolerance`."""
+    regressions = []
+    print(f"\n{'scenario':<16}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, stats in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            print(f"{name:<16}(no baseline)")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            old, new = base.get(metric, 0.0), stats.get(metric, 0.0)
+            change = (new - old) / old if old else 0.0
+            worse = change < -tolerance if metric == "throughput_rps" else change > tolerance
+            flag = "  REGRESSION" if worse else ""
+            print(f"{name:<16}{metric:<16}{old:>12.2f}{new:>12.2f}{change:>+9.1%}{flag}")
+            if worse:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+async def run(args) -> int:
+    from database import db
+
+    if db.name == "journal_db":
+        print("Refusing to benchmark against the default journal_db; set DB_NAME to a seeded scratch database")
+        return 2
+
+    import httpx
+    from main import app
+
+    fakes = install(FakeLLMConfig(
+        latency_ms=args.latency_ms, per_kchar_ms=args.per_kchar_ms, jitter_ms=args.jitter_ms,
+        embed_latency_ms=args.embed_latency_ms, dim=args.dim, seed=args.seed,
+    ))
+    names = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}")
+        return 2
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "db": db.name,
+            "journal_entries": await db["journal_entries"].estimated_document_count(),
+            "tasks": await db["tasks"].estimated_document_count(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "latency_ms": args.latency_ms,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in names:
+            stats = await run_scenario(client, name, args.requests, args.concurrency, args.seed, fakes)
+            results["scenarios"][name] = stats
+            print(f"{name:<16} p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+                  f"p99={stats['p99_ms']:.1f}ms {stats['throughput_rps']:.1f} req/s errors={stats['errors']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    regressions: List[str] = []
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run offline API benchmarks")
+    parser.add_argument("--scenarios", default="all", help=f"comma separated: {','.join(SCENARIOS)} or 'all'")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="simulated generate_content latency")
+    parser.add_argument("--per-kchar-ms", type=float, default=2.0, help="extra latency per 1000 prompt chars")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=40.0)
+    parser.add_argument("--dim", type=int, default=768, help="fake embedding dimensions (match datagen)")
+    parser.add_argument("--baseline", help="baseline JSON to diff against (or write with --save-baseline)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--output", help="write this run's results as JSON")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
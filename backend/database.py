@@ -1,13 +1,14 @@
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
+from services.metrics import MongoCommandListener
 
 load_dotenv()
 
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-DB_NAME = "journal_db"
+DB_NAME = os.getenv("DB_NAME", "journal_db")
 
-client = AsyncIOMotorClient(MONGODB_URI)
+client = AsyncIOMotorClient(MONGODB_URI, event_listeners=[MongoCommandListener()])
 db = client[DB_NAME]
 journal_collection = db["journal_entries"]
 tasks_collection = db["tasks"]
@@ -15,3 +16,29 @@ task_history_collection = db["task_history"]
 
 async def get_database():
     return db
+
+
+async def ensure_indexes():
+    """Create the indexes the query paths rely on (no-op when they already exist)."""
+    await journal_collection.create_index("timestamp")
+    await journal_collection.create_index("goal_ids")
+    await tasks_collection.create_index([("scheduled_day", 1), ("status", 1)])
+    await tasks_collection.create_index([("status", 1), ("scheduled_day", 1)])
+    # Keyset pagination: the list sort order, unfiltered and by status
+    await tasks_collection.create_index([("scheduled_date", 1), ("_id", 1)])
+    await tasks_collection.create_index([("status", 1), ("scheduled_date", 1), ("_id", 1)])
+    await tasks_collection.create_index([("is_overdue", 1), ("status", 1), ("scheduled_date", 1)])
+    await db["goals"].create_index([("created_at", -1), ("_id", -1)])
+    await db["goal_progress"].create_index([("goal_id", 1), ("month", 1), ("count", 1)])
+    await db["goal_progress"].create_index([("goal_id", 1), ("last_date", -1)])
+    await db["weekly_summaries"].create_index("week_start", unique=True)
+    await db["weekly_summaries"].create_index("dirty")
+    await db["monthly_summaries"].create_index("month", unique=True)
+    await db["monthly_summaries"].create_index("dirty")
+    await db["daily_summaries"].create_index("date", unique=True)
+    await db["precomputed"].create_index([("kind", 1), ("key", 1)], unique=True)
+    await db["slow_ops"].create_index("at", expireAfterSeconds=7 * 24 * 3600)
+    await db["slow_ops"].create_index([("kind", 1), ("duration_ms", -1)])
+    await db["entity_mentions"].create_index([("entity", 1), ("kind", 1), ("entry_id", 1)], unique=True)
+    await db["entity_mentions"].create_index([("entity", 1), ("timestamp", -1)])
+    await db["entity_mentions"].create_index([("kind", 1), ("entity", 1)])
@@ -1,13 +1,36 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from database import db, ensure_indexes
+    from services import metrics, profiling
+    from services.jobs import scheduler, register_jobs
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        print(f"Error creating indexes: {e}")
+    register_jobs(scheduler)
+    await scheduler.start()
+    background = [asyncio.create_task(metrics.monitor_event_loop())]
+    background += profiling.start(db[profiling.SLOW_OPS_COLLECTION])
+    yield
+    for task in background:
+        task.cancel()
+    await scheduler.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -16,20 +39,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Debug-Timing", "X-Trace-Id"],
 )
 
-from routes import journal, query, tools, goals, tasks
+from services import llm_transport, metrics, tracing
+
+app.middleware("http")(metrics.http_middleware)
+app.middleware("http")(tracing.http_middleware)
+
+if llm_transport.recording():
+    app.middleware("http")(llm_transport.record_http)
+
+from routes import journal, query, tools, goals, tasks, entities, dashboard
 
 app.include_router(journal.router, prefix="/api")
 app.include_router(query.router, prefix="/api")
 app.include_router(tools.router, prefix="/api")
 app.include_router(goals.router, prefix="/api")
 app.include_router(tasks.router, prefix="/api")
+app.include_router(entities.router, prefix="/api")
+app.include_router(dashboard.router, prefix="/api")
 
 @app.get("/")
 async def root():
     return {"message": "Journal Assistant API is running"}
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
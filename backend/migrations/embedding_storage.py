@@ -0,0 +1,34 @@
+"""Re-encode stored journal embeddings (list of doubles -> float32 or int8 binary, or back).
+
+Run from the backend directory:
+    python -m migrations.embedding_storage --to int8 --dry-run    # report only
+    python -m migrations.embedding_storage --to int8
+
+Set EMBEDDING_STORAGE to the same format so new entries are written that way.
+The nightly vector_index_rebuild job picks up the new encoding.
+"""
+import argparse
+import asyncio
+
+from services.quantization import STORAGE_FORMATS, migrate_storage
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Convert stored journal embeddings to another encoding")
+    parser.add_argument("--to", choices=STORAGE_FORMATS, required=True)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sample", type=int, default=5000, help="entries sampled for the recall estimate")
+    parser.add_argument("--dry-run", action="store_true", help="report sizes and recall without writing")
+    args = parser.parse_args()
+
+    result = await migrate_storage(args.to, args.batch_size, args.dry_run, args.sample)
+    before, after = result["bytes_before"], result["bytes_after"]
+    saved = 100 * (1 - after / before) if before else 0.0
+    recall = "n/a" if result["recall_at_10"] is None else f"{result['recall_at_10']:.3f}"
+    print(f"{'Would convert' if args.dry_run else 'Converted'} {result['converted']} entries to {args.to}: "
+          f"embeddings {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB ({saved:.0f}% saved), "
+          f"recall@10 {recall} on {result['recall_sample']} sampled entries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
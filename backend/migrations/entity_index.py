@@ -0,0 +1,17 @@
+"""Build the `entity_mentions` index from the structured events of existing journal entries.
+
+Run from the backend directory:
+    python -m migrations.entity_index
+"""
+import asyncio
+
+from services.entity_service import backfill
+
+
+async def main():
+    result = await backfill()
+    print(f"Done: indexed {result['mentions']} entity mentions across {result['entries']} entries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+"""Move embedded goal `progress` arrays into the bucketed `goal_progress` collection.
+
+Run from the backend directory:
+    python -m migrations.goal_progress
+"""
+import asyncio
+
+from services.goal_service import migrate_embedded_progress
+
+
+async def main():
+    result = await migrate_embedded_progress()
+    print(f"Done: migrated {result['records']} progress records across {result['goals']} goals")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+"""Convert task `scheduled_date` / `due_date` strings to UTC datetimes and add `scheduled_day`.
+
+Run from the backend directory:
+    python -m migrations.task_dates --dry-run
+    python -m migrations.task_dates
+"""
+import argparse
+import asyncio
+
+from database import tasks_collection
+from services.task_dates import migrate_task_dates
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Store task dates as UTC datetimes with a scheduled_day key")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    result = await migrate_task_dates(tasks_collection, args.batch_size, args.dry_run)
+    print(f"Done{' (dry run)' if result['dry_run'] else ''}: {result['converted']} of {result['scanned']} "
+          f"tasks {'would be ' if result['dry_run'] else ''}converted")
+    for fmt, count in sorted(result["formats"].items(), key=lambda item: -item[1]):
+        print(f"  {count:>8}  {fmt}")
+    if result["unparseable"]:
+        print(f"{len(result['unparseable'])} values could not be parsed and "
+              f"{'would be' if result['dry_run'] else 'were'} set to null (original kept in <field>_text):")
+        for item in result["unparseable"][:20]:
+            print(f"  {item['_id']} {item['field']}: {item['value']!r}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,7 +8,10 @@ class Goal(BaseModel):
     description: Optional[str] = None
     start_date: Optional[datetime] = Field(default_factory=datetime.utcnow)
     target_date: Optional[datetime] = None
-    progress: Optional[List[dict]] = None  # Each progress item: {date, note, amount}
+    progress: Optional[List[dict]] = None  # Legacy; progress now lives in the goal_progress collection
+    progress_total: Optional[float] = 0
+    progress_count: Optional[int] = 0
+    last_progress_at: Optional[datetime] = None
     status: Optional[str] = "active"  # active, paused, completed
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
@@ -0,0 +1,103 @@
+"""One round trip for the home page.
+
+GET /api/dashboard gathers the datasets the home page loads on open (recent
+journal entries and the first page of tasks) concurrently, and reports how
+long each section took. A section that fails is reported as an error without
+failing the rest.
+
+Other sections are built only when listed in ?sections=. "today" is today's
+tasks by status. "summary" and "insights" may call Gemini when nothing is
+precomputed, so clients request them separately, e.g. when their tab opens,
+rather than holding up the cheap sections. "today" and "summary" in one
+request share a single read of today's tasks.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+
+from routes import journal, tools
+from routes.tasks import (
+    task_service, summary_flight, insights_flight, _build_daily_summary, _build_insights, MAX_PAGE_SIZE
+)
+from services import tracing
+
+router = APIRouter()
+
+SECTIONS = ("journal", "tasks", "today", "summary", "insights", "timeline")
+# Only the cheap sections by default: LLM-backed ones and the full timeline are opt-in
+DEFAULT_SECTIONS = ("journal", "tasks")
+
+
+async def _timed(name: str, build: Callable[[], Awaitable[Any]], timings: Dict[str, float]) -> Any:
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"dashboard.{name}"):
+            return await build()
+    except Exception as e:
+        print(f"Dashboard section {name} failed: {e}")
+        return {"error": str(e)}
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+@router.get("/dashboard")
+async def dashboard(sections: Optional[str] = None, task_limit: int = 100, insight_days: int = 30):
+    """
+    Home page data in one response.
+    Query params: sections (comma-separated, default journal,tasks; also today,
+    summary, insights, timeline), task_limit, insight_days
+    """
+    wanted = [s.strip() for s in sections.split(",") if s.strip()] if sections else list(DEFAULT_SECTIONS)
+    unknown = [s for s in wanted if s not in SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+
+    now = datetime.now()
+    date_key = now.strftime("%Y-%m-%d")
+    start_date = now - timedelta(days=insight_days)
+    insights_key = f"{insight_days}:{date_key}"
+    timings: Dict[str, float] = {}
+
+    async def tasks_page():
+        tasks, next_cursor = await task_service.get_tasks_page(limit=max(1, min(task_limit, MAX_PAGE_SIZE)))
+        return {"tasks": tasks, "next_cursor": next_cursor}
+
+    today_read: Optional[asyncio.Task] = None
+
+    def today_tasks() -> Awaitable[list]:
+        """Today's tasks, read at most once per request however many sections need them."""
+        nonlocal today_read
+        if today_read is None:
+            today_read = asyncio.ensure_future(task_service.get_tasks_for_day(now))
+        return today_read
+
+    async def today():
+        tasks = await today_tasks()
+        by_status = {status: [t for t in tasks if t.get("status") == status]
+                     for status in ("pending", "in_progress", "completed")}
+        return {"date": date_key, "total": len(tasks), **by_status}
+
+    async def build_summary():
+        # Runs only for the flight's leader; callers joining an in-flight build read nothing
+        return await _build_daily_summary(now, await today_tasks())
+
+    builders = {
+        "journal": journal.get_journal_entries,
+        "tasks": tasks_page,
+        "today": today,
+        "summary": lambda: summary_flight.do(date_key, build_summary),
+        "insights": lambda: insights_flight.do(
+            insights_key, lambda: _build_insights(insight_days, start_date, now)
+        ),
+        "timeline": tools.timeline,
+    }
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_timed(name, builders[name], timings) for name in wanted))
+    timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+
+    payload = dict(zip(wanted, results))
+    payload["timings_ms"] = timings
+    return payload
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from services import entity_service
+
+router = APIRouter()
+
+KINDS = ("person", "place", "action", "emotion")
+
+
+def _check_kind(kind: Optional[str]):
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of: {', '.join(KINDS)}")
+
+
+@router.get("/entities")
+async def list_entities(kind: Optional[str] = None, limit: int = 50):
+    """Most mentioned people, places, actions and emotions."""
+    _check_kind(kind)
+    return {"entities": await entity_service.top_entities(kind, min(limit, 500))}
+
+
+@router.get("/entities/{name}/timeline")
+async def entity_timeline(name: str, kind: Optional[str] = None, limit: int = 100):
+    """Every journal entry mentioning `name`, newest first."""
+    _check_kind(kind)
+    result = await entity_service.entity_timeline(name, kind, min(limit, 1000))
+    if not result["count"]:
+        raise HTTPException(status_code=404, detail=f"No journal entries mention '{name}'")
+    return result
@@ -1,37 +1,56 @@
 from fastapi import APIRouter, HTTPException
 from models.goal import Goal
 from database import db
-from typing import List
+from services.goal_service import record_progress, get_progress_history, delete_progress
+from services import quantization
+from services.pagination import fetch_page
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 
 router = APIRouter()
 
+# Legacy progress arrays and goal embeddings are never shipped to clients
+GOAL_PROJECTION = {"progress": 0, "embedding_vector": 0, "embedding_text": 0}
+
+# Newest first; _id breaks ties so cursors are exact
+GOAL_SORT = [("created_at", -1), ("_id", -1)]
+MAX_PAGE_SIZE = 500
+
 @router.post("/goals")
 async def create_goal(goal: Goal):
     goals_collection = db["goals"]
     doc = goal.dict()
+    doc.pop("progress", None)
     doc["created_at"] = datetime.utcnow()
+    doc["progress_total"] = 0
+    doc["progress_count"] = 0
+    doc["recent_progress"] = []
     result = await goals_collection.insert_one(doc)
     doc["_id"] = str(result.inserted_id)
     return doc
 
 
 @router.get("/goals")
-async def list_goals():
+async def list_goals(limit: int = 100, cursor: Optional[str] = None):
+    """Goals, newest first; pass the previous response's next_cursor to get the following page."""
     goals_collection = db["goals"]
-    cursor = goals_collection.find().sort("created_at", -1)
-    items = await cursor.to_list(length=100)
+    try:
+        items, next_cursor = await fetch_page(
+            goals_collection, {}, GOAL_SORT, max(1, min(limit, MAX_PAGE_SIZE)), cursor, GOAL_PROJECTION
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     for g in items:
         if "_id" in g:
             g["_id"] = str(g["_id"])
-    return items
+    return {"goals": items, "next_cursor": next_cursor}
 
 
 @router.get("/goals/{goal_id}")
 async def get_goal(goal_id: str):
     goals_collection = db["goals"]
-    g = await goals_collection.find_one({"_id": ObjectId(goal_id)})
+    g = await goals_collection.find_one({"_id": ObjectId(goal_id)}, GOAL_PROJECTION)
     if not g:
         raise HTTPException(status_code=404, detail="Goal not found")
     g["_id"] = str(g["_id"])
@@ -41,11 +60,15 @@ async def get_goal(goal_id: str):
 @router.patch("/goals/{goal_id}")
 async def update_goal(goal_id: str, payload: dict):
     goals_collection = db["goals"]
+    # Progress counters are maintained by the progress endpoint only
+    for field in ("progress", "progress_total", "progress_count", "recent_progress", "last_progress_at",
+                  "embedding_vector", "embedding_text"):
+        payload.pop(field, None)
     payload["updated_at"] = datetime.utcnow()
     result = await goals_collection.update_one({"_id": ObjectId(goal_id)}, {"$set": payload})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Goal not found")
-    g = await goals_collection.find_one({"_id": ObjectId(goal_id)})
+    g = await goals_collection.find_one({"_id": ObjectId(goal_id)}, GOAL_PROJECTION)
     g["_id"] = str(g["_id"])
     return g
 
@@ -56,20 +79,37 @@ async def delete_goal(goal_id: str):
     result = await goals_collection.delete_one({"_id": ObjectId(goal_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Goal not found")
+    await delete_progress(goal_id)
     return {"deleted": True}
 
 
 @router.post("/goals/{goal_id}/progress")
 async def add_progress(goal_id: str, payload: dict):
     goals_collection = db["goals"]
-    entry = {
-        "date": datetime.utcnow().isoformat(),
-        "note": payload.get("note"),
-        "amount": payload.get("amount")
-    }
-    result = await goals_collection.update_one({"_id": ObjectId(goal_id)}, {"$push": {"progress": entry}, "$set": {"updated_at": datetime.utcnow()}})
-    if result.matched_count == 0:
+    found = await record_progress(goal_id, payload.get("note"), payload.get("amount"))
+    if not found:
         raise HTTPException(status_code=404, detail="Goal not found")
-    g = await goals_collection.find_one({"_id": ObjectId(goal_id)})
+    g = await goals_collection.find_one({"_id": ObjectId(goal_id)}, GOAL_PROJECTION)
     g["_id"] = str(g["_id"])
     return g
+
+
+@router.get("/goals/{goal_id}/progress")
+async def list_progress(goal_id: str, before: Optional[str] = None, limit: int = 20):
+    """Progress history, newest first. Pass the returned `next_before` to fetch older records."""
+    try:
+        before_dt = datetime.fromisoformat(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="before must be an ISO datetime")
+    return await get_progress_history(goal_id, before=before_dt, limit=min(max(limit, 1), 100))
+
+
+@router.get("/goals/{goal_id}/entries")
+async def list_goal_entries(goal_id: str, limit: int = 20):
+    """Journal entries automatically linked to this goal, newest first."""
+    journal_collection = db["journal_entries"]
+    cursor = journal_collection.find({"goal_ids": goal_id}, quantization.HIDE_EMBEDDINGS).sort("timestamp", -1)
+    entries = await cursor.to_list(length=min(max(limit, 1), 100))
+    for e in entries:
+        e["_id"] = str(e["_id"])
+    return {"goal_id": goal_id, "entries": entries}
@@ -2,6 +2,9 @@ from fastapi import APIRouter, HTTPException, Body
 from models.entry import JournalEntry
 from database import journal_collection
 from services.gemini_service import process_journal_entry, generate_embedding
+from services.rollup_service import mark_dirty
+from services import answer_cache, entity_service, lexical_index, quantization, vector_index
+from services.goal_service import match_goals, record_journal_progress
 from datetime import datetime
 
 router = APIRouter()
@@ -21,17 +24,31 @@ async def add_journal_entry(entry: JournalEntry):
     new_entry = entry.dict()
     new_entry['english_text'] = processed_data['english_text']
     new_entry['structured_events'] = processed_data['structured_events']
-    new_entry['embedding_vector'] = embedding
+    new_entry.pop('embedding_vector', None)
+    new_entry.update(quantization.encode_for_storage(embedding))
     new_entry['timestamp'] = datetime.now() # Ensure server-side timestamp
     
-    # 4. Save to MongoDB
+    # 4. Link to goals whose title/description is semantically close
+    goal_matches = await match_goals(embedding)
+    new_entry['goal_ids'] = [goal_id for goal_id, _ in goal_matches]
+    
+    # 5. Save to MongoDB
     result = await journal_collection.insert_one(new_entry)
+    vector_index.add_entry(str(result.inserted_id), embedding, new_entry)
+    lexical_index.add_entry(str(result.inserted_id), new_entry)
+    if goal_matches:
+        await record_journal_progress(str(result.inserted_id), new_entry, goal_matches)
+    await entity_service.index_entry(str(result.inserted_id), new_entry)
+    answer_cache.invalidate()
+    
+    # 6. Flag the week/month rollups that now need regenerating
+    await mark_dirty(new_entry['timestamp'])
     
     return new_entry
 
 @router.get("/journal")
 async def get_journal_entries():
-    cursor = journal_collection.find().sort("timestamp", -1).limit(20)
+    cursor = journal_collection.find({}, quantization.HIDE_EMBEDDINGS).sort("timestamp", -1).limit(20)
     entries = await cursor.to_list(length=20)
     # Convert ObjectId to string if needed, or Pydantic handles it if configured
     # But Pydantic V2 might need help with _id. 
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from models.entry import QueryRequest
 from database import journal_collection
-from services.gemini_service import answer_question, generate_embedding
+from services import answer_cache, entity_service, quantization
+from services.gemini_service import ANSWER_FALLBACK, answer_question, generate_embedding
 import google.generativeai as genai
 
 router = APIRouter()
@@ -9,6 +10,20 @@ router = APIRouter()
 @router.post("/query")
 async def ask_question(request: QueryRequest):
     question = request.question
+
+    # Simple factual questions ("when did I last see X") are answered from the entity index
+    factual = await entity_service.answer_factual(question)
+    if factual is not None:
+        return factual
+
+    # Same or near-identical question since the journal last changed: reuse its answer
+    signature = await answer_cache.journal_signature()
+    cached = answer_cache.get_exact(question, signature)
+    if cached is None:
+        embedding = await generate_embedding(question)
+        cached = answer_cache.get_similar(question, embedding, signature)
+    if cached is not None:
+        return {"answer": cached, "source": "answer_cache"}
     
     # 1. Generate embedding for the question
     # Note: For query, task_type should be retrieval_query
@@ -21,7 +36,7 @@ async def ask_question(request: QueryRequest):
     # This is safer for a local setup without complex vector DB config.
     
     # Fetch all entries
-    cursor = journal_collection.find().sort("timestamp", 1) # Chronological order is better for context
+    cursor = journal_collection.find({}, quantization.HIDE_EMBEDDINGS).sort("timestamp", 1) # Chronological order is better for context
     entries = await cursor.to_list(length=None)
     
     if not entries:
@@ -29,5 +44,7 @@ async def ask_question(request: QueryRequest):
     
     # 2. Ask Gemini
     answer = await answer_question(question, entries)
+    if answer and answer != ANSWER_FALLBACK:
+        answer_cache.put(question, embedding, answer, signature)
     
     return {"answer": answer}
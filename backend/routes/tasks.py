@@ -9,12 +9,21 @@ from services.task_ai_service import (
     suggest_task_breakdown, generate_daily_summary, analyze_productivity_patterns
 )
 from services.task_service import TaskService
+from services import task_dates
+from services.precompute_service import tasks_signature, get_precomputed, store_precomputed
+from services.singleflight import SingleFlight
 from datetime import datetime, timedelta
 from typing import List, Optional
 
 router = APIRouter()
 task_service = TaskService(tasks_collection, task_history_collection)
 
+# Concurrent requests for the same day's summary / the same insights window share one build
+summary_flight = SingleFlight("task_summary")
+insights_flight = SingleFlight("task_insights")
+
+MAX_PAGE_SIZE = 500
+
 
 @router.post("/tasks/extract")
 async def extract_tasks(task_input: TaskInput):
@@ -211,30 +220,43 @@ async def get_tasks(
     date: Optional[str] = None,
     status: Optional[str] = None,
     priority: Optional[str] = None,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None
 ):
     """
-    Get tasks with optional filtering.
-    Query params: date (YYYY-MM-DD), status, priority, limit
+    Get tasks with optional filtering, ordered by scheduled date.
+    Query params: date (YYYY-MM-DD), status, priority, limit, cursor
+    (pass the previous response's next_cursor to get the following page)
     """
     try:
         filters = {}
         
         if date:
-            filters['scheduled_date'] = date
+            day = task_dates.local_day(date)
+            if day is None:
+                raise HTTPException(status_code=400, detail=f"Unrecognised date: {date}")
+            filters['scheduled_day'] = day
         if status:
             filters['status'] = status
         if priority:
             filters['priority'] = priority
         
-        tasks = await task_service.get_tasks(filters, limit=limit)
+        try:
+            tasks, next_cursor = await task_service.get_tasks_page(
+                filters, limit=max(1, min(limit, MAX_PAGE_SIZE)), cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
             "count": len(tasks),
-            "tasks": tasks
+            "tasks": tasks,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching tasks: {str(e)}")
 
@@ -264,6 +286,37 @@ async def get_today_tasks():
         raise HTTPException(status_code=500, detail=f"Error fetching today's tasks: {str(e)}")
 
 
+async def _build_daily_summary(target_date: datetime, tasks: Optional[List[dict]] = None) -> dict:
+    # Get tasks for the day, unless the caller already read them
+    if tasks is None:
+        tasks = await task_service.get_tasks_for_day(target_date)
+    
+    # Reuse the precomputed summary unless the day's tasks changed since
+    date_key = target_date.strftime("%Y-%m-%d")
+    signature = tasks_signature(tasks)
+    summary_text = await get_precomputed("task_summary", date_key, signature)
+    if summary_text is None:
+        summary_text = await generate_daily_summary(tasks, target_date)
+        await store_precomputed("task_summary", date_key, signature, summary_text)
+    
+    # Calculate statistics
+    total = len(tasks)
+    completed = len([t for t in tasks if t['status'] == 'completed'])
+    
+    return {
+        "success": True,
+        "date": date_key,
+        "summary": summary_text,
+        "statistics": {
+            "total": total,
+            "completed": completed,
+            "pending": total - completed,
+            "completion_rate": (completed / total * 100) if total > 0 else 0
+        },
+        "tasks": tasks
+    }
+
+
 @router.get("/tasks/summary")
 async def get_daily_summary(date: Optional[str] = None):
     """
@@ -276,33 +329,41 @@ async def get_daily_summary(date: Optional[str] = None):
         else:
             target_date = datetime.now()
         
-        # Get tasks for the day
-        tasks = await task_service.get_tasks_for_day(target_date)
-        
-        # Generate summary using AI
-        summary_text = await generate_daily_summary(tasks, target_date)
-        
-        # Calculate statistics
-        total = len(tasks)
-        completed = len([t for t in tasks if t['status'] == 'completed'])
-        
-        return {
-            "success": True,
-            "date": target_date.strftime("%Y-%m-%d"),
-            "summary": summary_text,
-            "statistics": {
-                "total": total,
-                "completed": completed,
-                "pending": total - completed,
-                "completion_rate": (completed / total * 100) if total > 0 else 0
-            },
-            "tasks": tasks
-        }
+        date_key = target_date.strftime("%Y-%m-%d")
+        return await summary_flight.do(date_key, lambda: _build_daily_summary(target_date))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
 
 
+async def _build_insights(days: int, start_date: datetime, end_date: datetime) -> dict:
+    stats = await task_service.get_task_statistics(start_date, end_date)
+    
+    # Reuse precomputed insights unless the tasks in the window changed since
+    insights_key = f"{days}:{end_date.strftime('%Y-%m-%d')}"
+    signature = tasks_signature(stats['tasks'])
+    insights = await get_precomputed("task_insights", insights_key, signature)
+    if insights is None:
+        insights = await analyze_productivity_patterns(stats['tasks'])
+        await store_precomputed("task_insights", insights_key, signature, insights)
+    
+    return {
+        "success": True,
+        "period": {
+            "start": start_date.strftime("%Y-%m-%d"),
+            "end": end_date.strftime("%Y-%m-%d"),
+            "days": days
+        },
+        "statistics": {
+            "total_tasks": stats['total'],
+            "completed": stats['completed'],
+            "completion_rate": stats['completion_rate'],
+            "by_priority": stats['by_priority']
+        },
+        "insights": insights
+    }
+
+
 @router.get("/tasks/insights")
 async def get_productivity_insights(days: int = 30):
     """
@@ -313,26 +374,8 @@ async def get_productivity_insights(days: int = 30):
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        stats = await task_service.get_task_statistics(start_date, end_date)
-        
-        # Analyze patterns using AI
-        insights = await analyze_productivity_patterns(stats['tasks'])
-        
-        return {
-            "success": True,
-            "period": {
-                "start": start_date.strftime("%Y-%m-%d"),
-                "end": end_date.strftime("%Y-%m-%d"),
-                "days": days
-            },
-            "statistics": {
-                "total_tasks": stats['total'],
-                "completed": stats['completed'],
-                "completion_rate": stats['completion_rate'],
-                "by_priority": stats['by_priority']
-            },
-            "insights": insights
-        }
+        insights_key = f"{days}:{end_date.strftime('%Y-%m-%d')}"
+        return await insights_flight.do(insights_key, lambda: _build_insights(days, start_date, end_date))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating insights: {str(e)}")
@@ -1,45 +1,128 @@
-from fastapi import APIRouter, Query, Body
+from fastapi import APIRouter, Query, Body, HTTPException
 from services import gemini_service
-from services.analysis_service import search_by_embedding, generate_daily_summary_for_date, detect_habits, future_you_suggestions
+from services.analysis_service import search_by_embedding, search_lexical, search_hybrid, generate_daily_summary_for_date, detect_habits, future_you_suggestions
 from database import db
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from services.analysis_service import generate_story
+from services.analysis_service import generate_story, generate_story_hierarchical, STORY_DIRECT_LIMIT
+from services import llm_dispatcher, rollup_service, metrics, quantization
+from services.search_filters import SearchFilter
+from services.jobs import scheduler
 
 router = APIRouter()
 
 
 @router.get("/search")
-async def search(q: str = Query(..., description="Natural language query"), k: int = 5):
+async def search(q: str = Query(..., description="Natural language query"), k: int = 5,
+                 mode: str = Query("semantic", description="lexical | semantic | hybrid"),
+                 nprobe: Optional[int] = Query(None, ge=1, description="IVF lists scanned; higher is slower and more exact"),
+                 from_: Optional[str] = Query(None, alias="from", description="Only entries at or after this time"),
+                 to: Optional[str] = Query(None, description="Only entries at or before this time; a bare date covers the whole day"),
+                 tags: Optional[str] = Query(None, description="Comma-separated; entries with any of these tags"),
+                 mood: Optional[str] = Query(None, description="Comma-separated; entries with any of these moods"),
+                 goal_id: Optional[str] = Query(None, description="Only entries linked to this goal")):
+    if mode not in ("lexical", "semantic", "hybrid"):
+        raise HTTPException(status_code=400, detail="mode must be 'lexical', 'semantic' or 'hybrid'")
+    try:
+        since = _parse_range_bound(from_) if from_ else None
+        until = _parse_range_bound(to, end=True) if to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from/to must be ISO dates or datetimes")
+    filters = SearchFilter(
+        since=since, until=until,
+        tags=tags.split(",") if tags else None,
+        moods=mood.split(",") if mood else None,
+        goal_ids=[goal_id] if goal_id else None,
+    )
+    if mode == "lexical":
+        return {"mode": mode, "results": await search_lexical(q, top_k=k, filters=filters)}
     # 1. Generate embedding for query
     emb = await gemini_service.generate_embedding(q)
+    if mode == "hybrid":
+        return {"mode": mode, "results": await search_hybrid(q, emb, top_k=k, nprobe=nprobe, filters=filters)}
     if not emb:
-        return {"results": []}
-    results = await search_by_embedding(emb, top_k=k)
-    return {"results": results}
+        return {"mode": mode, "results": []}
+    results = await search_by_embedding(emb, top_k=k, nprobe=nprobe, filters=filters)
+    return {"mode": mode, "results": results}
 
 
 @router.post("/daily_summaries/generate")
+@llm_dispatcher.background
 async def generate_daily_summaries(days: int = Body(7, embed=True)):
+    """Return daily summaries, regenerating only days whose entries changed since the nightly job."""
     journal_collection = db["journal_entries"]
+    daily_collection = db["daily_summaries"]
     summaries = []
-    today = datetime.utcnow().date()
+    today = datetime.now().date()
     for d in range(days):
         day = today - timedelta(days=d)
         day_str = day.isoformat()
-        # find entries whose timestamp date matches
-        cursor = journal_collection.find({})
-        entries = await cursor.to_list(length=None)
-        entries_for_day = [e for e in entries if str(e.get("timestamp", "")).startswith(day_str)]
+        start = datetime.combine(day, datetime.min.time())
+        cursor = journal_collection.find(
+            {"timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}},
+            {"timestamp": 1, "english_text": 1, "raw_text": 1, "summary": 1}
+        )
+        entries_for_day = await cursor.to_list(length=None)
+        stored = await daily_collection.find_one({"date": day_str}, {"_id": 0})
+        reuse = bool(stored and stored.get("count") == len(entries_for_day) and (stored.get("summary") or not entries_for_day))
+        metrics.cache_lookup("daily_summary", hit=reuse)
+        if reuse:
+            summaries.append(stored)
+            continue
         summary = await generate_daily_summary_for_date(day_str, entries_for_day)
         summaries.append(summary)
     return {"summaries": summaries}
 
 
+@router.get("/jobs")
+async def list_jobs():
+    """Status of the background maintenance jobs (last run, next run, lease holder)."""
+    return {"jobs": await scheduler.status()}
+
+
+@router.post("/jobs/{name}/run")
+async def trigger_job(name: str):
+    if not await scheduler.run_now(name):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"scheduled": True}
+
+
+@router.post("/rollups/run")
+async def run_rollups(rebuild: bool = Body(False, embed=True)):
+    """Regenerate dirty weekly/monthly rollups now. `rebuild` marks every period dirty first."""
+    marked = await rollup_service.mark_all_dirty() if rebuild else 0
+    result = await rollup_service.run_rollups()
+    result["marked"] = marked
+    return result
+
+
+@router.get("/rollups")
+async def list_rollups(period: str = "week", start: str = None, end: str = None):
+    """Read precomputed summaries. period: week|month; start/end: YYYY-MM-DD or YYYY-MM bounds."""
+    if period not in ("week", "month"):
+        raise HTTPException(status_code=400, detail="period must be 'week' or 'month'")
+    collection, key = (db["weekly_summaries"], "week_start") if period == "week" else (db["monthly_summaries"], "month")
+    query: Dict[str, Any] = {"summary": {"$exists": True}}
+    if start:
+        query.setdefault(key, {})["$gte"] = start
+    if end:
+        query.setdefault(key, {})["$lte"] = end
+    cursor = collection.find(query, {"_id": 0, "dirty_at": 0}).sort(key, 1)
+    return {"period": period, "summaries": await cursor.to_list(length=None)}
+
+
+@router.get("/slow_ops")
+async def list_slow_ops(kind: str = None, limit: int = 50):
+    """Slowest recent MongoDB commands, Gemini calls and event-loop stalls. kind: mongo|llm|loop_stall"""
+    query = {"kind": kind} if kind else {}
+    cursor = db["slow_ops"].find(query, {"_id": 0}).sort("at", -1).limit(min(limit, 500))
+    return {"slow_ops": await cursor.to_list(length=None)}
+
+
 @router.get("/habits")
 async def habits():
     journal_collection = db["journal_entries"]
-    cursor = journal_collection.find()
+    cursor = journal_collection.find({}, quantization.HIDE_EMBEDDINGS)
     entries = await cursor.to_list(length=None)
     analysis = await detect_habits(entries)
     return analysis
@@ -53,7 +136,7 @@ async def future_suggestions(body: Dict[str, Any]):
     if not habits:
         # compute habits
         journal_collection = db["journal_entries"]
-        cursor = journal_collection.find()
+        cursor = journal_collection.find({}, quantization.HIDE_EMBEDDINGS)
         entries = await cursor.to_list(length=None)
         habits = await detect_habits(entries)
 
@@ -69,7 +152,7 @@ async def future_suggestions(body: Dict[str, Any]):
 @router.get("/timeline")
 async def timeline():
     journal_collection = db["journal_entries"]
-    cursor = journal_collection.find().sort("timestamp", 1)
+    cursor = journal_collection.find({}, quantization.HIDE_EMBEDDINGS).sort("timestamp", 1)
     entries = await cursor.to_list(length=None)
     # Group by date
     timeline: Dict[str, List[Dict[str, Any]]] = {}
@@ -80,28 +163,42 @@ async def timeline():
     return {"timeline": timeline}
 
 
+def _parse_range_bound(value: str, end: bool = False) -> datetime:
+    """Parse an ISO date/datetime; a bare end date covers the whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) <= 10:
+        parsed = parsed + timedelta(days=1) - timedelta(microseconds=1)
+    return parsed
+
+
 @router.post("/story")
+@llm_dispatcher.background
 async def story(body: Dict[str, Any]):
-    """Generate a story from journal entries. Optional body: {start_date, end_date, limit, title}"""
+    """Generate a story from journal entries. Optional body: {start_date, end_date, limit, title}
+
+    Ranges with more than `limit` entries are summarized hierarchically (week -> month -> story).
+    """
     start_date = body.get("start_date")
     end_date = body.get("end_date")
-    limit = int(body.get("limit", 200))
+    limit = int(body.get("limit", STORY_DIRECT_LIMIT))
     title = body.get("title")
 
+    query: Dict[str, Any] = {}
+    try:
+        if start_date:
+            query.setdefault("timestamp", {})["$gte"] = _parse_range_bound(start_date)
+        if end_date:
+            query.setdefault("timestamp", {})["$lte"] = _parse_range_bound(end_date, end=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date/end_date must be ISO dates (YYYY-MM-DD)")
+
     journal_collection = db["journal_entries"]
-    cursor = journal_collection.find().sort("timestamp", 1).limit(limit)
-    entries = await cursor.to_list(length=limit)
-
-    # Optionally filter by date strings if provided (simple ISO prefix match)
-    if start_date or end_date:
-        def in_range(e):
-            ts = str(e.get("timestamp", ""))
-            if start_date and ts < start_date:
-                return False
-            if end_date and ts > end_date:
-                return False
-            return True
-        entries = [e for e in entries if in_range(e)]
-
-    story_text = await generate_story(entries, title=title)
+    projection = {"timestamp": 1, "english_text": 1, "raw_text": 1, "summary": 1}
+    cursor = journal_collection.find(query, projection).sort("timestamp", 1)
+    entries = await cursor.to_list(length=None)
+
+    if len(entries) <= limit:
+        story_text = await generate_story(entries, title=title)
+    else:
+        story_text = await generate_story_hierarchical(entries, title=title)
     return {"story": story_text}
@@ -1,10 +1,23 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
+from datetime import datetime, date, timedelta
+import asyncio
 import math
-from services import gemini_service
+from bson import ObjectId
+from services import lexical_index, metrics, model_tiers, prompt_budget, quantization, vector_index
+from services.search_filters import SearchFilter
+from services.tracing import traced
 from database import db
 
+# Ranges with more entries than this are summarized week -> month -> story
+# instead of being sent to Gemini in a single prompt.
+STORY_DIRECT_LIMIT = 200
+# Maximum number of period summaries generated concurrently.
+STORY_CONCURRENCY = 4
+# Reciprocal-rank fusion constant: 1 / (RRF_K + rank) per ranking an entry appears in.
+RRF_K = 60
 
-def _cosine(a: List[float], b: List[float]) -> float:
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
     if not a or not b:
         return -1.0
     dot = sum(x * y for x, y in zip(a, b))
@@ -15,32 +28,62 @@ def _cosine(a: List[float], b: List[float]) -> float:
     return dot / (norm_a * norm_b)
 
 
-async def search_by_embedding(query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+async def _entries_for(hits: List[Tuple[str, float]]) -> List[Dict[str, Any]]:
+    """Journal entries for (id, score) hits, in hit order, each with its `score`."""
+    if not hits:
+        return []
     journal_collection = db["journal_entries"]
-    cursor = journal_collection.find({"embedding_vector": {"$exists": True}})
-    entries = await cursor.to_list(length=None)
-
-    scored: List[Tuple[float, Dict[str, Any]]] = []
-    for e in entries:
-        vec = e.get("embedding_vector")
-        score = _cosine(query_embedding, vec) if vec else -1.0
-        scored.append((score, e))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = [item[1] for item in scored[:top_k]]
-    for entry in top:
-        if "_id" in entry:
-            entry["_id"] = str(entry["_id"])
+    cursor = journal_collection.find({"_id": {"$in": [ObjectId(entry_id) for entry_id, _ in hits]}},
+                                     quantization.HIDE_EMBEDDINGS)
+    by_id = {str(e["_id"]): e async for e in cursor}
+    top = []
+    for entry_id, score in hits:
+        entry = by_id.get(entry_id)
+        if entry is not None:
+            entry["_id"] = entry_id
+            entry["score"] = score
+            top.append(entry)
     return top
 
 
+def reciprocal_rank_fusion(rankings: List[List[Tuple[str, float]]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, (entry_id, _) in enumerate(ranking, start=1):
+            fused[entry_id] = fused.get(entry_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+@traced
+async def search_by_embedding(query_embedding: List[float], top_k: int = 5, nprobe: Optional[int] = None,
+                              filters: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+    """Entries nearest to `query_embedding`, best first, each with its cosine `score`."""
+    return await _entries_for(await vector_index.search(query_embedding, top_k, nprobe, filters))
+
+
+@traced
+async def search_lexical(query: str, top_k: int = 5, filters: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+    """Entries ranked by BM25 over their text and entities; no remote calls."""
+    return await _entries_for(await lexical_index.search(query, top_k, filters))
+
+
+@traced
+async def search_hybrid(query: str, query_embedding: Optional[List[float]], top_k: int = 5,
+                        nprobe: Optional[int] = None, filters: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+    """BM25 and embedding rankings fused by reciprocal rank; lexical only if there is no embedding."""
+    depth = max(top_k * 4, 20)
+    lexical = await lexical_index.search(query, depth, filters)
+    semantic = await vector_index.search(query_embedding, depth, nprobe, filters) if query_embedding else []
+    return await _entries_for(reciprocal_rank_fusion([lexical, semantic])[:top_k])
+
+
+@metrics.llm_site
 async def generate_daily_summary_for_date(date_str: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Generate a daily summary for a given date (YYYY-MM-DD) and store in DB."""
     if not entries:
         return {"date": date_str, "summary": "", "count": 0}
 
-    combined = "\n\n".join([f"- {e.get('english_text') or e.get('raw_text')}" for e in entries])
-    prompt = f"""
+    prompt = prompt_budget.build_prompt(lambda combined: f"""
     You are a personal journaling assistant. Produce a concise daily summary for the date {date_str}.
     Use the following entries as context and produce:
     1) A one-line headline
@@ -49,12 +92,12 @@ async def generate_daily_summary_for_date(date_str: str, entries: List[Dict[str,
 
     Context entries:
     {combined}
-    """
+    """, entries, prompt_budget.DAY_ENTRY_LEVELS)
 
     try:
-        response = gemini_service.model.generate_content(prompt)
-        text = response.text
+        text = await model_tiers.generate(prompt)
     except Exception as e:
+        metrics.record_fallback()
         text = ""
 
     summary_doc = {"date": date_str, "summary": text, "count": len(entries)}
@@ -100,6 +143,7 @@ async def detect_habits(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {"top_actions": top_actions, "top_places": top_places}
 
 
+@metrics.llm_site
 async def future_you_suggestions(habits: Dict[str, Any], goals: List[Dict[str, Any]]) -> str:
     """Generate personalized suggestions using Gemini given habits and goals."""
     prompt = f"""
@@ -112,22 +156,15 @@ async def future_you_suggestions(habits: Dict[str, Any], goals: List[Dict[str, A
     Provide 5 concise, prioritized suggestions that 'Future You' would appreciate to improve progress toward goals and wellbeing.
     """
     try:
-        response = gemini_service.model.generate_content(prompt)
-        return response.text
+        return await model_tiers.generate(prompt)
     except Exception as e:
+        metrics.record_fallback()
         return ""
 
 
-async def generate_story(entries: List[Dict[str, Any]], title: str = None) -> str:
-    """Generate a narrative/story that threads the provided entries into a readable story."""
-    if not entries:
-        return ""
-
-    # Build a compact context
-    context = "\n\n".join([f"Date: {e.get('timestamp')}\nEntry: {e.get('english_text') or e.get('raw_text')}" for e in entries])
-
-    prompt = f"""
-    You are a creative assistant. Given the following journal entries, weave them into a coherent, human-readable narrative story.
+def _story_prompt(context: str, title: Optional[str], source: str = "journal entries") -> str:
+    return f"""
+    You are a creative assistant. Given the following {source}, weave them into a coherent, human-readable narrative story.
     If a title is provided, incorporate it as the story title; otherwise, produce a fitting headline.
 
     Instructions:
@@ -141,9 +178,184 @@ async def generate_story(entries: List[Dict[str, Any]], title: str = None) -> st
     {context}
     """
 
+
+@metrics.llm_site
+async def generate_story(entries: List[Dict[str, Any]], title: str = None) -> str:
+    """Generate a narrative/story that threads the provided entries into a readable story."""
+    if not entries:
+        return ""
+
+    # Build a compact context; over budget, keep entries spread across the whole range
+    prompt = prompt_budget.build_prompt(
+        lambda context: _story_prompt(context, title), entries, prompt_budget.ENTRY_LEVELS, keep="spread"
+    )
+
+    try:
+        return await model_tiers.generate(prompt)
+    except Exception as e:
+        print(f"Error generating story: {e}")
+        metrics.record_fallback()
+        return ""
+
+
+def entry_date(entry: Dict[str, Any]) -> Optional[date]:
+    ts = entry.get("timestamp")
+    if isinstance(ts, datetime):
+        return ts.date()
+    try:
+        return datetime.fromisoformat(str(ts)).date()
+    except ValueError:
+        return None
+
+
+def week_start_of(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def month_of_week(week_key: str) -> str:
+    """Weeks belong to the month their Monday falls in, for both stories and rollups."""
+    return week_key[:7]
+
+
+async def _generate_text(prompt: str, semaphore: asyncio.Semaphore) -> str:
+    """Generate one period summary; the semaphore caps how many periods summarize at once."""
+    async with semaphore:
+        try:
+            return await model_tiers.generate(prompt)
+        except Exception as e:
+            print(f"Error generating period summary: {e}")
+            metrics.record_fallback()
+            return ""
+
+
+@metrics.llm_site
+async def summarize_week(week_start: date, entries: List[Dict[str, Any]], daily: Dict[str, Dict[str, Any]],
+                         cached: Optional[Dict[str, Any]], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Summarize one week, reusing a cached summary or stored daily summaries where they are current."""
+    week_key = week_start.isoformat()
+    last_ts = max(str(e.get("timestamp")) for e in entries)
+    if cached and cached.get("count") == len(entries) and cached.get("last_timestamp") == last_ts and cached.get("summary"):
+        metrics.cache_lookup("weekly_summary", hit=True)
+        return {"week_start": week_key, "summary": cached["summary"]}
+    metrics.cache_lookup("weekly_summary", hit=False)
+
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for e in entries:
+        by_day.setdefault(entry_date(e).isoformat(), []).append(e)
+
+    parts = []
+    for day_str in sorted(by_day):
+        day_entries = by_day[day_str]
+        stored = daily.get(day_str)
+        # A daily summary is only trusted if it was built from the same number of entries.
+        reuse = bool(stored and stored.get("summary") and stored.get("count") == len(day_entries))
+        metrics.cache_lookup("daily_summary", hit=reuse)
+        if reuse:
+            parts.append(f"{day_str} (summary): {stored['summary']}")
+        else:
+            parts.extend(f"{day_str}: {e.get('english_text') or e.get('raw_text')}" for e in day_entries)
+
+    context = "\n".join(parts)
+    prompt = f"""
+    You are a personal journaling assistant. Summarize the week starting {week_key} in one short paragraph (3-5 sentences).
+    Keep concrete people, places and events, and note the overall mood.
+
+    Journal context:
+    {context}
+    """
+    text = await _generate_text(prompt, semaphore)
+    if text:
+        await db["weekly_summaries"].update_one(
+            {"week_start": week_key},
+            {"$set": {"week_start": week_key, "summary": text, "count": len(entries), "last_timestamp": last_ts,
+                      "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    return {"week_start": week_key, "summary": text}
+
+
+@metrics.llm_site
+async def summarize_month(month_key: str, weeks: List[Dict[str, Any]], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    context = "\n".join(f"Week of {w['week_start']}: {w['summary']}" for w in weeks)
+    prompt = f"""
+    You are a personal journaling assistant. Combine these weekly summaries into one summary of {month_key} (one paragraph, 4-6 sentences).
+    Highlight recurring themes, changes over the month and the most meaningful moments.
+
+    Weekly summaries:
+    {context}
+    """
+    return {"month": month_key, "summary": await _generate_text(prompt, semaphore)}
+
+
+@metrics.llm_site
+async def generate_story_hierarchical(entries: List[Dict[str, Any]], title: str = None) -> str:
+    """Map-reduce story generation for long ranges: weekly summaries -> monthly summaries -> story.
+
+    Each level keeps the prompt size bounded regardless of how many entries the range holds,
+    and the summaries within a level are generated concurrently.
+    """
+    if not entries:
+        return ""
+
+    weeks: Dict[date, List[Dict[str, Any]]] = {}
+    for e in entries:
+        d = entry_date(e)
+        if d is None:
+            continue
+        weeks.setdefault(week_start_of(d), []).append(e)
+    if not weeks:
+        return ""
+
+    months: Dict[str, List[date]] = {}
+    for w in sorted(weeks):
+        months.setdefault(month_of_week(w.isoformat()), []).append(w)
+
+    # Monthly rollups are reused when they were built from exactly the entries in range.
+    month_docs = await db["monthly_summaries"].find(
+        {"month": {"$in": list(months)}, "dirty": {"$ne": True}}
+    ).to_list(length=None)
+    reusable = {
+        m["month"]: m["summary"] for m in month_docs
+        if m.get("summary") and m.get("count") == sum(len(weeks[w]) for w in months[m["month"]])
+    }
+    for m in months:
+        metrics.cache_lookup("monthly_summary", hit=m in reusable)
+    pending_weeks = [w for m, ws in months.items() if m not in reusable for w in ws]
+
+    week_keys = [w.isoformat() for w in pending_weeks]
+    cached_docs = await db["weekly_summaries"].find({"week_start": {"$in": week_keys}}).to_list(length=None)
+    cached = {c["week_start"]: c for c in cached_docs}
+    day_keys = sorted({entry_date(e).isoformat() for w in pending_weeks for e in weeks[w]})
+    daily_docs = await db["daily_summaries"].find({"date": {"$in": day_keys}}).to_list(length=None)
+    daily = {d["date"]: d for d in daily_docs}
+
+    semaphore = asyncio.Semaphore(STORY_CONCURRENCY)
+    week_summaries = await asyncio.gather(*[
+        summarize_week(w, weeks[w], daily, cached.get(w.isoformat()), semaphore) for w in pending_weeks
+    ])
+    week_summaries = [w for w in week_summaries if w["summary"]]
+
+    weeks_by_month: Dict[str, List[Dict[str, Any]]] = {}
+    for w in week_summaries:
+        weeks_by_month.setdefault(month_of_week(w["week_start"]), []).append(w)
+
+    if len(months) == 1 and weeks_by_month:
+        context = "\n\n".join(f"Week of {w['week_start']}:\n{w['summary']}" for w in week_summaries)
+        source = "weekly summaries of journal entries"
+    else:
+        month_summaries = await asyncio.gather(*[
+            summarize_month(m, weeks_by_month[m], semaphore) for m in sorted(weeks_by_month)
+        ])
+        month_text = dict(reusable)
+        month_text.update({m["month"]: m["summary"] for m in month_summaries if m["summary"]})
+        context = "\n\n".join(f"Month {m}:\n{month_text[m]}" for m in sorted(month_text))
+        source = "monthly summaries of journal entries"
+    if not context:
+        return ""
+
     try:
-        response = gemini_service.model.generate_content(prompt)
-        return response.text
+        return await model_tiers.generate(_story_prompt(context, title, source))
     except Exception as e:
         print(f"Error generating story: {e}")
+        metrics.record_fallback()
         return ""
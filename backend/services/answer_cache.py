@@ -0,0 +1,181 @@
+"""Semantic cache of /api/query answers.
+
+/api/query answers from the whole journal, so an answer stays valid until the
+journal changes, or until the day changes for questions like "what did I do
+today". Each cached answer keeps the question's embedding, its period key and
+the journal signature (entry count, newest entry id and local date) it was
+computed from. A later question is served from the cache if it is the same
+text, or if its embedding is within ANSWER_CACHE_SIMILARITY of a cached
+question with the same period key, and the journal signature still matches.
+Answers computed from an older signature are dropped.
+
+The period key is the date range the question's relative dates refer to on the
+current day: "last week" and "this past week" both resolve to the last seven
+days and can share an answer, while "today" and "yesterday" resolve to
+different days and never do, however close their embeddings are.
+
+The cache is per worker and bounded to ANSWER_CACHE_SIZE questions, evicting
+the least recently used. Saving a journal entry clears this worker's cache at
+once; other workers see the new signature on their next lookup.
+"""
+import os
+import re
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database import journal_collection
+from services import metrics
+from services.tracing import traced
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACE = re.compile(r"\s+")
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_UNITS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+# Relative-date phrases, each resolved to a (start, end) range of days for `today`.
+# Tried in order; the longer phrasings come first.
+_PERIODS: List[Tuple["re.Pattern", Callable[["re.Match", date], Tuple[date, date]]]] = [
+    (re.compile(r"\b(?:last|past|previous) (\d+) (day|week|month|year)s?\b"),
+     lambda m, today: (today - timedelta(days=int(m[1]) * _UNITS[m[2]]), today)),
+    (re.compile(r"\b(\d+) (day|week)s? ago\b"),
+     lambda m, today: (today - timedelta(days=int(m[1]) * _UNITS[m[2]]),) * 2),
+    (re.compile(r"\b(?:this past|the past|past|last) (week|month|year)\b"),
+     lambda m, today: (today - timedelta(days=_UNITS[m[1]]), today)),
+    (re.compile(r"\bthis week(?:end)?\b"),
+     lambda m, today: (today - timedelta(days=today.weekday()), today)),
+    (re.compile(r"\bthis month\b"), lambda m, today: (today.replace(day=1), today)),
+    (re.compile(r"\bthis year\b"), lambda m, today: (today.replace(month=1, day=1), today)),
+    (re.compile(r"\b(?:yesterday|last night)\b"), lambda m, today: (today - timedelta(days=1),) * 2),
+    (re.compile(r"\btomorrow\b"), lambda m, today: (today + timedelta(days=1),) * 2),
+    (re.compile(r"\b(?:today|tonight|this (?:morning|afternoon|evening))\b"), lambda m, today: (today, today)),
+    (re.compile(r"\b(?:last |on )?(" + "|".join(_WEEKDAYS) + r")\b"),
+     lambda m, today: (today - timedelta(days=(today.weekday() - _WEEKDAYS.index(m[1])) % 7),) * 2),
+    (re.compile(r"\b(?:lately|recently|these days|currently|now)\b"),
+     lambda m, today: (today - timedelta(days=14), today)),
+]
+
+
+def question_key(question: str) -> str:
+    return _SPACE.sub(" ", _PUNCTUATION.sub(" ", question.lower())).strip()
+
+
+def period_key(question: str, today: Optional[date] = None) -> str:
+    """The date ranges a question's relative dates refer to, e.g. "2025-12-13..2025-12-20"; "" if none."""
+    today = today or datetime.now().date()
+    text = question_key(question)
+    periods = set()
+    for pattern, resolve in _PERIODS:
+        for match in pattern.finditer(text):
+            start, end = resolve(match, today)
+            periods.add(f"{start.isoformat()}..{end.isoformat()}")
+        text = pattern.sub(" ", text)     # "last 3 weeks" must not also count as "last week"
+    return ",".join(sorted(periods))
+
+
+class AnswerCache:
+    """LRU of question -> (unit embedding or None, answer, journal signature, period key)."""
+
+    def __init__(self, size: int = ANSWER_CACHE_SIZE, threshold: float = ANSWER_CACHE_SIMILARITY):
+        self.size = size
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, Tuple[Optional[np.ndarray], str, str, str]]" = OrderedDict()
+        # stacked embeddings and their period keys, rebuilt on change
+        self._matrix: Optional[Tuple[List[str], np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._matrix = None
+
+    def _drop_stale(self, signature: str):
+        stale = [key for key, entry in self._entries.items() if entry[2] != signature]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            self._matrix = None
+
+    def get_exact(self, question: str, signature: str) -> Optional[str]:
+        self._drop_stale(signature)
+        key = question_key(question)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get_similar(self, embedding: Sequence[float], signature: str, period: str = "") -> Optional[str]:
+        """Answer of the closest cached question about the same period, if at least `threshold` similar."""
+        self._drop_stale(signature)
+        if self._matrix is None:
+            keys = [key for key, entry in self._entries.items() if entry[0] is not None]
+            vectors = [self._entries[key][0] for key in keys]
+            periods = np.array([self._entries[key][3] for key in keys], dtype=object)
+            self._matrix = (keys, np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32), periods)
+        keys, matrix, periods = self._matrix
+        query = _unit(embedding)
+        if not keys or query is None or matrix.shape[1] != len(query):
+            return None
+        scores = np.where(periods == period, matrix @ query, -np.inf)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]][1]
+
+    def put(self, question: str, embedding: Optional[Sequence[float]], answer: str, signature: str):
+        key = question_key(question)
+        self._entries[key] = (_unit(embedding), answer, signature, period_key(question))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+
+def _unit(embedding: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+    if embedding is None or len(embedding) == 0:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+_cache = AnswerCache()
+
+
+@traced
+async def journal_signature() -> str:
+    """Changes whenever an entry is added or removed, and at local midnight."""
+    count = await journal_collection.estimated_document_count()
+    newest = await journal_collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return f"{count}:{newest['_id'] if newest else ''}:{datetime.now().strftime('%Y-%m-%d')}"
+
+
+def get_exact(question: str, signature: str) -> Optional[str]:
+    answer = _cache.get_exact(question, signature)
+    if answer is not None:
+        metrics.cache_lookup("answer", hit=True)
+    return answer
+
+
+def get_similar(question: str, embedding: Sequence[float], signature: str) -> Optional[str]:
+    """Answer of a near-identical cached question whose relative dates cover the same period."""
+    answer = _cache.get_similar(embedding, signature, period_key(question))
+    metrics.cache_lookup("answer", hit=answer is not None)
+    return answer
+
+
+def put(question: str, embedding: Optional[Sequence[float]], answer: str, signature: str):
+    _cache.put(question, embedding, answer, signature)
+
+
+def invalidate():
+    """Forget every cached answer in this worker (a journal entry was saved)."""
+    _cache.clear()
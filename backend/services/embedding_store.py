@@ -0,0 +1,174 @@
+"""On-disk snapshots of the vector index, memory-mapped by every worker.
+
+    <VECTOR_STORE_DIR>/
+        CURRENT                          name of the live snapshot
+        snapshot-20240501T031500-a1b2c3/
+            meta.json                    dim, dtype, rows, synced_until, trained_size
+            vectors.npy                  normalised vectors (float32, or float16 to halve memory)
+            ids.npy                      entry id of each row
+            ids_sorted.npy ids_order.npy ids in sorted order, for lookups without a dict
+            timestamps.npy               entry timestamp of each row (search filters)
+            labels.npy label_rows.npy label_bounds.npy   rows carrying each tag/mood/goal label
+            codes.npy scales.npy         int8 or sign-bit codes (ANN_QUANTIZATION only)
+            centroids.npy assign.npy     IVF centroids and the list of each row (trained only)
+            cell_order.npy cell_bounds.npy   rows grouped by list
+            wal.log                      entries added since the snapshot was written
+
+Arrays are opened with mmap_mode="r", so opening a snapshot costs milliseconds
+whatever its size. Pages come from the OS page cache and are shared by all
+workers on the host, not copied into each process. Snapshots are written to a
+temporary directory and renamed into place, then CURRENT is replaced
+atomically; readers never see a half-written snapshot.
+
+The write-ahead log holds fixed-size records, each appended with a single
+O_APPEND write, so workers can share it. An added entry's record is followed
+in the same write by a length-prefixed metadata record (M) for search filters.
+Readers tail the log from their last offset, and a torn record at the end is
+left for the next read.
+"""
+import json
+import os
+import secrets
+import shutil
+import struct
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_store")  # empty disables persistence
+VECTOR_STORE_DTYPE = np.dtype(os.getenv("VECTOR_STORE_DTYPE", "float32"))
+VECTOR_STORE_KEEP = 2  # snapshots kept besides the current one, for workers still mapping them
+
+_CURRENT = "CURRENT"
+_META = "meta.json"
+_WAL = "wal.log"
+
+WalRecord = Tuple[str, str, Any]  # (op, entry id, vector for A / metadata dict for M / None for D)
+
+
+def enabled() -> bool:
+    return bool(VECTOR_STORE_DIR)
+
+
+def current_name() -> Optional[str]:
+    try:
+        with open(os.path.join(VECTOR_STORE_DIR, _CURRENT)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name if name and os.path.isdir(os.path.join(VECTOR_STORE_DIR, name)) else None
+
+
+def wal_path(name: str) -> str:
+    return os.path.join(VECTOR_STORE_DIR, name, _WAL)
+
+
+def open_snapshot(name: str) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    path = os.path.join(VECTOR_STORE_DIR, name)
+    with open(os.path.join(path, _META)) as f:
+        meta = json.load(f)
+    arrays = {
+        file[:-4]: np.load(os.path.join(path, file), mmap_mode="r", allow_pickle=False)
+        for file in os.listdir(path) if file.endswith(".npy")
+    }
+    return arrays, meta
+
+
+def write_snapshot(arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> str:
+    """Persist a snapshot, make it CURRENT and prune old ones; returns its name."""
+    os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+    name = f"snapshot-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{secrets.token_hex(3)}"
+    tmp = os.path.join(VECTOR_STORE_DIR, f".tmp-{name}")
+    os.makedirs(tmp)
+    try:
+        for key, array in arrays.items():
+            np.save(os.path.join(tmp, f"{key}.npy"), array, allow_pickle=False)
+        with open(os.path.join(tmp, _META), "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(VECTOR_STORE_DIR, name))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    pointer = os.path.join(VECTOR_STORE_DIR, f".{_CURRENT}.{name}")
+    with open(pointer, "w") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(VECTOR_STORE_DIR, _CURRENT))
+    _prune(name)
+    return name
+
+
+def _prune(current: str):
+    # Unlinking a snapshot another worker still maps is safe: its pages stay valid until unmapped.
+    snapshots = sorted(
+        (d for d in os.listdir(VECTOR_STORE_DIR) if d.startswith("snapshot-") and d != current),
+        key=lambda d: os.path.getmtime(os.path.join(VECTOR_STORE_DIR, d)),
+    )
+    for stale in snapshots[:-VECTOR_STORE_KEEP] if VECTOR_STORE_KEEP else snapshots:
+        shutil.rmtree(os.path.join(VECTOR_STORE_DIR, stale), ignore_errors=True)
+
+
+class WriteAheadLog:
+    """Append-only log of entries added (A, then M) or removed (D) after a snapshot was written."""
+
+    _HEADER = struct.Struct("<c24s")
+    _LENGTH = struct.Struct("<I")
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self._vector_size = dim * 4
+
+    def _write(self, record: bytes):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+
+    def append(self, entry_id: str, vector: Sequence[float], metadata: Optional[Dict[str, Any]] = None):
+        record = self._HEADER.pack(b"A", entry_id.encode()) + np.asarray(vector, dtype="<f4").tobytes()
+        if metadata is not None:
+            payload = json.dumps(metadata).encode()
+            record += self._HEADER.pack(b"M", entry_id.encode()) + self._LENGTH.pack(len(payload)) + payload
+        self._write(record)
+
+    def append_delete(self, entry_id: str):
+        self._write(self._HEADER.pack(b"D", entry_id.encode()))
+
+    def read_from(self, offset: int) -> Tuple[List[WalRecord], int]:
+        """Complete records after `offset`, and the offset to resume from."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+        records: List[WalRecord] = []
+        position = 0
+        while position + self._HEADER.size <= len(data):
+            op, raw_id = self._HEADER.unpack_from(data, position)
+            end = position + self._HEADER.size
+            if op == b"A":
+                end += self._vector_size
+                if end > len(data):
+                    break
+                vector = np.frombuffer(data, dtype="<f4", count=self.dim, offset=position + self._HEADER.size)
+                records.append(("A", raw_id.rstrip(b"\0").decode(), vector))
+            elif op == b"M":
+                if end + self._LENGTH.size > len(data):
+                    break
+                (length,) = self._LENGTH.unpack_from(data, end)
+                end += self._LENGTH.size + length
+                if end > len(data):
+                    break
+                payload = json.loads(data[end - length:end])
+                records.append(("M", raw_id.rstrip(b"\0").decode(), payload))
+            elif op == b"D":
+                records.append(("D", raw_id.rstrip(b"\0").decode(), None))
+            else:
+                print(f"Corrupt vector WAL record at {offset + position} in {self.path}; ignoring the rest")
+                position = len(data)
+                break
+            position = end
+        return records, offset + position
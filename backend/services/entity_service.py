@@ -0,0 +1,210 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from database import db, journal_collection
+from services import metrics
+from services.tracing import traced
+
+# One `entity_mentions` document per (entity, kind, entry): the people, places,
+# actions and emotions that process_journal_entry extracts into
+# `structured_events`. Written at ingest time and read by /api/entities and the
+# LLM-free fast path of /api/query.
+entity_mentions_collection = db["entity_mentions"]
+
+# structured_events keys as Gemini tends to spell them -> entity kind
+KIND_ALIASES = {
+    "people": "person", "persons": "person", "person": "person", "names": "person", "with": "person",
+    "places": "place", "place": "place", "locations": "place", "location": "place",
+    "actions": "action", "action": "action", "activities": "action", "activity": "action",
+    "emotions": "emotion", "emotion": "emotion", "feelings": "emotion", "feeling": "emotion", "mood": "emotion",
+}
+SNIPPET_CHARS = 160
+
+_SPACE = re.compile(r"\s+")
+_ARTICLE = re.compile(r"^(?:the|a|an|my)\s+")
+
+
+def normalize_entity(name: str) -> str:
+    """Lookup key for an entity: 'The  Market ' -> 'market'."""
+    key = _SPACE.sub(" ", name.strip().lower()).strip(" .,!?'\"")
+    return _ARTICLE.sub("", key)
+
+
+def _label(item: Any) -> str:
+    if isinstance(item, str):
+        return item.strip()
+    if isinstance(item, dict):
+        return str(item.get("name") or item.get("description") or item.get("type") or "").strip()
+    return ""
+
+
+def extract_entities(structured_events: Any) -> List[Tuple[str, str]]:
+    """(kind, display name) pairs from a structured_events dict, deduplicated."""
+    if not isinstance(structured_events, dict):
+        return []
+    seen = set()
+    entities = []
+    for field, value in structured_events.items():
+        kind = KIND_ALIASES.get(str(field).lower())
+        if kind is None:
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            name = _label(item)
+            key = normalize_entity(name)
+            if key and (kind, key) not in seen:
+                seen.add((kind, key))
+                entities.append((kind, name))
+    return entities
+
+
+@traced
+async def index_entry(entry_id: str, entry: Dict[str, Any]) -> int:
+    """Record the entry's entity mentions; idempotent, so backfills can be re-run."""
+    operations = [
+        UpdateOne(
+            {"entity": normalize_entity(name), "kind": kind, "entry_id": entry_id},
+            {"$set": {"name": name, "timestamp": entry.get("timestamp")}},
+            upsert=True,
+        )
+        for kind, name in extract_entities(entry.get("structured_events"))
+    ]
+    if operations:
+        await entity_mentions_collection.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+async def backfill() -> Dict[str, int]:
+    """Index the entities of every existing journal entry."""
+    entries = mentions = 0
+    cursor = journal_collection.find(
+        {"structured_events": {"$type": "object"}}, {"structured_events": 1, "timestamp": 1}
+    ).batch_size(1000)
+    async for entry in cursor:
+        mentions += await index_entry(str(entry["_id"]), entry)
+        entries += 1
+        if entries % 1000 == 0:
+            print(f"Indexed entities of {entries} entries ({mentions} mentions)")
+    return {"entries": entries, "mentions": mentions}
+
+
+def _mention_query(name: str, kind: Optional[str] = None, since: Optional[datetime] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"entity": normalize_entity(name)}
+    if kind:
+        query["kind"] = kind
+    if since:
+        query["timestamp"] = {"$gte": since}
+    return query
+
+
+@traced
+async def entity_timeline(name: str, kind: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+    """Mentions of an entity, newest first, with a snippet of each entry."""
+    query = _mention_query(name, kind)
+    count = await entity_mentions_collection.count_documents(query)
+    cursor = entity_mentions_collection.find(query, {"_id": 0}).sort("timestamp", -1).limit(limit)
+    mentions = await cursor.to_list(length=limit)
+
+    entry_ids = list({m["entry_id"] for m in mentions})
+    texts = {}
+    if entry_ids:
+        entry_cursor = journal_collection.find(
+            {"_id": {"$in": [ObjectId(i) for i in entry_ids]}}, {"summary": 1, "english_text": 1, "raw_text": 1}
+        )
+        async for entry in entry_cursor:
+            text = entry.get("summary") or entry.get("english_text") or entry.get("raw_text") or ""
+            texts[str(entry["_id"])] = text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS - 3] + "..."
+    for mention in mentions:
+        mention["text"] = texts.get(mention["entry_id"], "")
+
+    first = None
+    if count:
+        oldest = await entity_mentions_collection.find_one(query, {"timestamp": 1}, sort=[("timestamp", 1)])
+        first = oldest and oldest.get("timestamp")
+    return {
+        "entity": normalize_entity(name),
+        "count": count,
+        "first": first,
+        "last": mentions[0].get("timestamp") if mentions else None,
+        "timeline": mentions,
+    }
+
+
+@traced
+async def top_entities(kind: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    pipeline: List[Dict[str, Any]] = [{"$match": {"kind": kind}}] if kind else []
+    pipeline += [
+        {"$group": {"_id": {"entity": "$entity", "kind": "$kind"}, "name": {"$last": "$name"},
+                    "count": {"$sum": 1}, "last": {"$max": "$timestamp"}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "entity": "$_id.entity", "kind": "$_id.kind", "name": 1, "count": 1, "last": 1}},
+    ]
+    return await entity_mentions_collection.aggregate(pipeline).to_list(length=limit)
+
+
+# --- LLM-free answers to simple factual questions -----------------------------
+
+_VERBS = (r"(?:see|saw|meet|met|visit|visited|go to|went to|been to|talk to|talk with|speak to|speak with|"
+          r"call|called|hang out with|eat at|ate at|play|played|do|did|feel|felt|mention|mentioned)")
+_WHEN = re.compile(rf"^when did i (last|first|most recently)?\s*{_VERBS}\s+(.+?)(?:\s+last)?\??$")
+_HOW_MANY = re.compile(
+    rf"^how (?:many times|often) (?:did|have) i (?:\w+\s+)?{_VERBS}\s+(.+?)"
+    r"(?:\s+(?:in the (?:last|past) (\d+) days|this (week|month|year)))?\??$"
+)
+_PERIOD_DAYS = {"week": 7, "month": 30, "year": 365}
+
+
+def _fmt_date(value: Any) -> str:
+    return value.strftime("%Y-%m-%d") if isinstance(value, datetime) else str(value or "")[:10]
+
+
+async def answer_factual(question: str) -> Optional[Dict[str, Any]]:
+    """Answer "when did I last/first see X" and "how many times did I go to Y" from the entity index.
+
+    Returns None when the question does not match a pattern or the entity is
+    unknown, so the caller falls back to Gemini.
+    """
+    text = _SPACE.sub(" ", question.strip().lower())
+    when = _WHEN.match(text)
+    if when:
+        which, name = when.group(1) or "last", when.group(2)
+        ascending = which == "first"
+        mention = await entity_mentions_collection.find_one(
+            _mention_query(name), sort=[("timestamp", 1 if ascending else -1)]
+        )
+        metrics.cache_lookup("entity_fast_path", hit=mention is not None)
+        if mention is None:
+            return None
+        count = len(await entity_mentions_collection.distinct("entry_id", _mention_query(name)))
+        return {
+            "answer": f"You {'first' if ascending else 'last'} mentioned {mention['name']} on "
+                      f"{_fmt_date(mention.get('timestamp'))} ({count} mention{'s' if count != 1 else ''} in total).",
+            "source": "entity_index",
+            "entity": mention["entity"],
+            "entry_id": mention["entry_id"],
+        }
+
+    how_many = _HOW_MANY.match(text)
+    if how_many:
+        name, days, period = how_many.group(1), how_many.group(2), how_many.group(3)
+        window = int(days) if days else _PERIOD_DAYS.get(period)
+        since = datetime.now() - timedelta(days=window) if window else None
+        if await entity_mentions_collection.find_one(_mention_query(name), {"_id": 1}) is None:
+            metrics.cache_lookup("entity_fast_path", hit=False)
+            return None
+        metrics.cache_lookup("entity_fast_path", hit=True)
+        # An entry naming the same thing as both a place and an action counts once.
+        count = len(await entity_mentions_collection.distinct("entry_id", _mention_query(name, since=since)))
+        scope = f" in the last {window} days" if window else ""
+        return {
+            "answer": f"{count} time{'s' if count != 1 else ''}{scope}, going by your journal entries "
+                      f"that mention {normalize_entity(name)}.",
+            "source": "entity_index",
+            "entity": normalize_entity(name),
+            "count": count,
+        }
+    return None
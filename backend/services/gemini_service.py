@@ -1,7 +1,8 @@
 import google.generativeai as genai
 import os
-import json
 from dotenv import load_dotenv
+from services import llm_dispatcher, llm_transport, metrics, model_tiers, prompt_budget
+from services.singleflight import SingleFlight
 
 load_dotenv()
 
@@ -9,9 +10,15 @@ API_KEY = os.getenv("GEMINI_API_KEY")
 if API_KEY:
     genai.configure(api_key=API_KEY)
 
-model = genai.GenerativeModel('gemini-2.5-flash')
 embedding_model = 'models/embedding-001'
 
+# Returned by answer_question when Gemini fails; never cached
+ANSWER_FALLBACK = "Sorry, I couldn't generate an answer at this time."
+
+# Identical texts embedded concurrently (e.g. the same search from several tabs) share one request
+_embedding_flight = SingleFlight("embedding")
+
+@metrics.llm_site
 async def process_journal_entry(text: str):
     prompt = f"""
     You are a multilingual journal assistant.
@@ -29,34 +36,35 @@ async def process_journal_entry(text: str):
     """
     
     try:
-        response = model.generate_content(prompt)
-        # Clean up code blocks if present
-        cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
-        result = json.loads(cleaned_text)
-        return result
+        return await model_tiers.generate(prompt, parse=model_tiers.parse_json)
     except Exception as e:
         print(f"Error processing entry: {e}")
+        metrics.record_fallback()
         return None
 
+@metrics.llm_site
 async def generate_embedding(text: str):
+    return await _embedding_flight.do(text, lambda: _embed(text))
+
+async def _embed(text: str):
     try:
-        result = genai.embed_content(
-            model=embedding_model,
-            content=text,
-            task_type="retrieval_document"
-        )
+        with metrics.llm_call("embed_content", text_chars=len(text)):
+            result = await llm_dispatcher.call(
+                llm_transport.embed,
+                genai.embed_content, "gemini_service",
+                model=embedding_model,
+                content=text,
+                task_type="retrieval_document"
+            )
         return result['embedding']
     except Exception as e:
         print(f"Error generating embedding: {e}")
+        metrics.record_fallback()
         return []
 
+@metrics.llm_site
 async def answer_question(question: str, context_entries: list):
-    context_str = "\n\n".join([
-        f"Date: {entry['timestamp']}\nEntry: {entry['english_text']}" 
-        for entry in context_entries
-    ])
-    
-    prompt = f"""
+    prompt = prompt_budget.build_prompt(lambda context_str: f"""
     You are a highly intelligent personal memory assistant.
     User Question: "{question}"
     
@@ -70,11 +78,11 @@ async def answer_question(question: str, context_entries: list):
     2. Answer the user's question comprehensively using ONLY the information from the entries.
     3. If the answer requires connecting dots across multiple entries, do so.
     4. If the answer is not found in the entries, politely state that you don't have that information.
-    """
+    """, context_entries, prompt_budget.ENTRY_LEVELS)
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return await model_tiers.generate(prompt)
     except Exception as e:
         print(f"Error answering question: {e}")
-        return "Sorry, I couldn't generate an answer at this time."
+        metrics.record_fallback()
+        return ANSWER_FALLBACK
@@ -0,0 +1,235 @@
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from database import db
+from services import gemini_service, metrics
+from services.tracing import traced
+from services.analysis_service import cosine_similarity
+
+# Progress notes live in time-bucketed documents in `goal_progress` instead of an
+# ever-growing array on the goal. Each bucket covers one month and holds at most
+# BUCKET_SIZE records; the goal itself only keeps running counters and the last
+# few records for display.
+BUCKET_SIZE = 200
+RECENT_PROGRESS = 3
+
+# Journal entries whose embedding is at least this similar to a goal's
+# title/description embedding are linked to the goal at ingestion time.
+GOAL_LINK_THRESHOLD = float(os.getenv("GOAL_LINK_THRESHOLD", "0.75"))
+
+# goal_id -> (embedded text, vector); refreshed when a goal's title/description changes
+_goal_embeddings: Dict[str, Tuple[str, List[float]]] = {}
+
+goals_collection = db["goals"]
+goal_progress_collection = db["goal_progress"]
+
+
+def _amount_value(amount: Any) -> float:
+    try:
+        return float(amount)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@traced
+async def record_progress(goal_id: str, note: Optional[str], amount: Any = None,
+                          date: Optional[datetime] = None, **extra: Any) -> bool:
+    """Append a progress record to the goal's current bucket and update its counters.
+
+    Returns False if the goal does not exist.
+    """
+    date = date or datetime.utcnow()
+    record = {"date": date, "note": note, "amount": amount, **extra}
+
+    result = await goals_collection.update_one(
+        {"_id": ObjectId(goal_id)},
+        {
+            "$inc": {"progress_total": _amount_value(amount), "progress_count": 1},
+            "$set": {"last_progress_at": date, "updated_at": datetime.utcnow()},
+            "$push": {"recent_progress": {"$each": [record], "$slice": -RECENT_PROGRESS}},
+        },
+    )
+    if result.matched_count == 0:
+        return False
+
+    # Fill the open bucket for this month, or start a new one once it is full.
+    await goal_progress_collection.update_one(
+        {"goal_id": goal_id, "month": date.strftime("%Y-%m"), "count": {"$lt": BUCKET_SIZE},
+         "legacy": {"$exists": False}},
+        {
+            "$push": {"entries": record},
+            "$inc": {"count": 1},
+            "$min": {"first_date": date},
+            "$max": {"last_date": date},
+        },
+        upsert=True,
+    )
+    return True
+
+
+@traced
+async def get_progress_history(goal_id: str, before: Optional[datetime] = None, limit: int = 20) -> Dict[str, Any]:
+    """Progress records for a goal, newest first, paginated by the `before` date.
+
+    Buckets are read newest first (by `last_date`) and only until no remaining bucket can hold a
+    record newer than the ones already collected, so a page costs a few buckets, not the whole history.
+    """
+    bucket_match: Dict[str, Any] = {"goal_id": goal_id}
+    if before:
+        bucket_match["first_date"] = {"$lt": before}
+
+    items: List[Dict[str, Any]] = []
+    cursor = goal_progress_collection.find(bucket_match, {"entries": 1, "last_date": 1}) \
+        .sort("last_date", -1).batch_size(2)
+    async for bucket in cursor:
+        # Every record left is at most this bucket's last_date; stop once the page is settled
+        if len(items) > limit and items[limit]["date"] >= bucket["last_date"]:
+            break
+        items.extend(e for e in bucket.get("entries") or [] if not before or e["date"] < before)
+        items.sort(key=lambda e: e["date"], reverse=True)
+        del items[limit + 1:]
+    await cursor.close()
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    return {
+        "progress": items,
+        "next_before": items[-1]["date"].isoformat() if has_more and items else None,
+    }
+
+
+async def delete_progress(goal_id: str):
+    await goal_progress_collection.delete_many({"goal_id": goal_id})
+
+
+def _legacy_date(value: Any) -> datetime:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = None
+    if not isinstance(value, datetime):
+        return datetime.utcnow()
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+async def migrate_embedded_progress() -> Dict[str, int]:
+    """Move legacy `progress` arrays on goal documents into `goal_progress` buckets.
+
+    Safe to re-run after an interruption. A goal's legacy records go into buckets marked
+    `legacy` (record_progress never appends to those), and any marked buckets left by an earlier
+    run are replaced. The counters are added and `progress` is removed in one update that only
+    applies while `progress` is still there, so a goal is never counted twice.
+    """
+    migrated_goals = 0
+    migrated_records = 0
+    cursor = goals_collection.find({"progress.0": {"$exists": True}}, {"progress": 1})
+    async for goal in cursor:
+        goal_id = str(goal["_id"])
+        records = sorted(
+            ({"date": _legacy_date(item.get("date")), "note": item.get("note"), "amount": item.get("amount")}
+             for item in goal.get("progress") or []),
+            key=lambda r: r["date"],
+        )
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_month.setdefault(record["date"].strftime("%Y-%m"), []).append(record)
+        buckets = [
+            {"goal_id": goal_id, "month": month, "entries": chunk, "count": len(chunk),
+             "first_date": chunk[0]["date"], "last_date": chunk[-1]["date"], "legacy": True}
+            for month, month_records in by_month.items()
+            for chunk in (month_records[i:i + BUCKET_SIZE] for i in range(0, len(month_records), BUCKET_SIZE))
+        ]
+
+        await goal_progress_collection.delete_many({"goal_id": goal_id, "legacy": True})
+        if buckets:
+            await goal_progress_collection.insert_many(buckets)
+        result = await goals_collection.update_one(
+            {"_id": goal["_id"], "progress.0": {"$exists": True}},
+            {
+                "$unset": {"progress": ""},
+                "$inc": {"progress_total": sum(_amount_value(r["amount"]) for r in records),
+                         "progress_count": len(records)},
+                "$max": {"last_progress_at": records[-1]["date"]},
+                "$push": {"recent_progress": {"$each": records[-RECENT_PROGRESS:], "$sort": {"date": 1},
+                                              "$slice": -RECENT_PROGRESS}},
+            },
+        )
+        await goal_progress_collection.update_many({"goal_id": goal_id, "legacy": True}, {"$unset": {"legacy": ""}})
+        if result.modified_count:
+            migrated_goals += 1
+            migrated_records += len(records)
+            print(f"Migrated goal {goal_id}: {len(records)} progress records")
+    return {"goals": migrated_goals, "records": migrated_records}
+
+
+def _goal_text(goal: Dict[str, Any]) -> str:
+    return f"{goal.get('title') or ''}. {goal.get('description') or ''}".strip(" .")
+
+
+async def _active_goal_embeddings() -> List[Tuple[str, List[float]]]:
+    """Embeddings for active goals, from memory, the goal document, or freshly generated."""
+    cursor = goals_collection.find({"status": {"$in": ["active", None]}}, {"title": 1, "description": 1, "embedding_text": 1})
+    goals = await cursor.to_list(length=None)
+
+    result = []
+    for goal in goals:
+        goal_id = str(goal["_id"])
+        text = _goal_text(goal)
+        if not text:
+            continue
+        cached = _goal_embeddings.get(goal_id)
+        metrics.cache_lookup("goal_embedding", hit=bool(cached and cached[0] == text))
+        if cached and cached[0] == text:
+            result.append((goal_id, cached[1]))
+            continue
+
+        vector = None
+        if goal.get("embedding_text") == text:
+            stored = await goals_collection.find_one({"_id": goal["_id"]}, {"embedding_vector": 1})
+            vector = (stored or {}).get("embedding_vector")
+        if not vector:
+            vector = await gemini_service.generate_embedding(text)
+            if not vector:
+                continue
+            await goals_collection.update_one(
+                {"_id": goal["_id"]}, {"$set": {"embedding_vector": vector, "embedding_text": text}}
+            )
+        _goal_embeddings[goal_id] = (text, vector)
+        result.append((goal_id, vector))
+    return result
+
+
+@traced
+async def match_goals(embedding: List[float]) -> List[Tuple[str, float]]:
+    """Goals whose embedding is within GOAL_LINK_THRESHOLD of `embedding`, best first."""
+    if not embedding:
+        return []
+    matches = []
+    for goal_id, vector in await _active_goal_embeddings():
+        score = cosine_similarity(embedding, vector)
+        if score >= GOAL_LINK_THRESHOLD:
+            matches.append((goal_id, score))
+    matches.sort(key=lambda m: m[1], reverse=True)
+    return matches
+
+
+@traced
+async def record_journal_progress(entry_id: str, entry: Dict[str, Any], matches: List[Tuple[str, float]]):
+    """Append an automatic progress record to each goal a journal entry was linked to."""
+    text = entry.get("summary") or entry.get("english_text") or entry.get("raw_text") or ""
+    note = text if len(text) <= 140 else text[:137] + "..."
+    # Entries are stamped with local time; progress records (and bucket months) are UTC
+    date = entry.get("timestamp")
+    if isinstance(date, datetime):
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        date = None
+    for goal_id, score in matches:
+        await record_progress(
+            goal_id, note, None, date=date,
+            source="journal", entry_id=entry_id, similarity=round(score, 3)
+        )
@@ -0,0 +1,86 @@
+import os
+from datetime import datetime, time, timedelta
+from typing import Any, Dict
+
+from database import db, journal_collection, tasks_collection, task_history_collection
+from services import embedding_store, llm_dispatcher, rollup_service, vector_index
+from services.analysis_service import generate_daily_summary_for_date
+from services.precompute_service import tasks_signature, store_precomputed
+from services.scheduler import Scheduler
+from services.task_ai_service import generate_daily_summary, analyze_productivity_patterns
+from services.task_service import TaskService
+
+# Background maintenance jobs. Request paths read what these jobs precompute
+# instead of paying for the Gemini calls and scans themselves.
+SUMMARY_CRON = os.getenv("SUMMARY_CRON", "15 0 * * *")
+RECURRENCE_CRON = os.getenv("RECURRENCE_CRON", "5 0 * * *")
+VECTOR_INDEX_CRON = os.getenv("VECTOR_INDEX_CRON", "30 3 * * *")
+OVERDUE_INTERVAL_SECONDS = int(os.getenv("OVERDUE_INTERVAL_SECONDS", "900"))
+CACHE_WARM_INTERVAL_SECONDS = int(os.getenv("CACHE_WARM_INTERVAL_SECONDS", "1800"))
+INSIGHTS_DAYS = 30
+
+task_service = TaskService(tasks_collection, task_history_collection)
+scheduler = Scheduler(db["scheduler_jobs"])
+
+
+@llm_dispatcher.background
+async def generate_nightly_summaries(days: int = 2) -> Dict[str, Any]:
+    """Refresh daily summaries for the last `days` days whose entry count changed."""
+    generated = 0
+    today = datetime.now().date()
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        start = datetime.combine(day, time.min)
+        entries = await journal_collection.find(
+            {"timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}},
+            {"timestamp": 1, "english_text": 1, "raw_text": 1, "summary": 1}
+        ).to_list(length=None)
+        if not entries:
+            continue
+        stored = await db["daily_summaries"].find_one({"date": day.isoformat()})
+        if stored and stored.get("count") == len(entries) and stored.get("summary"):
+            continue
+        await generate_daily_summary_for_date(day.isoformat(), entries)
+        generated += 1
+    return {"generated": generated}
+
+
+async def expand_recurring_tasks() -> Dict[str, Any]:
+    return {"created": await task_service.extend_recurring_tasks(horizon_days=7)}
+
+
+async def flag_overdue_tasks() -> Dict[str, Any]:
+    return await task_service.flag_overdue_tasks()
+
+
+@llm_dispatcher.background
+async def warm_task_caches() -> Dict[str, Any]:
+    """Precompute today's task summary and the default insights window."""
+    now = datetime.now()
+    warmed = 0
+
+    tasks = await task_service.get_tasks_for_day(now)
+    date_key = now.strftime("%Y-%m-%d")
+    summary_text = await generate_daily_summary(tasks, now)
+    await store_precomputed("task_summary", date_key, tasks_signature(tasks), summary_text)
+    warmed += 1
+
+    stats = await task_service.get_task_statistics(now - timedelta(days=INSIGHTS_DAYS), now)
+    insights = await analyze_productivity_patterns(stats['tasks'])
+    await store_precomputed("task_insights", f"{INSIGHTS_DAYS}:{date_key}", tasks_signature(stats['tasks']), insights)
+    warmed += 1
+
+    return {"warmed": warmed}
+
+
+def register_jobs(target: Scheduler = scheduler) -> Scheduler:
+    target.add_job("nightly_summaries", generate_nightly_summaries, cron=SUMMARY_CRON)
+    target.add_job("rollups", rollup_service.run_rollups, interval_seconds=rollup_service.ROLLUP_INTERVAL_SECONDS)
+    target.add_job("recurrence_expansion", expand_recurring_tasks, cron=RECURRENCE_CRON)
+    target.add_job("overdue_flagging", flag_overdue_tasks, interval_seconds=OVERDUE_INTERVAL_SECONDS)
+    target.add_job("cache_warming", warm_task_caches, interval_seconds=CACHE_WARM_INTERVAL_SECONDS)
+    # With a VECTOR_STORE_DIR every worker uses, one worker rebuilds and the others attach the new
+    # snapshot on their next sync. Without one, each worker's index is private and is rebuilt by that worker.
+    target.add_job("vector_index_rebuild", vector_index.rebuild, cron=VECTOR_INDEX_CRON,
+                   local=not embedding_store.enabled())
+    return target
@@ -0,0 +1,221 @@
+"""Local BM25 inverted index over journal text, for /api/search?mode=lexical|hybrid.
+
+Each entry is indexed on english_text, raw_text and the string values of
+structured_events (people, places, actions). Entity terms count ENTITY_WEIGHT
+times, so exact names rank first. Lexical search never makes a remote call.
+Search filters (services/search_filters) mask rows by the entry metadata kept
+alongside the postings, as in the vector index.
+
+Like the vector index, each worker builds its index from MongoDB on first use.
+Entries saved by this worker are added on ingest, and those from other workers
+are picked up every LEXICAL_SYNC_SECONDS.
+"""
+import asyncio
+import math
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from database import journal_collection
+from services import search_filters
+from services.search_filters import SearchFilter
+from services.tracing import traced
+
+LEXICAL_SYNC_SECONDS = float(os.getenv("LEXICAL_SYNC_SECONDS", "30"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+ENTITY_WEIGHT = 2
+TEXT_FIELDS = {"english_text": 1, "raw_text": 1, "structured_events": 1, **search_filters.METADATA_FIELDS}
+
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do for from had has have he her him his i in is it its me my of on or "
+    "our she so that the their them they this to was we were what when where which who with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def _strings(value: Any) -> Iterable[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _strings(item)
+
+
+def document_terms(doc: Dict[str, Any]) -> Counter:
+    english, raw = doc.get("english_text") or "", doc.get("raw_text") or ""
+    terms = Counter(tokenize(english))
+    if raw and raw != english:
+        terms.update(tokenize(raw))
+    for text in _strings(doc.get("structured_events")):
+        for token in tokenize(text):
+            terms[token] += ENTITY_WEIGHT
+    return terms
+
+
+class BM25Index:
+    """Postings per term as parallel row/term-frequency lists, turned into arrays when queried."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.count = 0
+        self.lengths = np.empty(0, dtype=np.float32)
+        self.alive = np.empty(0, dtype=bool)
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.labels = search_filters.LabelPostings()
+        self._rows: Dict[str, int] = {}
+        self._total_length = 0.0
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._rows
+
+    def _grow(self, needed: int):
+        if needed <= len(self.lengths):
+            return
+        capacity = max(needed, len(self.lengths) * 2, 1024)
+        lengths = np.zeros(capacity, dtype=np.float32)
+        lengths[:self.count] = self.lengths[:self.count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.count] = self.alive[:self.count]
+        timestamps = np.full(capacity, search_filters.NO_TIME, dtype=np.int64)
+        timestamps[:self.count] = self.timestamps[:self.count]
+        self.lengths, self.alive, self.timestamps = lengths, alive, timestamps
+
+    def add(self, entry_id: str, doc: Dict[str, Any]):
+        self.remove(entry_id)
+        terms = document_terms(doc)
+        row = self.count
+        self._grow(row + 1)
+        length = sum(terms.values())
+        self.lengths[row] = length
+        self.alive[row] = True
+        self.timestamps[row], labels = search_filters.entry_metadata(doc)
+        self.labels.add(row, labels)
+        for term, tf in terms.items():
+            rows, tfs = self._postings.setdefault(term, ([], []))
+            rows.append(row)
+            tfs.append(tf)
+            self._arrays.pop(term, None)
+        self.ids.append(entry_id)
+        self._rows[entry_id] = row
+        self._total_length += length
+        self.count += 1
+
+    def remove(self, entry_id: str) -> bool:
+        row = self._rows.pop(entry_id, None)
+        if row is None:
+            return False
+        self.alive[row] = False
+        self._total_length -= float(self.lengths[row])
+        return True
+
+    def _posting(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self._postings.get(term)
+            if posting is None:
+                return None
+            arrays = self._arrays[term] = (np.asarray(posting[0], dtype=np.int64),
+                                           np.asarray(posting[1], dtype=np.float32))
+        return arrays
+
+    def search(self, query: str, k: int, filters: Optional[SearchFilter] = None) -> List[Tuple[str, float]]:
+        """Top-k (entry id, BM25 score) for entries matching at least one query term (and `filters`)."""
+        n = len(self)
+        if n == 0:
+            return []
+        average_length = self._total_length / n or 1.0
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._posting(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[rows] / average_length)
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+        scores[~self.alive[:self.count]] = 0
+        if filters:
+            scores[~filters.mask(self.count, [self.timestamps[:self.count]], self.labels)] = 0
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(self.ids[row], float(scores[row])) for row in matched]
+
+
+# --- process-wide index over journal_entries ----------------------------------
+
+_index: Optional[BM25Index] = None
+_lock = asyncio.Lock()
+_last_sync = 0.0
+_synced_until: Optional[datetime] = None
+_SYNC_OVERLAP = timedelta(minutes=1)
+
+
+async def _load(query: dict) -> List[Dict[str, Any]]:
+    cursor = journal_collection.find(query, TEXT_FIELDS).batch_size(5000)
+    return await cursor.to_list(length=None)
+
+
+def _build(docs: List[Dict[str, Any]]) -> BM25Index:
+    index = BM25Index()
+    for doc in docs:
+        index.add(str(doc["_id"]), doc)
+    return index
+
+
+async def _sync():
+    global _index, _last_sync, _synced_until
+    started = datetime.utcnow()
+    if _index is None:
+        build_started = time.perf_counter()
+        docs = await _load({})
+        _index = await asyncio.to_thread(_build, docs)
+        print(f"Lexical index built: {len(_index)} entries, {len(_index._postings)} terms "
+              f"in {time.perf_counter() - build_started:.1f}s")
+    else:
+        since = ObjectId.from_datetime(_synced_until - _SYNC_OVERLAP)
+        for doc in await _load({"_id": {"$gte": since}}):
+            if str(doc["_id"]) not in _index:
+                _index.add(str(doc["_id"]), doc)
+    _synced_until = started
+    _last_sync = time.monotonic()
+
+
+async def get_index() -> BM25Index:
+    if _index is None or time.monotonic() - _last_sync > LEXICAL_SYNC_SECONDS:
+        async with _lock:
+            if _index is None or time.monotonic() - _last_sync > LEXICAL_SYNC_SECONDS:
+                await _sync()
+    return _index
+
+
+def add_entry(entry_id: str, doc: Dict[str, Any]):
+    """Index a just-saved entry in this worker; other workers pick it up at their next sync."""
+    if _index is not None:
+        _index.add(entry_id, doc)
+
+
+@traced
+async def search(query: str, k: int = 5, filters: Optional[SearchFilter] = None) -> List[Tuple[str, float]]:
+    index = await get_index()
+    return index.search(query, k, filters)
@@ -0,0 +1,283 @@
+"""Single entry point for Gemini calls: priority lanes, adaptive concurrency limit, circuit breaker.
+
+    response = await llm_dispatcher.generate(model, prompt)
+
+Calls run in a worker thread. The number running at once follows an AIMD rule:
++1/limit per call that finishes under LLM_TARGET_LATENCY_MS, and halved (at most
+once per LLM_DECREASE_COOLDOWN_SECONDS) when a call is slow, times out or is
+rate limited. After LLM_BREAKER_FAILURES consecutive failures the breaker opens.
+From then on calls raise CircuitOpenError straight away, so callers take their
+local fallback instead of waiting on a timeout. After
+LLM_BREAKER_RESET_SECONDS one probe call is let through to test recovery.
+
+Calls wait in one of two lanes. Interactive calls (the default) are always
+started before queued background calls. Background calls, from scheduled jobs
+and bulk endpoints wrapped in `lane("background")` / `@background`, may use at
+most LLM_BACKGROUND_SHARE of the limit, so a long batch never takes every slot.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+from services import metrics
+from services.llm_transport import ReplayMiss
+
+LLM_INITIAL_CONCURRENCY = float(os.getenv("LLM_INITIAL_CONCURRENCY", "8"))
+LLM_MIN_CONCURRENCY = float(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = float(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_TARGET_LATENCY_MS = float(os.getenv("LLM_TARGET_LATENCY_MS", "10000"))
+LLM_DECREASE_COOLDOWN_SECONDS = float(os.getenv("LLM_DECREASE_COOLDOWN_SECONDS", "2"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+LLM_BACKGROUND_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_BACKGROUND_QUEUE_TIMEOUT_SECONDS", "600"))
+LLM_BACKGROUND_SHARE = float(os.getenv("LLM_BACKGROUND_SHARE", "0.5"))
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", "60"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+INTERACTIVE, BACKGROUND = "interactive", "background"
+LANES = (INTERACTIVE, BACKGROUND)  # in priority order
+_QUEUE_TIMEOUTS = {INTERACTIVE: LLM_QUEUE_TIMEOUT_SECONDS, BACKGROUND: LLM_BACKGROUND_QUEUE_TIMEOUT_SECONDS}
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("llm_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def lane(name: str):
+    """Run the enclosed Gemini calls in the given lane."""
+    if name not in LANES:
+        raise ValueError(f"Unknown LLM lane: {name}")
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def background(func: Callable) -> Callable:
+    """Mark an async function (job, bulk endpoint) as background LLM work."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with lane(BACKGROUND):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+class CircuitOpenError(Exception):
+    """Gemini is failing; the call was not attempted."""
+
+
+class LLMOverloadedError(Exception):
+    """No concurrency slot became free within LLM_QUEUE_TIMEOUT_SECONDS."""
+
+
+def _is_rate_limit(error: BaseException) -> bool:
+    # google.api_core.exceptions.ResourceExhausted carries code 429
+    return getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted" or "429" in str(error)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit shared by prioritized lanes.
+
+    Used only from the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, initial: float, minimum: float, maximum: float, target_latency: float,
+                 decrease_cooldown: float, background_share: float):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.decrease_cooldown = decrease_cooldown
+        self.background_share = background_share
+        self.in_flight = 0
+        self.lane_in_flight: Dict[str, int] = {name: 0 for name in LANES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in LANES}
+        self._last_decrease = 0.0
+        self._publish()
+
+    def _publish(self):
+        metrics.llm_concurrency_limit.set(self.limit)
+        for name in LANES:
+            metrics.llm_in_flight.set(self.lane_in_flight[name], lane=name)
+            metrics.llm_queue_depth.set(sum(1 for w in self._waiters[name] if not w.done()), lane=name)
+
+    def lane_cap(self, name: str) -> int:
+        if name == BACKGROUND:
+            return max(1, int(self.limit * self.background_share))
+        return int(self.limit)
+
+    def _can_start(self, name: str) -> bool:
+        return self.in_flight < int(self.limit) and self.lane_in_flight[name] < self.lane_cap(name)
+
+    def _start(self, name: str):
+        self.in_flight += 1
+        self.lane_in_flight[name] += 1
+
+    def _wake(self):
+        for name in LANES:
+            waiters = self._waiters[name]
+            while waiters and self._can_start(name):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self._start(name)
+                    waiter.set_result(None)
+            if any(not w.done() for w in waiters):
+                break  # lower lanes wait until this one is drained
+        self._publish()
+
+    def _ahead_of(self, name: str) -> bool:
+        """True if callers in this lane or a higher one are already queued."""
+        for other in LANES:
+            if any(not w.done() for w in self._waiters[other]):
+                return True
+            if other == name:
+                return False
+        return False
+
+    async def acquire(self, name: str, timeout: float):
+        start = time.monotonic()
+        if not self._ahead_of(name) and self._can_start(name):
+            self._start(name)
+            self._publish()
+            metrics.llm_queue_wait.observe(0.0, lane=name)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[name].append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                raise LLMOverloadedError(
+                    f"no Gemini slot free within {timeout:.0f}s ({name} lane, limit {int(self.limit)})"
+                )
+        except BaseException:
+            # Cancelled (e.g. client disconnect) after _wake granted a slot: hand it back unused
+            if waiter.done() and not waiter.cancelled():
+                self._give_back(name)
+            raise
+        finally:
+            metrics.llm_queue_wait.observe(time.monotonic() - start, lane=name)
+            self._publish()
+
+    def _give_back(self, name: str):
+        """Return a slot that was never used to call Gemini; the limit is left as it is."""
+        self.in_flight -= 1
+        self.lane_in_flight[name] -= 1
+        self._wake()
+
+    def release(self, name: str, latency: float, overloaded: bool):
+        self.in_flight -= 1
+        self.lane_in_flight[name] -= 1
+        now = time.monotonic()
+        if overloaded or latency > self.target_latency:
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def _set_state(self, state: int):
+        self.state = state
+        metrics.llm_breaker_state.set(state)
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def cancel_probe(self):
+        """The probe call never reached Gemini; let the next caller probe instead."""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            print("Gemini circuit breaker closed")
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"Gemini circuit breaker open after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+
+limiter = AdaptiveLimiter(
+    LLM_INITIAL_CONCURRENCY, LLM_MIN_CONCURRENCY, LLM_MAX_CONCURRENCY,
+    LLM_TARGET_LATENCY_MS / 1000.0, LLM_DECREASE_COOLDOWN_SECONDS, LLM_BACKGROUND_SHARE,
+)
+breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+
+
+def _on_done(task: asyncio.Task, lane_name: str, start: float, timed_out: Dict[str, bool]):
+    error: Optional[BaseException] = None if task.cancelled() else task.exception()
+    latency = time.monotonic() - start
+    limiter.release(lane_name, latency, overloaded=timed_out["value"] or (error is not None and _is_rate_limit(error)))
+    if timed_out["value"]:
+        return  # already counted as a failure when the caller gave up
+    if error is None:
+        breaker.record_success()
+    elif not isinstance(error, ReplayMiss):
+        breaker.record_failure()
+
+
+async def call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking Gemini SDK call under the limiter and breaker."""
+    site = metrics.current_llm_site()
+    lane_name = _lane.get()
+    if not breaker.allow():
+        metrics.llm_rejections.inc(site=site, reason="circuit_open")
+        raise CircuitOpenError("Gemini circuit breaker is open")
+    try:
+        await limiter.acquire(lane_name, _QUEUE_TIMEOUTS.get(lane_name, LLM_QUEUE_TIMEOUT_SECONDS))
+    except BaseException as e:
+        breaker.cancel_probe()
+        if isinstance(e, LLMOverloadedError):
+            metrics.llm_rejections.inc(site=site, reason="queue_timeout")
+        raise
+
+    start = time.monotonic()
+    timed_out = {"value": False}
+    task = asyncio.ensure_future(asyncio.to_thread(fn, *args, **kwargs))
+    task.add_done_callback(lambda t: _on_done(t, lane_name, start, timed_out))
+    try:
+        # The slot stays taken until the thread really finishes, even if we stop waiting.
+        return await asyncio.wait_for(asyncio.shield(task), LLM_CALL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        timed_out["value"] = True
+        metrics.llm_rejections.inc(site=site, reason="timeout")
+        breaker.record_failure()
+        raise
+
+
+async def generate(model: Any, prompt: Any, **kwargs: Any) -> Any:
+    return await call(model.generate_content, prompt, **kwargs)
@@ -0,0 +1,250 @@
+"""Pluggable transport under the Gemini model objects: live, record or replay.
+
+    LLM_TRANSPORT=live     (default) call Gemini directly
+    LLM_TRANSPORT=record   call Gemini and append every request/response pair, with timing,
+                           plus the incoming HTTP requests, to LLM_CASSETTE
+    LLM_TRANSPORT=replay   serve responses from LLM_CASSETTE keyed on the normalized prompt,
+                           sleeping for the recorded latency times LLM_REPLAY_LATENCY_SCALE
+
+The cassette is gzipped JSON lines; embeddings are stored as base64 float32.
+Call sites keep using `model.generate_content(prompt)` unchanged.
+"""
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+LLM_TRANSPORT = os.getenv("LLM_TRANSPORT", "live").lower()
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", "llm_cassette.jsonl.gz")
+LLM_REPLAY_LATENCY_SCALE = float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0"))
+
+_OBJECT_ID = re.compile(r"\b[0-9a-f]{24}\b")
+_DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?\b")
+_LONG_DATE = re.compile(r"\b(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday),? "
+                        r"(?:[A-Z][a-z]+ \d{1,2}, \d{4})?")
+_CLOCK = re.compile(r"\b\d{1,2}:\d{2}\b")
+_SPACE = re.compile(r"\s+")
+
+
+class ReplayMiss(Exception):
+    """No recorded response for this prompt; callers fall back as if Gemini failed."""
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Strip the parts of a prompt that differ between recording and replay (ids, dates, clock times)."""
+    text = _OBJECT_ID.sub("<id>", str(prompt))
+    text = _DATE.sub("<date>", text)
+    text = _LONG_DATE.sub("<date>", text)
+    text = _CLOCK.sub("<time>", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def prompt_key(kind: str, prompt: str) -> str:
+    return hashlib.sha1(f"{kind}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vec: List[float]) -> str:
+    return base64.b64encode(array("f", vec).tobytes()).decode("ascii")
+
+
+def _decode_vector(data: str) -> List[float]:
+    values = array("f")
+    values.frombytes(base64.b64decode(data))
+    return values.tolist()
+
+
+class Cassette:
+    """Append-only recording file, safe to write from the worker threads running SDK calls."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def append(self, record: Dict[str, Any]):
+        record["at"] = round(time.time() - self.started, 3)
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def read(path: str) -> List[Dict[str, Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+class _ReplayResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ReplayIndex:
+    """Recorded responses grouped by prompt key; repeated prompts cycle through their recordings."""
+
+    def __init__(self, records: List[Dict[str, Any]], latency_scale: float = 1.0):
+        self.latency_scale = latency_scale
+        self._responses: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._next: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        for record in records:
+            if record.get("kind") in ("generate", "embed"):
+                self._responses[record["key"]].append(record)
+
+    def take(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            options = self._responses.get(key)
+            if not options:
+                self.misses += 1
+                raise ReplayMiss(key)
+            record = options[self._next[key] % len(options)]
+            self._next[key] += 1
+            self.hits += 1
+        time.sleep(record.get("ms", 0) * self.latency_scale / 1000.0)
+        return record
+
+
+class RecordingModel:
+    """Wraps a GenerativeModel and records every generate_content call."""
+
+    def __init__(self, inner: Any, cassette: Cassette, site: str):
+        self.inner = inner
+        self.cassette = cassette
+        self.site = site
+
+    def generate_content(self, prompt: Any, **kwargs: Any):
+        start = time.perf_counter()
+        error = None
+        try:
+            response = self.inner.generate_content(prompt, **kwargs)
+            return response
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            ms = round((time.perf_counter() - start) * 1000, 1)
+            text = None
+            if error is None:
+                try:
+                    text = response.text
+                except Exception as e:
+                    error = str(e)
+            self.cassette.append({
+                "kind": "generate", "site": self.site, "key": prompt_key("generate", prompt),
+                "prompt": normalize_prompt(prompt)[:200], "text": text, "error": error, "ms": ms,
+            })
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)
+
+
+class ReplayModel:
+    """Serves generate_content from a cassette; unknown prompts raise ReplayMiss."""
+
+    def __init__(self, index: ReplayIndex, site: str, model_name: str = "replay"):
+        self.index = index
+        self.site = site
+        self.model_name = model_name
+
+    def generate_content(self, prompt: Any, **kwargs: Any):
+        record = self.index.take(prompt_key("generate", prompt))
+        if record.get("error"):
+            raise RuntimeError(f"Recorded error: {record['error']}")
+        return _ReplayResponse(record.get("text") or "")
+
+
+_cassette: Optional[Cassette] = None
+_replay_index: Optional[ReplayIndex] = None
+
+
+def _get_cassette() -> Cassette:
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette(LLM_CASSETTE)
+        atexit.register(_cassette.close)
+    return _cassette
+
+
+def _get_replay_index() -> ReplayIndex:
+    global _replay_index
+    if _replay_index is None:
+        _replay_index = ReplayIndex(Cassette.read(LLM_CASSETTE), LLM_REPLAY_LATENCY_SCALE)
+    return _replay_index
+
+
+def replay_stats() -> Dict[str, int]:
+    if _replay_index is None:
+        return {"hits": 0, "misses": 0}
+    return {"hits": _replay_index.hits, "misses": _replay_index.misses}
+
+
+def recording() -> bool:
+    return LLM_TRANSPORT == "record"
+
+
+def wrap_model(model: Any, site: str) -> Any:
+    """Return the model object a service module should use under the configured transport."""
+    if LLM_TRANSPORT == "record":
+        return RecordingModel(model, _get_cassette(), site)
+    if LLM_TRANSPORT == "replay":
+        return ReplayModel(_get_replay_index(), site, getattr(model, "model_name", "replay"))
+    return model
+
+
+def embed(embed_content: Callable[..., Dict[str, Any]], site: str, **kwargs: Any) -> Dict[str, Any]:
+    """Call `embed_content` (normally `genai.embed_content`) through the configured transport."""
+    content = str(kwargs.get("content", ""))
+    if LLM_TRANSPORT == "replay":
+        record = _get_replay_index().take(prompt_key("embed", content))
+        if record.get("error"):
+            raise RuntimeError(f"Recorded error: {record['error']}")
+        return {"embedding": _decode_vector(record["vector"])}
+    if LLM_TRANSPORT != "record":
+        return embed_content(**kwargs)
+
+    start = time.perf_counter()
+    result, error = None, None
+    try:
+        result = embed_content(**kwargs)
+        return result
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        _get_cassette().append({
+            "kind": "embed", "site": site, "key": prompt_key("embed", content),
+            "vector": _encode_vector(result["embedding"]) if result else None, "error": error,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+
+
+async def record_http(request, call_next):
+    """Middleware that logs incoming API requests so a day of traffic can be replayed later."""
+    body = await request.body()
+    start = time.perf_counter()
+    response = await call_next(request)
+    if request.url.path.startswith("/api/"):
+        _get_cassette().append({
+            "kind": "http", "method": request.method, "path": request.url.path,
+            "query": request.url.query, "body": body.decode("utf-8", "replace") if body else None,
+            "status": response.status_code, "ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+    return response
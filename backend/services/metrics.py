@@ -0,0 +1,354 @@
+"""Minimal Prometheus-style metrics: counters, gauges and histograms with labels.
+
+Rendered in the text exposition format by GET /metrics. Everything here is
+thread-safe because MongoDB command events and Gemini SDK calls are reported
+from worker threads.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+from services import profiling, tracing
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP ---------------------------------------------------------------------
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route", "status"]
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+
+async def http_middleware(request, call_next):
+    start = time.perf_counter()
+    http_requests_in_flight.inc(1)
+    query = f"?{request.url.query}" if request.url.query else ""
+    request_token = profiling.current_request.set(f"{request.method} {request.url.path}{query}")
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        profiling.current_request.reset(request_token)
+        http_requests_in_flight.inc(-1)
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method, route=getattr(route, "path", "unmatched"), status=status,
+        )
+
+
+# --- MongoDB ------------------------------------------------------------------
+
+mongo_operation_duration = Histogram(
+    "mongo_operation_duration_seconds", "MongoDB command latency by collection", ["collection", "command"]
+)
+mongo_operation_errors = Counter(
+    "mongo_operation_errors_total", "Failed MongoDB commands by collection", ["collection", "command"]
+)
+
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue",
+                     "buildInfo", "getLastError", "killCursors"}
+
+# Command fields worth keeping in the slow-operation log; document bodies are left out.
+_PARAM_FIELDS = ("filter", "sort", "projection", "limit", "skip", "pipeline", "query", "key")
+
+
+def _command_params(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    params = {k: command[k] for k in _PARAM_FIELDS if k in command}
+    if command_name == "update":
+        params["updates"] = [{"q": u.get("q"), "u": u.get("u")} for u in command.get("updates", [])[:5]]
+    elif command_name == "delete":
+        params["deletes"] = [d.get("q") for d in command.get("deletes", [])[:5]]
+    elif command_name == "insert":
+        params["documents"] = len(command.get("documents", []))
+    elif command_name == "findAndModify":
+        params["update"] = command.get("update")
+    return params
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every MongoDB command and attributes it to the collection it targets."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[float, str, str, Any, Optional[str], int, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        # Motor runs commands on its executor with the caller's context copied,
+        # so the active trace and span are visible here.
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                time.perf_counter(), str(collection), event.command_name,
+                tracing.current_trace(), tracing.current_span_id(), time.time_ns(),
+                _command_params(event.command_name, event.command) if collection != profiling.SLOW_OPS_COLLECTION else None,
+            )
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        _, collection, command, trace, parent_id, start_ns, params = pending
+        mongo_operation_duration.observe(event.duration_micros / 1_000_000, collection=collection, command=command)
+        if failed:
+            mongo_operation_errors.inc(collection=collection, command=command)
+        if params is not None:
+            profiling.record_slow_op("mongo", f"{collection}.{command}", event.duration_micros / 1000, **params)
+        if trace is not None:
+            tracing.add_completed_span(
+                trace, f"mongo.{command} {collection}", "db", parent_id, start_ns, event.duration_micros * 1000,
+                status="error" if failed else "ok", collection=collection, command=command,
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+# --- LLM ----------------------------------------------------------------------
+
+llm_call_duration = Histogram(
+    "llm_call_duration_seconds", "Gemini call latency by service function", ["site"]
+)
+llm_calls = Counter("llm_calls_total", "Gemini calls by service function and outcome", ["site", "outcome"])
+llm_tokens = Counter("llm_tokens_total", "Gemini tokens by service function", ["site", "kind"])
+llm_invocations = Counter("llm_invocations_total", "Calls to LLM-backed service functions", ["site"])
+llm_fallbacks = Counter("llm_fallbacks_total", "Service functions that returned a local fallback", ["site"])
+
+llm_tier_calls = Counter(
+    "llm_tier_calls_total", "Gemini calls by service function, model tier and outcome", ["site", "tier", "outcome"]
+)
+llm_tier_duration = Histogram(
+    "llm_tier_duration_seconds", "Gemini call latency by service function and model tier", ["site", "tier"]
+)
+prompt_tokens = Histogram(
+    "llm_prompt_tokens_estimated", "Locally estimated prompt size by service function", ["site"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000),
+)
+prompt_compactions = Counter(
+    "llm_prompt_compactions_total", "Prompt compaction steps applied to fit a token budget", ["site", "step"]
+)
+llm_concurrency_limit = Gauge("llm_concurrency_limit", "Current adaptive limit on concurrent Gemini calls")
+llm_in_flight = Gauge("llm_in_flight", "Gemini calls currently running by lane", ["lane"])
+llm_queue_depth = Gauge("llm_queue_depth", "Gemini calls waiting for a slot by lane", ["lane"])
+llm_queue_wait = Histogram(
+    "llm_queue_wait_seconds", "Time Gemini calls waited for a concurrency slot by lane", ["lane"],
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+llm_breaker_state = Gauge("llm_breaker_state", "Gemini circuit breaker: 0 closed, 1 half-open, 2 open")
+llm_rejections = Counter(
+    "llm_rejections_total", "Gemini calls not made or abandoned by the dispatcher", ["site", "reason"]
+)
+
+_llm_site: contextvars.ContextVar[str] = contextvars.ContextVar("llm_site", default="unknown")
+
+
+def current_llm_site() -> str:
+    return _llm_site.get()
+
+
+def llm_site(func: Callable) -> Callable:
+    """Attribute Gemini calls made inside an async service function to that function."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _llm_site.set(func.__name__)
+        llm_invocations.inc(site=func.__name__)
+        try:
+            with tracing.span(func.__name__, kind="service"):
+                return await func(*args, **kwargs)
+        finally:
+            _llm_site.reset(token)
+    return wrapper
+
+
+def record_fallback(site: Optional[str] = None):
+    llm_fallbacks.inc(site=site or _llm_site.get())
+
+
+@contextmanager
+def llm_call(operation: str = "generate_content", **params: Any):
+    """Time one Gemini request; the site comes from the enclosing @llm_site function."""
+    site = _llm_site.get()
+    start = time.perf_counter()
+    try:
+        with tracing.span(f"gemini.{operation}", kind="llm", site=site):
+            yield
+    except Exception:
+        llm_calls.inc(site=site, outcome="error")
+        raise
+    else:
+        llm_calls.inc(site=site, outcome="ok")
+    finally:
+        elapsed = time.perf_counter() - start
+        llm_call_duration.observe(elapsed, site=site)
+        profiling.record_slow_op("llm", f"{site}.{operation}", elapsed * 1000, **params)
+
+
+class InstrumentedModel:
+    """Wraps a model object so every generate_content call is timed and its tokens counted."""
+
+    def __init__(self, inner: Any):
+        self.inner = inner
+
+    def generate_content(self, prompt: Any, **kwargs: Any):
+        with llm_call(prompt_chars=len(str(prompt))):
+            response = self.inner.generate_content(prompt, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            site = _llm_site.get()
+            llm_tokens.inc(getattr(usage, "prompt_token_count", 0) or 0, site=site, kind="prompt")
+            llm_tokens.inc(getattr(usage, "candidates_token_count", 0) or 0, site=site, kind="completion")
+        return response
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)
+
+
+def instrument_model(model: Any) -> Any:
+    return model if isinstance(model, InstrumentedModel) else InstrumentedModel(model)
+
+
+# --- Caches and event loop ----------------------------------------------------
+
+cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+singleflight_requests = Counter(
+    "singleflight_requests_total", "Coalesced calls: leaders ran the work, shared joined one in flight",
+    ["group", "result"],
+)
+event_loop_lag = Gauge("event_loop_lag_seconds", "Most recent event loop scheduling delay")
+event_loop_lag_histogram = Histogram(
+    "event_loop_lag_seconds_distribution", "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+def cache_lookup(cache: str, hit: bool):
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Measure how late the loop wakes us up; sustained lag means something is blocking it."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        event_loop_lag.set(lag)
+        event_loop_lag_histogram.observe(lag)
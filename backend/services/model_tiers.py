@@ -0,0 +1,150 @@
+"""Per-call-site model routing with escalation on invalid or low-confidence output.
+
+Each @metrics.llm_site function has a route: the tier it starts on, plus
+max_output_tokens and temperature. Structurally simple calls ("I finished 40")
+start on the fast tier. If the response does not parse, or the caller's
+`accept` check rejects it (e.g. low confidence), the same prompt is retried on
+the next tier up.
+
+    result = await model_tiers.generate(prompt, parse=model_tiers.parse_json,
+                                        accept=lambda r: r.get("confidence", 0) >= 0.7)
+
+Transport errors and an open circuit breaker are not escalated; they propagate
+so the caller takes its usual local fallback.
+"""
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import google.generativeai as genai
+
+from services import llm_dispatcher, llm_transport, metrics
+
+TIERS = ["fast", "standard", "strong"]  # escalation order
+TIER_MODELS = {
+    "fast": os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash-lite"),
+    "standard": os.getenv("GEMINI_STANDARD_MODEL", "gemini-2.5-flash"),
+    "strong": os.getenv("GEMINI_STRONG_MODEL", "gemini-2.5-pro"),
+}
+# Highest tier escalation may reach; the strong tier is opt-in per route.
+DEFAULT_CEILING = "standard"
+
+
+class Route:
+    def __init__(self, tier: str, max_output_tokens: Optional[int] = None, temperature: Optional[float] = None,
+                 ceiling: str = DEFAULT_CEILING):
+        self.tier = tier
+        self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
+        self.ceiling = ceiling
+
+    def generation_config(self) -> Dict[str, Any]:
+        config: Dict[str, Any] = {}
+        if self.max_output_tokens is not None:
+            config["max_output_tokens"] = self.max_output_tokens
+        if self.temperature is not None:
+            config["temperature"] = self.temperature
+        return config
+
+    def path(self) -> List[str]:
+        return TIERS[TIERS.index(self.tier):TIERS.index(self.ceiling) + 1] or [self.tier]
+
+
+# Output token caps are left off for standard-tier sites: 2.5 models spend part of the
+# budget on thinking, and a tight cap there yields empty answers.
+SITE_ROUTES: Dict[str, Route] = {
+    # short, structurally simple extractions
+    "parse_progress_update": Route("fast", max_output_tokens=256, temperature=0.0),
+    "match_completion_intent": Route("fast", max_output_tokens=512, temperature=0.0),
+    "generate_daily_summary": Route("fast", max_output_tokens=256, temperature=0.7),
+    "generate_daily_summary_for_date": Route("fast", max_output_tokens=512, temperature=0.5),
+    "summarize_week": Route("fast", max_output_tokens=1024, temperature=0.5),
+    # structured output with several fields or reasoning over history
+    "extract_tasks_from_text": Route("standard", temperature=0.2),
+    "process_journal_entry": Route("standard", temperature=0.2),
+    "suggest_task_breakdown": Route("standard", temperature=0.4),
+    "analyze_productivity_patterns": Route("standard", temperature=0.3),
+    "future_you_suggestions": Route("standard", temperature=0.7),
+    "summarize_month": Route("standard", temperature=0.5),
+    # long-context answers the user reads directly
+    "answer_question": Route("standard", temperature=0.3, ceiling="strong"),
+    "generate_story": Route("standard", temperature=0.8),
+    "generate_story_hierarchical": Route("standard", temperature=0.8),
+}
+DEFAULT_ROUTE = Route("standard")
+
+_models: Dict[str, Any] = {}
+_override: Optional[Any] = None
+
+
+class InvalidResponse(Exception):
+    """Every tier on the route returned output that failed parsing."""
+
+
+def route_for(site: str) -> Route:
+    return SITE_ROUTES.get(site, DEFAULT_ROUTE)
+
+
+def model_for(tier: str) -> Any:
+    if _override is not None:
+        return _override
+    if tier not in _models:
+        name = TIER_MODELS[tier]
+        _models[tier] = metrics.instrument_model(llm_transport.wrap_model(genai.GenerativeModel(name), name))
+    return _models[tier]
+
+
+def use_model(model: Optional[Any]):
+    """Serve every tier from one model object (benchmarks); None restores the real models."""
+    global _override
+    _override = model
+
+
+def parse_text(text: str) -> str:
+    text = text.strip()
+    if not text:
+        raise ValueError("empty response")
+    return text
+
+
+def parse_json(text: str) -> Any:
+    cleaned_text = text.replace('```json', '').replace('```', '').strip()
+    return json.loads(cleaned_text)
+
+
+async def generate(prompt: str, parse: Callable[[str], Any] = parse_text,
+                   accept: Optional[Callable[[Any], bool]] = None) -> Any:
+    """Generate for the current call site, escalating through its tiers until `parse` and `accept` pass.
+
+    A result that parses but fails `accept` on the last tier is returned anyway;
+    one that does not parse on any tier raises InvalidResponse.
+    """
+    site = metrics.current_llm_site()
+    route = route_for(site)
+    config = route.generation_config()
+    kwargs = {"generation_config": config} if config else {}
+    fallback_result, last_error = None, None
+    has_fallback = False
+    for tier in route.path():
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await llm_dispatcher.generate(model_for(tier), prompt, **kwargs)
+            try:
+                result = parse(response.text)
+            except Exception as e:
+                outcome, last_error = "invalid", e
+                continue
+            if accept is not None and not accept(result):
+                outcome = "low_confidence"
+                fallback_result, has_fallback = result, True
+                continue
+            outcome = "ok"
+            return result
+        finally:
+            metrics.llm_tier_calls.inc(site=site, tier=tier, outcome=outcome)
+            metrics.llm_tier_duration.observe(time.perf_counter() - start, site=site, tier=tier)
+    if has_fallback:
+        return fallback_result
+    raise InvalidResponse(f"{site}: no tier returned a valid response ({last_error})")
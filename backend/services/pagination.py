@@ -0,0 +1,88 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+A page is fetched with the query, sorted on `sort` (which ends with `_id`, so
+the order is total), plus a condition selecting the documents after the last
+one returned. The cursor handed to clients is that document's sort values,
+as base64 JSON. It is opaque to clients, and each page costs an index seek
+rather than skipping all earlier documents.
+
+Null and missing values sort before everything else in MongoDB, and `$gt` /
+`$lt` never match across types, so nulls get explicit conditions.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+from services.tracing import traced
+
+Sort = Sequence[Tuple[str, int]]
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+    return value
+
+
+def encode_cursor(doc: Dict[str, Any], sort: Sort) -> str:
+    values = [_encode_value(doc.get(field)) for field, _ in sort]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: Sort) -> List[Any]:
+    """Sort values from a cursor; ValueError if it is malformed or from another sort order."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        decoded = [_decode_value(value) for value in values]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from None
+    if not isinstance(values, list) or len(decoded) != len(sort):
+        raise ValueError("Invalid cursor")
+    return decoded
+
+
+def _after(field: str, direction: int, value: Any) -> Optional[Dict[str, Any]]:
+    """Condition for `field` strictly after `value` in the given direction; None if nothing is."""
+    if value is None:
+        return {field: {"$ne": None}} if direction == 1 else None
+    condition = {field: {"$gt" if direction == 1 else "$lt": value}}
+    if direction == -1:
+        return {"$or": [condition, {field: None}]}    # nulls come last in descending order
+    return condition
+
+
+def after_query(sort: Sort, values: Sequence[Any]) -> Dict[str, Any]:
+    """Documents after `values` in `sort` order: later on the first key, or tied on it and later on the next..."""
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        after = _after(field, direction, values[i])
+        if after is not None:
+            ties = [{name: value} for (name, _), value in zip(sort[:i], values[:i])]
+            branches.append({"$and": ties + [after]} if ties else after)
+    return {"$or": branches} if branches else {"_id": {"$exists": False}}
+
+
+@traced
+async def fetch_page(collection, query: Dict[str, Any], sort: Sort, limit: int, cursor: Optional[str] = None,
+                     projection: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Up to `limit` documents after `cursor`, and the cursor for the next page (None on the last page)."""
+    if cursor:
+        after = after_query(sort, decode_cursor(cursor, sort))
+        query = {"$and": [query, after]} if query else after
+    docs = await collection.find(query, projection).sort(list(sort)).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], sort) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,34 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from database import db
+from services import metrics
+from services.tracing import traced
+
+# Results computed ahead of time by background jobs (or by a previous request),
+# keyed by (kind, key) and guarded by a signature of the data they were built from.
+precomputed_collection = db["precomputed"]
+
+
+def tasks_signature(tasks: List[Dict[str, Any]]) -> str:
+    """Fingerprint of a task list that changes whenever a task is added, removed or updated."""
+    parts = sorted(f"{t.get('_id')}|{t.get('status')}|{t.get('updated_at')}" for t in tasks)
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+@traced
+async def get_precomputed(kind: str, key: str, signature: str) -> Optional[Any]:
+    doc = await precomputed_collection.find_one({"kind": kind, "key": key})
+    hit = bool(doc and doc.get("signature") == signature)
+    metrics.cache_lookup(kind, hit)
+    return doc.get("value") if hit else None
+
+
+@traced
+async def store_precomputed(kind: str, key: str, signature: str, value: Any):
+    await precomputed_collection.update_one(
+        {"kind": kind, "key": key},
+        {"$set": {"kind": kind, "key": key, "signature": signature, "value": value, "computed_at": datetime.utcnow()}},
+        upsert=True,
+    )
@@ -0,0 +1,146 @@
+"""Slow-operation log and event-loop stall detector.
+
+MongoDB commands and Gemini calls slower than SLOW_MONGO_MS / SLOW_LLM_MS are
+written to the `slow_ops` collection together with the request that issued them
+and their parameters. With LOOP_STALL_DEBUG=1 a watchdog thread also watches the
+event loop; when it stops responding for LOOP_STALL_THRESHOLD_MS the watchdog
+captures the loop thread's stack while it is still blocked, which points at the
+synchronous call hiding inside an `async def`.
+
+Records are queued from whichever thread observed them and flushed to MongoDB
+by a background task, so reporting never blocks the caller.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+SLOW_OPS_ENABLED = os.getenv("SLOW_OPS_ENABLED", "1") == "1"
+SLOW_MONGO_MS = float(os.getenv("SLOW_MONGO_MS", "200"))
+SLOW_LLM_MS = float(os.getenv("SLOW_LLM_MS", "5000"))
+LOOP_STALL_DEBUG = os.getenv("LOOP_STALL_DEBUG", "0") == "1"
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "250"))
+SLOW_OPS_COLLECTION = "slow_ops"
+
+_THRESHOLDS_MS = {"mongo": SLOW_MONGO_MS, "llm": SLOW_LLM_MS}
+_MAX_PARAM_CHARS = 1000
+_MAX_STACK_FRAMES = 30
+
+_pending: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+
+# "METHOD /path?query" of the request being served; set by metrics.http_middleware.
+current_request: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_request", default=None)
+
+
+def _params(value: Any) -> str:
+    text = json.dumps(value, default=str, separators=(",", ":"))
+    return text if len(text) <= _MAX_PARAM_CHARS else text[:_MAX_PARAM_CHARS] + "..."
+
+
+def _enqueue(record: Dict[str, Any]):
+    try:
+        _pending.put_nowait(record)
+    except queue.Full:
+        pass
+
+
+def record_slow_op(kind: str, name: str, duration_ms: float, **params: Any):
+    """Queue a `slow_ops` record if `duration_ms` exceeds the threshold for `kind`."""
+    if not SLOW_OPS_ENABLED or duration_ms < _THRESHOLDS_MS.get(kind, 0):
+        return
+    _enqueue({
+        "kind": kind, "name": name, "duration_ms": round(duration_ms, 1),
+        "request": current_request.get(), "params": _params(params), "at": datetime.utcnow(),
+    })
+
+
+def _coroutine_stack(frame) -> List[str]:
+    """Format a stack without the asyncio scheduler frames, so it starts at the running coroutine."""
+    asyncio_dir = os.path.dirname(asyncio.__file__)
+    frames = [f for f in traceback.extract_stack(frame) if not f.filename.startswith(asyncio_dir)]
+    return traceback.format_list(frames[-_MAX_STACK_FRAMES:])
+
+
+class LoopWatchdog:
+    """Thread that notices when the event loop stops ticking and snapshots its stack."""
+
+    def __init__(self, threshold_ms: float, interval: float = 0.05):
+        self.threshold = threshold_ms / 1000.0
+        self.interval = interval
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._stall: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    async def heartbeat(self):
+        self._loop_thread_id = threading.get_ident()
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        try:
+            while True:
+                self._beat = time.monotonic()
+                with self._lock:
+                    stall, self._stall = self._stall, None
+                if stall is not None:
+                    self._report(stall)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            blocked = time.monotonic() - self._beat
+            if blocked < self.threshold:
+                continue
+            with self._lock:
+                if self._stall is not None and self._stall["beat"] == self._beat:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                self._stall = {"beat": self._beat, "stack": _coroutine_stack(frame) if frame else []}
+
+    def _report(self, stall: Dict[str, Any]):
+        duration_ms = (time.monotonic() - stall["beat"] - self.interval) * 1000
+        stack = "".join(stall["stack"])
+        print(f"Event loop blocked for ~{duration_ms:.0f}ms at:\n{stack}")
+        _enqueue({
+            "kind": "loop_stall", "name": "event_loop", "duration_ms": round(duration_ms, 1),
+            "request": None, "params": None, "stack": stack, "at": datetime.utcnow(),
+        })
+
+
+def _drain(limit: int = 500) -> List[Dict[str, Any]]:
+    records = []
+    while len(records) < limit:
+        try:
+            records.append(_pending.get_nowait())
+        except queue.Empty:
+            break
+    return records
+
+
+async def flush_slow_ops(collection, interval: float = 2.0):
+    """Background task: write queued slow-op records to MongoDB in batches."""
+    while True:
+        await asyncio.sleep(interval)
+        records = _drain()
+        if not records:
+            continue
+        try:
+            await collection.insert_many(records, ordered=False)
+        except Exception as e:
+            print(f"Error writing slow_ops: {e}")
+
+
+def start(collection) -> List[asyncio.Task]:
+    """Start the flusher (and the loop watchdog in debug mode); returns the tasks to cancel on shutdown."""
+    tasks = [asyncio.create_task(flush_slow_ops(collection))]
+    if LOOP_STALL_DEBUG:
+        tasks.append(asyncio.create_task(LoopWatchdog(LOOP_STALL_THRESHOLD_MS).heartbeat()))
+    return tasks
@@ -0,0 +1,193 @@
+"""Token budgets for prompts that embed journal entries or tasks.
+
+    prompt = prompt_budget.build_prompt(
+        lambda context: f"... Journal Entries:\n{context}\n...",
+        entries, prompt_budget.ENTRY_LEVELS,
+    )
+
+Each call site (taken from @metrics.llm_site) has a budget in PROMPT_BUDGETS.
+When the rendered context does not fit, it is compacted in stages until it
+does. First cheaper renderings are tried: shorter timestamps, no field labels,
+then `summary` in place of the full text. If the items would not fit even at
+MIN_ITEM_TOKENS each, some are dropped, oldest first (or evenly spaced, for
+stories). The rest are then cut to an equal share of the budget. Each
+compaction is logged, counted on /metrics and recorded in the current trace.
+"""
+import math
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from services import metrics, tracing
+
+# Estimated prompt tokens per call site, including the instructions around the context.
+PROMPT_BUDGETS: Dict[str, int] = {
+    "answer_question": int(os.getenv("ANSWER_PROMPT_BUDGET", "24000")),
+    "generate_story": int(os.getenv("STORY_PROMPT_BUDGET", "16000")),
+    "generate_daily_summary_for_date": int(os.getenv("DAILY_SUMMARY_PROMPT_BUDGET", "4000")),
+    "match_completion_intent": int(os.getenv("COMPLETION_PROMPT_BUDGET", "3000")),
+}
+DEFAULT_BUDGET = 16000
+MIN_ITEM_TOKENS = 24
+
+_SPACE = re.compile(r"\s+")
+
+Level = Tuple[str, Callable[[Any], str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough local token count: ~4 ASCII characters per token, ~1.5 characters for other scripts."""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for c in text if c < "\x80")
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5)
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    estimated = estimate_tokens(text)
+    if estimated <= tokens:
+        return text
+    chars = max(1, int(len(text) * tokens / estimated) - 1)
+    return text[:chars].rstrip() + "…"
+
+
+def short_timestamp(value: Any) -> str:
+    """'2024-05-01T18:42:13.512000' -> '2024-05-01 18:42'."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    text = str(value or "")
+    try:
+        return datetime.fromisoformat(text).strftime("%Y-%m-%d %H:%M")
+    except ValueError:
+        return text[:16]
+
+
+def _compact(text: Any) -> str:
+    return _SPACE.sub(" ", str(text or "")).strip()
+
+
+def _entry_text(entry: Dict[str, Any]) -> str:
+    return entry.get("english_text") or entry.get("raw_text") or ""
+
+
+# Journal entries, most to least detailed.
+ENTRY_LEVELS: List[Level] = [
+    ("full", lambda e: f"Date: {e.get('timestamp')}\nEntry: {_entry_text(e)}"),
+    ("short_timestamps", lambda e: f"{short_timestamp(e.get('timestamp'))}: {_compact(_entry_text(e))}"),
+    ("prefer_summary", lambda e: f"{short_timestamp(e.get('timestamp'))}: {_compact(e.get('summary') or _entry_text(e))}"),
+]
+
+# Entries of a single day, where the timestamp adds nothing.
+DAY_ENTRY_LEVELS: List[Level] = [
+    ("full", lambda e: f"- {_entry_text(e)}"),
+    ("prefer_summary", lambda e: f"- {_compact(e.get('summary') or _entry_text(e))}"),
+]
+
+# Tasks offered to the completion matcher.
+TASK_LEVELS: List[Level] = [
+    ("full", lambda t: f"ID: {t.get('_id', 'unknown')}, Name: {t.get('name')}, "
+                       f"Date: {t.get('scheduled_day') or t.get('scheduled_date')}, Status: {t.get('status')}"),
+    ("compact_fields", lambda t: f"{t.get('_id', 'unknown')} | {_compact(t.get('name'))} | "
+                                 f"{t.get('scheduled_day') or str(t.get('scheduled_date') or '')[:10]} | {t.get('status')}"),
+]
+
+
+def _item_cap(sizes: Sequence[int], available: int) -> int:
+    """Largest per-item token cap such that the capped sizes fit in `available`."""
+    low, high = 0, max(sizes)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if sum(min(s, mid) for s in sizes) <= available:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _select(count: int, total: int, keep: str) -> List[int]:
+    """Indexes of the `count` items kept: the newest (tail) or evenly spaced across the range."""
+    if keep == "spread" and count > 1:
+        return sorted({round(i * (total - 1) / (count - 1)) for i in range(count)})
+    return list(range(total - count, total))
+
+
+def _drop(parts: List[str], sizes: List[int], available: int, keep: str) -> List[int]:
+    """Keep as many items as still fit once each is truncated to MIN_ITEM_TOKENS."""
+    def fits(count: int) -> bool:
+        return sum(min(sizes[i], MIN_ITEM_TOKENS) for i in _select(count, len(parts), keep)) <= available
+
+    low, high = 1, len(parts)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if fits(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return _select(low, len(parts), keep)
+
+
+def fit_context(items: Sequence[Any], levels: Sequence[Level], available: int, separator: str = "\n\n",
+                keep: str = "newest") -> Tuple[str, Dict[str, Any]]:
+    """Render `items` into at most `available` tokens; returns the context and what was done to it."""
+    report: Dict[str, Any] = {"items": len(items), "kept": len(items), "truncated": 0, "steps": []}
+    if not items:
+        report["tokens_before"] = report["tokens_after"] = 0
+        return "", report
+
+    sep_tokens = estimate_tokens(separator)
+    parts: List[str] = []
+    for index, (name, render) in enumerate(levels):
+        parts = [render(item) for item in items]
+        sizes = [estimate_tokens(p) + sep_tokens for p in parts]
+        if index == 0:
+            report["tokens_before"] = sum(sizes)
+        else:
+            report["steps"].append(name)
+        if sum(sizes) <= available:
+            break
+    else:
+        if sum(min(size, MIN_ITEM_TOKENS) for size in sizes) > available:
+            indexes = _drop(parts, sizes, available, keep)
+            parts, sizes = [parts[i] for i in indexes], [sizes[i] for i in indexes]
+            report["steps"].append("dropped_spread" if keep == "spread" else "dropped_oldest")
+            report["kept"] = len(parts)
+        if sum(sizes) > available:
+            cap = max(MIN_ITEM_TOKENS, _item_cap(sizes, available))
+            report["truncated"] = sum(1 for size in sizes if size > cap)
+            parts = [truncate_to_tokens(p, cap - sep_tokens) for p in parts]
+            report["steps"].append("truncated_items")
+
+    context = separator.join(parts)
+    report["tokens_after"] = estimate_tokens(context)
+    return context, report
+
+
+def build_prompt(make_prompt: Callable[[str], str], items: Sequence[Any], levels: Sequence[Level],
+                 budget: Optional[int] = None, separator: str = "\n\n", keep: str = "newest") -> str:
+    """Build the prompt for the current call site, compacting `items` to fit its budget."""
+    site = metrics.current_llm_site()
+    budget = budget or PROMPT_BUDGETS.get(site, DEFAULT_BUDGET)
+    base = estimate_tokens(make_prompt(""))
+    context, report = fit_context(items, levels, max(0, budget - base), separator, keep)
+    prompt = make_prompt(context)
+
+    metrics.prompt_tokens.observe(base + report["tokens_after"], site=site)
+    if report["steps"]:
+        for step in report["steps"]:
+            metrics.prompt_compactions.inc(site=site, step=step)
+        print(
+            f"Prompt for {site} compacted to fit {budget} tokens: "
+            f"{report['tokens_before']} -> {report['tokens_after']} context tokens, "
+            f"kept {report['kept']}/{report['items']} items, truncated {report['truncated']} "
+            f"({', '.join(report['steps'])})"
+        )
+        trace = tracing.current_trace()
+        if trace is not None:
+            tracing.add_completed_span(
+                trace, "prompt_budget.compact", "internal", tracing.current_span_id(), time.time_ns(), 0,
+                site=site, budget=budget, steps=",".join(report["steps"]), items=report["items"],
+                kept=report["kept"], tokens_before=report["tokens_before"], tokens_after=report["tokens_after"],
+            )
+    return prompt
@@ -0,0 +1,164 @@
+"""Compact embedding encodings, for journal documents and for the vector index.
+
+Stored form (EMBEDDING_STORAGE, applied to new entries; migrations.embedding_storage
+converts existing ones):
+    array    `embedding_vector`: list of BSON doubles, ~10KB at 768 dims (legacy)
+    float32  `embedding`: {"format": "float32", "data": <binary>}, 3KB, lossless for ranking
+    int8     `embedding`: {"format": "int8", "data": <binary>, "scale": s}, 0.8KB
+
+Index codes (ANN_QUANTIZATION in services/vector_index): candidates are scored
+on int8 codes (one byte per dimension) or sign bits (one bit per dimension,
+compared by Hamming distance). A shortlist of a few times k (ANN_RERANK_INT8,
+ANN_RERANK_BINARY) is then re-ranked on float vectors. Binary codes are
+index-only: without floats they cannot be re-ranked, so they are never the
+stored form.
+"""
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import bson
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+
+from database import journal_collection
+
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "array")
+STORAGE_FORMATS = ("array", "float32", "int8")
+CODE_FORMATS = ("none", "int8", "binary")
+
+# Projection that keeps embeddings out of documents returned to clients.
+HIDE_EMBEDDINGS = {"embedding_vector": 0, "embedding": 0}
+EMBEDDING_FIELDS = {"embedding_vector": 1, "embedding": 1}
+HAS_EMBEDDING = {"$or": [{"embedding_vector.0": {"$exists": True}}, {"embedding.data": {"$exists": True}}]}
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        return _POPCOUNT[values]
+
+
+def int8_encode(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector scalar quantization: vector ~= codes * scale."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def binary_encode(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits, packed eight dimensions per byte."""
+    return np.packbits(np.atleast_2d(np.asarray(vectors)) > 0, axis=1)
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    return (codes.astype(np.float32) @ query) * scales
+
+
+def binary_scores(codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Higher is closer: minus the Hamming distance between sign bits."""
+    query_bits = binary_encode(query)[0]
+    return -_popcount(np.bitwise_xor(codes, query_bits)).sum(axis=1, dtype=np.int32).astype(np.float32)
+
+
+def encode_for_storage(vector: Optional[Sequence[float]], storage: Optional[str] = None) -> Dict[str, Any]:
+    """Fields to set on a journal document for `vector` in the given (or configured) format."""
+    storage = storage or EMBEDDING_STORAGE
+    if vector is None or len(vector) == 0:
+        return {"embedding_vector": vector}
+    if storage == "float32":
+        data = np.asarray(vector, dtype="<f4").tobytes()
+        return {"embedding": {"format": "float32", "data": Binary(data)}}
+    if storage == "int8":
+        codes, scales = int8_encode(vector)
+        return {"embedding": {"format": "int8", "data": Binary(codes[0].tobytes()), "scale": float(scales[0])}}
+    return {"embedding_vector": list(vector)}
+
+
+def decode_stored(doc: Dict[str, Any]) -> Optional[np.ndarray]:
+    """The float32 embedding of a journal document in any stored format, or None."""
+    vector = doc.get("embedding_vector")
+    if vector:
+        return np.asarray(vector, dtype=np.float32)
+    stored = doc.get("embedding")
+    if not stored or not stored.get("data"):
+        return None
+    if stored.get("format") == "int8":
+        codes = np.frombuffer(stored["data"], dtype=np.int8)
+        return codes.astype(np.float32) * np.float32(stored.get("scale", 1.0))
+    return np.frombuffer(stored["data"], dtype="<f4").astype(np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def recall_at_k(originals: List[np.ndarray], approximations: List[np.ndarray], k: int = 10,
+                queries: int = 200) -> Optional[float]:
+    """Share of each sampled entry's exact k nearest neighbours still found when searching the approximations."""
+    if len(originals) <= k:
+        return None
+    exact = _normalize(np.asarray(originals, dtype=np.float32))
+    approx = _normalize(np.asarray(approximations, dtype=np.float32))
+    query_rows = np.arange(min(queries, len(exact)))
+    found = 0
+    for row in query_rows:
+        truth_scores, approx_scores = exact @ exact[row], approx @ exact[row]
+        truth_scores[row] = approx_scores[row] = -np.inf
+        truth = set(np.argpartition(-truth_scores, k)[:k].tolist())
+        found += len(truth & set(np.argpartition(-approx_scores, k)[:k].tolist()))
+    return found / (k * len(query_rows))
+
+
+async def migrate_storage(target: str, batch_size: int = 500, dry_run: bool = False,
+                          sample_size: int = 5000) -> Dict[str, Any]:
+    """Re-encode journal embeddings into `target` storage; reports bytes saved and recall@10 lost on a sample."""
+    if target not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown embedding storage: {target}")
+    if target == "array":
+        query: Dict[str, Any] = {"embedding.data": {"$exists": True}}
+        unset = {"embedding": ""}
+    else:
+        query = {"$or": [{"embedding_vector.0": {"$exists": True}}, {"embedding.format": {"$exists": True, "$ne": target}}]}
+        unset = {"embedding_vector": ""}
+
+    converted = bytes_before = bytes_after = 0
+    originals: List[np.ndarray] = []
+    approximations: List[np.ndarray] = []
+    batch: List[UpdateOne] = []
+    cursor = journal_collection.find(query, EMBEDDING_FIELDS).batch_size(batch_size)
+    async for doc in cursor:
+        vector = decode_stored(doc)
+        if vector is None:
+            continue
+        fields = encode_for_storage(vector.tolist(), target)
+        bytes_before += len(bson.encode({k: v for k, v in doc.items() if k != "_id"}))
+        bytes_after += len(bson.encode(fields))
+        if len(originals) < sample_size:
+            originals.append(vector)
+            approximations.append(decode_stored(fields))
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields, "$unset": unset}))
+        converted += 1
+        if len(batch) >= batch_size:
+            if not dry_run:
+                await journal_collection.bulk_write(batch, ordered=False)
+            batch = []
+            print(f"{'Checked' if dry_run else 'Converted'} {converted} entries to {target}")
+    if batch and not dry_run:
+        await journal_collection.bulk_write(batch, ordered=False)
+
+    return {
+        "target": target,
+        "converted": converted,
+        "dry_run": dry_run,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "recall_at_10": recall_at_k(originals, approximations),
+        "recall_sample": len(originals),
+    }
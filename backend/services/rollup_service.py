@@ -0,0 +1,150 @@
+import asyncio
+import os
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Any
+
+from database import db, journal_collection
+from services import llm_dispatcher
+from services.tracing import traced
+from services.analysis_service import (
+    generate_daily_summary_for_date, summarize_week, summarize_month,
+    entry_date, week_start_of, month_of_week
+)
+
+# Weekly and monthly summaries built on top of `daily_summaries`.
+# Ingestion only marks the affected week/month dirty; the rollup job regenerates
+# dirty periods in the background so long-range reads touch a handful of documents.
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "3600"))
+ROLLUP_CONCURRENCY = 4
+
+weekly_collection = db["weekly_summaries"]
+monthly_collection = db["monthly_summaries"]
+
+_ENTRY_PROJECTION = {"timestamp": 1, "english_text": 1, "raw_text": 1, "summary": 1}
+
+
+@traced
+async def mark_dirty(timestamp: datetime):
+    """Flag the week and month containing `timestamp` for regeneration."""
+    week_key = week_start_of(timestamp.date()).isoformat()
+    now = datetime.utcnow()
+    await weekly_collection.update_one(
+        {"week_start": week_key}, {"$set": {"dirty": True, "dirty_at": now}}, upsert=True
+    )
+    await monthly_collection.update_one(
+        {"month": month_of_week(week_key)}, {"$set": {"dirty": True, "dirty_at": now}}, upsert=True
+    )
+
+
+async def mark_all_dirty() -> int:
+    """Flag every period that has journal entries (used to backfill rollups)."""
+    cursor = journal_collection.find({}, {"timestamp": 1})
+    week_keys = set()
+    async for e in cursor:
+        d = entry_date(e)
+        if d:
+            week_keys.add(week_start_of(d).isoformat())
+    now = datetime.utcnow()
+    for week_key in week_keys:
+        await weekly_collection.update_one(
+            {"week_start": week_key}, {"$set": {"dirty": True, "dirty_at": now}}, upsert=True
+        )
+    for month_key in {month_of_week(k) for k in week_keys}:
+        await monthly_collection.update_one(
+            {"month": month_key}, {"$set": {"dirty": True, "dirty_at": now}}, upsert=True
+        )
+    return len(week_keys)
+
+
+async def _entries_between(start: date, end: date) -> List[Dict[str, Any]]:
+    query = {"timestamp": {"$gte": datetime.combine(start, time.min), "$lt": datetime.combine(end, time.min)}}
+    cursor = journal_collection.find(query, _ENTRY_PROJECTION).sort("timestamp", 1)
+    return await cursor.to_list(length=None)
+
+
+async def _clear_dirty(collection, key: Dict[str, Any], started: datetime):
+    # Entries that arrived while the period was being regenerated keep it dirty.
+    await collection.update_one(
+        {**key, "dirty_at": {"$lte": started}}, {"$set": {"dirty": False}}
+    )
+
+
+async def rollup_week(week_key: str, started: datetime, semaphore: asyncio.Semaphore) -> bool:
+    """Regenerate stale daily summaries for a week, then the week summary itself."""
+    week_start = date.fromisoformat(week_key)
+    entries = await _entries_between(week_start, week_start + timedelta(days=7))
+    if not entries:
+        await weekly_collection.delete_one({"week_start": week_key, "dirty_at": {"$lte": started}})
+        return True
+
+    by_day: Dict[str, List[Dict[str, Any]]] = {}
+    for e in entries:
+        by_day.setdefault(entry_date(e).isoformat(), []).append(e)
+
+    daily_docs = await db["daily_summaries"].find({"date": {"$in": list(by_day)}}).to_list(length=None)
+    daily = {d["date"]: d for d in daily_docs}
+    stale = [d for d in by_day if daily.get(d, {}).get("count") != len(by_day[d])]
+
+    async def refresh_day(day_str: str):
+        async with semaphore:
+            daily[day_str] = await generate_daily_summary_for_date(day_str, by_day[day_str])
+
+    await asyncio.gather(*[refresh_day(d) for d in stale])
+
+    result = await summarize_week(week_start, entries, daily, None, semaphore)
+    if not result["summary"]:
+        return False
+    await _clear_dirty(weekly_collection, {"week_start": week_key}, started)
+    return True
+
+
+async def rollup_month(month_key: str, started: datetime, semaphore: asyncio.Semaphore) -> bool:
+    """Combine the month's weekly summaries into a monthly summary."""
+    cursor = weekly_collection.find(
+        {"week_start": {"$regex": f"^{month_key}-"}, "summary": {"$exists": True}}
+    ).sort("week_start", 1)
+    weeks = await cursor.to_list(length=None)
+    if not weeks:
+        await monthly_collection.delete_one({"month": month_key, "dirty_at": {"$lte": started}})
+        return True
+
+    result = await summarize_month(month_key, weeks, semaphore)
+    if not result["summary"]:
+        return False
+    await monthly_collection.update_one(
+        {"month": month_key},
+        {"$set": {
+            "month": month_key,
+            "summary": result["summary"],
+            "count": sum(w.get("count", 0) for w in weeks),
+            "weeks": [w["week_start"] for w in weeks],
+            "updated_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+    await _clear_dirty(monthly_collection, {"month": month_key}, started)
+    return True
+
+
+@llm_dispatcher.background
+async def run_rollups() -> Dict[str, Any]:
+    """Regenerate every dirty week, then every dirty month."""
+    started = datetime.utcnow()
+    semaphore = asyncio.Semaphore(ROLLUP_CONCURRENCY)
+
+    dirty_weeks = await weekly_collection.find({"dirty": True}, {"week_start": 1}).to_list(length=None)
+    week_results = await asyncio.gather(*[
+        rollup_week(w["week_start"], started, semaphore) for w in dirty_weeks
+    ])
+
+    dirty_months = await monthly_collection.find({"dirty": True}, {"month": 1}).to_list(length=None)
+    month_results = await asyncio.gather(*[
+        rollup_month(m["month"], started, semaphore) for m in dirty_months
+    ])
+
+    return {
+        "weeks": sum(1 for ok in week_results if ok),
+        "months": sum(1 for ok in month_results if ok),
+        "failed": sum(1 for ok in list(week_results) + list(month_results) if not ok),
+    }
+
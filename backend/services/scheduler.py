@@ -0,0 +1,245 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+class CronSchedule:
+    """Minimal 5-field cron expression: minute hour day-of-month month day-of-week.
+
+    Supports `*`, numbers, lists (`1,15`), ranges (`1-5`) and steps (`*/10`, `0-30/5`).
+    Day-of-week uses 0 (or 7) for Sunday. Times are evaluated in server local time,
+    matching how task and journal dates are stored.
+    """
+
+    _RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+        self.expression = expression
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, self._RANGES)]
+        self.minutes, self.hours, self.days, self.months, dows = parsed
+        self.weekdays = {d % 7 for d in dows}
+        self.day_restricted = fields[2] != "*"
+        self.weekday_restricted = fields[4] != "*"
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> Set[int]:
+        values: Set[int] = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_str = part.split("/", 1)
+                step = int(step_str)
+            if part == "*":
+                start, end = lo, hi
+            elif "-" in part:
+                start, end = (int(x) for x in part.split("-", 1))
+            else:
+                start = end = int(part)
+            if start < lo or end > hi or start > end or step < 1:
+                raise ValueError(f"Invalid cron field {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, t: datetime) -> bool:
+        dom = t.day in self.days
+        dow = (t.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return dom or dow
+        return dom and dow
+
+    def next_after(self, after: datetime) -> datetime:
+        t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=366 * 4)
+        while t <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+class Job:
+    """A registered background job with either an interval or a cron schedule.
+
+    A `local` job maintains per-process state: every worker runs it on its own
+    schedule, without the MongoDB lease.
+    """
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[object]], interval_seconds: Optional[int] = None,
+                 cron: Optional[str] = None, lease_seconds: int = 600, local: bool = False):
+        if (interval_seconds is None) == (cron is None):
+            raise ValueError("Job needs exactly one of interval_seconds or cron")
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.cron = CronSchedule(cron) if cron else None
+        self.lease_seconds = lease_seconds
+        self.local = local
+
+    def first_run(self, now: datetime) -> datetime:
+        # Interval jobs run soon after startup; cron jobs wait for their next slot.
+        return now if self.cron is None else self.cron.next_after(now)
+
+    def next_run(self, now: datetime) -> datetime:
+        if self.cron is not None:
+            return self.cron.next_after(now)
+        return now + timedelta(seconds=self.interval_seconds)
+
+
+class Scheduler:
+    """In-process asyncio scheduler coordinated across workers through MongoDB.
+
+    Each job has one document in `collection` holding its next run time and a lease.
+    A worker runs a job only after atomically claiming a due, unleased job document,
+    so with several uvicorn workers each run happens exactly once. The lease is
+    renewed while the job runs, so a slow run (e.g. serial Gemini calls) is not
+    claimed again by another worker when its first lease period ends. Local jobs
+    keep their schedule and last run in memory instead.
+    """
+
+    def __init__(self, collection, tick_seconds: int = 15):
+        self.collection = collection
+        self.tick_seconds = tick_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs: Dict[str, Job] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._local: Dict[str, dict] = {}   # local job name -> its schedule document, kept in memory
+
+    def add_job(self, name: str, func: Callable[[], Awaitable[object]], interval_seconds: Optional[int] = None,
+                cron: Optional[str] = None, lease_seconds: int = 600, local: bool = False) -> Job:
+        job = Job(name, func, interval_seconds=interval_seconds, cron=cron, lease_seconds=lease_seconds, local=local)
+        self.jobs[name] = job
+        return job
+
+    async def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        tasks: List[asyncio.Task] = list(self._running.values())
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def status(self) -> List[dict]:
+        cursor = self.collection.find({"_id": {"$in": [name for name, job in self.jobs.items() if not job.local]}})
+        docs = await cursor.to_list(length=None)
+        local = [{**doc, "name": name, "local": True, "worker": self.worker_id} for name, doc in self._local.items()]
+        return [{**doc, "name": doc.pop("_id")} for doc in docs] + local
+
+    async def run_now(self, name: str) -> bool:
+        """Make a job due immediately; the next tick on any worker (this one, for a local job) picks it up."""
+        if name not in self.jobs:
+            return False
+        if self.jobs[name].local:
+            self._local.setdefault(name, {})["next_run_at"] = datetime.now()
+            return True
+        await self._ensure_document(self.jobs[name], datetime.now())
+        await self.collection.update_one({"_id": name}, {"$set": {"next_run_at": datetime.now()}})
+        return True
+
+    async def _run_loop(self):
+        while True:
+            now = datetime.now()
+            for job in self.jobs.values():
+                if job.name in self._running:
+                    continue
+                try:
+                    if job.local:
+                        state = self._local.setdefault(job.name, {"next_run_at": job.first_run(now)})
+                        if state["next_run_at"] <= now:
+                            self._running[job.name] = asyncio.create_task(self._execute(job))
+                    elif await self._claim(job, now):
+                        self._running[job.name] = asyncio.create_task(self._execute(job))
+                except Exception as e:
+                    print(f"Scheduler error claiming {job.name}: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def _ensure_document(self, job: Job, now: datetime):
+        try:
+            await self.collection.update_one(
+                {"_id": job.name},
+                {"$setOnInsert": {"next_run_at": job.first_run(now), "lease_owner": None, "lease_expires_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass  # another worker created it first
+
+    async def _claim(self, job: Job, now: datetime) -> bool:
+        await self._ensure_document(job, now)
+        doc = await self.collection.find_one_and_update(
+            {"_id": job.name, "next_run_at": {"$lte": now}, "lease_expires_at": {"$lte": now}},
+            {"$set": {"lease_owner": self.worker_id, "lease_expires_at": now + timedelta(seconds=job.lease_seconds)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc is not None
+
+    async def _renew_lease(self, job: Job):
+        """Extend this worker's lease every third of a lease period until cancelled."""
+        while True:
+            await asyncio.sleep(job.lease_seconds / 3)
+            try:
+                result = await self.collection.update_one(
+                    {"_id": job.name, "lease_owner": self.worker_id},
+                    {"$set": {"lease_expires_at": datetime.now() + timedelta(seconds=job.lease_seconds)}},
+                )
+                if result.matched_count == 0:
+                    print(f"Scheduler lost the lease on {job.name} while it was running")
+                    return
+            except Exception as e:
+                print(f"Scheduler error renewing lease on {job.name}: {e}")
+
+    async def _execute(self, job: Job):
+        started = datetime.now()
+        status, error, result = "ok", None, None
+        heartbeat = None if job.local else asyncio.create_task(self._renew_lease(job))
+        try:
+            result = await job.func()
+        except asyncio.CancelledError:
+            status, error = "cancelled", "worker shutting down"
+            raise
+        except Exception as e:
+            status, error = "error", str(e)
+            print(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            finished = datetime.now()
+            self._running.pop(job.name, None)
+            update = {
+                "last_run_at": started,
+                "last_duration_ms": round((finished - started).total_seconds() * 1000, 1),
+                "last_status": status,
+                "last_error": error,
+                "last_result": result if isinstance(result, (dict, int, float, str)) else None,
+                "lease_owner": None,
+                "lease_expires_at": finished,
+            }
+            if status != "cancelled":
+                update["next_run_at"] = job.next_run(finished)
+            if job.local:
+                for field in ("lease_owner", "lease_expires_at"):
+                    update.pop(field)
+                self._local.setdefault(job.name, {}).update(update)
+            else:
+                await asyncio.shield(self.collection.update_one(
+                    {"_id": job.name, "lease_owner": self.worker_id}, {"$set": update}
+                ))
@@ -0,0 +1,142 @@
+"""Metadata filters for /api/search (date range, tags, mood, goal), applied inside the indexes.
+
+The vector and lexical indexes keep per-row metadata: the entry's timestamp in
+an int64 array, and postings (the rows carrying each label, e.g. "tag:work",
+"mood:calm", "goal:<id>"). A filter becomes a boolean mask over the rows
+(a pre-filter bitmap) before anything is scored, so a narrow filter only
+scores the vectors it selects.
+
+Within a field, values are alternatives (tags=work,health matches either tag).
+Across fields, all conditions must hold.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+METADATA_FIELDS = {"timestamp": 1, "tags": 1, "mood": 1, "goal_ids": 1}
+NO_TIME = np.iinfo(np.int64).min     # rows without a timestamp never match a date range
+
+Metadata = Tuple[int, List[str]]     # (timestamp in seconds, labels)
+
+
+def to_seconds(value: Any) -> int:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return NO_TIME
+    if not isinstance(value, datetime):
+        return NO_TIME
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)   # entries are stamped with local datetime.now()
+    return int(np.datetime64(value, "s").astype(np.int64))
+
+
+def _values(value: Any) -> List[str]:
+    if value is None:
+        return []
+    items = value if isinstance(value, (list, tuple)) else [value]
+    return [str(item).strip().lower() for item in items if str(item).strip()]
+
+
+def entry_labels(doc: Dict[str, Any]) -> List[str]:
+    labels = [f"tag:{tag}" for tag in _values(doc.get("tags"))]
+    labels += [f"mood:{mood}" for mood in _values(doc.get("mood"))]
+    labels += [f"goal:{goal_id}" for goal_id in doc.get("goal_ids") or []]
+    return sorted(set(labels))
+
+
+def entry_metadata(doc: Dict[str, Any]) -> Metadata:
+    return to_seconds(doc.get("timestamp")), entry_labels(doc)
+
+
+class LabelPostings:
+    """Rows carrying each label: a frozen base array per label (often memory-mapped) plus rows added since."""
+
+    def __init__(self):
+        self._base: Dict[str, np.ndarray] = {}
+        self._extra: Dict[str, List[int]] = {}
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def add(self, row: int, labels: Iterable[str]):
+        for label in labels:
+            self._extra.setdefault(label, []).append(row)
+            self._cache.pop(label, None)
+
+    def labels(self) -> List[str]:
+        return sorted(set(self._base) | set(self._extra))
+
+    def rows(self, label: str) -> np.ndarray:
+        rows = self._cache.get(label)
+        if rows is None:
+            rows = self._base.get(label, np.empty(0, dtype=np.int64))
+            extra = self._extra.get(label)
+            if extra:
+                rows = np.concatenate([rows, np.asarray(extra, dtype=np.int64)])
+            self._cache[label] = rows
+        return rows
+
+    def renumbered(self, mapping: np.ndarray) -> "LabelPostings":
+        """Postings after rows are renumbered: `mapping[old row]` is the new row, or -1 if dropped."""
+        postings = LabelPostings()
+        for label in self.labels():
+            rows = mapping[self.rows(label)]
+            rows = rows[rows >= 0]
+            if len(rows):
+                postings._base[label] = rows
+        return postings
+
+    def export(self, mapping: np.ndarray) -> Dict[str, np.ndarray]:
+        postings = self.renumbered(mapping)
+        names = postings.labels()
+        rows = [postings._base[label] for label in names]
+        return {
+            "labels": np.array(names, dtype=str) if names else np.empty(0, dtype="U1"),
+            "label_rows": np.concatenate(rows) if rows else np.empty(0, dtype=np.int64),
+            "label_bounds": np.cumsum([0] + [len(r) for r in rows]).astype(np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "LabelPostings":
+        postings = cls()
+        if "labels" in arrays:
+            rows, bounds = arrays["label_rows"], arrays["label_bounds"]
+            for i, label in enumerate(arrays["labels"].tolist()):
+                postings._base[label] = rows[bounds[i]:bounds[i + 1]]
+        return postings
+
+
+class SearchFilter:
+    """Conditions on entry metadata; empty conditions match everything."""
+
+    def __init__(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 tags: Optional[Sequence[str]] = None, moods: Optional[Sequence[str]] = None,
+                 goal_ids: Optional[Sequence[str]] = None):
+        self.since = since
+        self.until = until
+        self.groups = [group for group in (
+            [f"tag:{tag}" for tag in _values(tags)],
+            [f"mood:{mood}" for mood in _values(moods)],
+            [f"goal:{goal_id}" for goal_id in goal_ids or []],
+        ) if group]
+
+    def __bool__(self) -> bool:
+        return bool(self.since or self.until or self.groups)
+
+    def mask(self, count: int, timestamps: Iterable[np.ndarray], postings: LabelPostings) -> np.ndarray:
+        """Boolean mask over rows 0..count-1; `timestamps` yields the per-row timestamps in consecutive chunks."""
+        allowed = np.ones(count, dtype=bool)
+        if self.since or self.until:
+            low = to_seconds(self.since) if self.since else NO_TIME + 1
+            high = to_seconds(self.until) if self.until else np.iinfo(np.int64).max
+            allowed = np.concatenate([np.empty(0, dtype=bool)] + [
+                (chunk >= low) & (chunk <= high) for chunk in timestamps
+            ])[:count]
+        for group in self.groups:
+            matches = np.zeros(count, dtype=bool)
+            for label in group:
+                rows = postings.rows(label)
+                matches[rows[rows < count]] = True
+            allowed &= matches
+        return allowed
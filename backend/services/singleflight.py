@@ -0,0 +1,41 @@
+"""Coalesce concurrent identical calls into one computation.
+
+    summaries = SingleFlight("task_summary")
+    result = await summaries.do(date_key, lambda: build_summary(date))
+
+While a call for `key` is in flight, later callers with the same key await the
+same task instead of starting their own Mongo scan or Gemini request. Nothing is
+cached once the call finishes; that is what the precomputed results are for.
+The shared task is shielded, so a caller that disconnects does not cancel the
+work for the others.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from services import metrics
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an error nobody awaited isn't logged as lost
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            metrics.singleflight_requests.inc(group=self.name, result="leader")
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            metrics.singleflight_requests.inc(group=self.name, result="shared")
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
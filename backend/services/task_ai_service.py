@@ -5,6 +5,7 @@ import re
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple
+from services import metrics, model_tiers, prompt_budget
 
 load_dotenv()
 
@@ -12,9 +13,29 @@ API_KEY = os.getenv("GEMINI_API_KEY")
 if API_KEY:
     genai.configure(api_key=API_KEY)
 
-model = genai.GenerativeModel('gemini-2.5-flash')
 
+def _parse_extraction(text: str) -> Dict[str, Any]:
+    result = model_tiers.parse_json(text)
+    if not isinstance(result.get("tasks"), list):
+        raise ValueError("response has no 'tasks' list")
+    return result
 
+
+def _parse_completion_match(text: str) -> Dict[str, Any]:
+    result = model_tiers.parse_json(text)
+    if not isinstance(result.get("matched_task_ids"), list):
+        raise ValueError("response has no 'matched_task_ids' list")
+    return result
+
+
+def _parse_progress(text: str) -> Dict[str, Any]:
+    result = model_tiers.parse_json(text)
+    if not isinstance(result.get("amount_completed"), (int, float)):
+        raise ValueError("response has no numeric 'amount_completed'")
+    return result
+
+
+@metrics.llm_site
 async def extract_tasks_from_text(text: str, current_date: datetime = None) -> Dict[str, Any]:
     """
     Extract tasks from natural language input.
@@ -95,12 +116,10 @@ async def extract_tasks_from_text(text: str, current_date: datetime = None) -> D
     """
     
     try:
-        response = model.generate_content(prompt)
-        cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
-        result = json.loads(cleaned_text)
-        return result
+        return await model_tiers.generate(prompt, parse=_parse_extraction)
     except Exception as e:
         print(f"Error extracting tasks: {e}")
+        metrics.record_fallback()
         # Fallback: simple regex-based extraction
         return _fallback_task_extraction(text, current_date)
 
@@ -148,6 +167,7 @@ def _fallback_task_extraction(text: str, current_date: datetime) -> Dict[str, An
     }
 
 
+@metrics.llm_site
 async def match_completion_intent(text: str, existing_tasks: List[Dict[str, Any]], date: datetime = None) -> Dict[str, Any]:
     """
     When user says they completed something, match it to existing tasks.
@@ -157,13 +177,8 @@ async def match_completion_intent(text: str, existing_tasks: List[Dict[str, Any]
     
     date_str = date.strftime("%Y-%m-%d")
     
-    # Create a summary of existing tasks
-    tasks_summary = "\n".join([
-        f"ID: {task.get('_id', 'unknown')}, Name: {task.get('name')}, Date: {task.get('scheduled_date')}, Status: {task.get('status')}"
-        for task in existing_tasks
-    ])
-    
-    prompt = f"""
+    # Summarize the existing tasks, compacted to the call's token budget
+    prompt = prompt_budget.build_prompt(lambda tasks_summary: f"""
     The user said: "{text}"
     
     This appears to be a completion statement (they finished something).
@@ -186,15 +201,15 @@ async def match_completion_intent(text: str, existing_tasks: List[Dict[str, Any]
     }}
     
     If nothing matches well, return empty matched_task_ids and set needs_clarification to true.
-    """
+    """, existing_tasks, prompt_budget.TASK_LEVELS, separator="\n")
     
     try:
-        response = model.generate_content(prompt)
-        cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
-        result = json.loads(cleaned_text)
-        return result
+        return await model_tiers.generate(
+            prompt, parse=_parse_completion_match, accept=lambda r: r.get('confidence', 0) >= 0.6
+        )
     except Exception as e:
         print(f"Error matching completion: {e}")
+        metrics.record_fallback()
         return {
             "matched_task_ids": [],
             "confidence": 0.0,
@@ -203,6 +218,7 @@ async def match_completion_intent(text: str, existing_tasks: List[Dict[str, Any]
         }
 
 
+@metrics.llm_site
 async def parse_progress_update(text: str, task: Dict[str, Any]) -> Dict[str, Any]:
     """
     Parse quantitative progress updates like "I finished 40 today".
@@ -228,12 +244,12 @@ async def parse_progress_update(text: str, task: Dict[str, Any]) -> Dict[str, An
     """
     
     try:
-        response = model.generate_content(prompt)
-        cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
-        result = json.loads(cleaned_text)
-        return result
+        return await model_tiers.generate(
+            prompt, parse=_parse_progress, accept=lambda r: r.get('confidence', 0) >= 0.7
+        )
     except Exception as e:
         print(f"Error parsing progress: {e}")
+        metrics.record_fallback()
         # Try regex fallback
         numbers = re.findall(r'\d+', text)
         if numbers:
@@ -249,6 +265,7 @@ async def parse_progress_update(text: str, task: Dict[str, Any]) -> Dict[str, An
         }
 
 
+@metrics.llm_site
 async def suggest_task_breakdown(task_name: str, task_description: str = None) -> Dict[str, Any]:
     """
     Suggest breaking a large task into smaller subtasks.
@@ -277,12 +294,10 @@ async def suggest_task_breakdown(task_name: str, task_description: str = None) -
     """
     
     try:
-        response = model.generate_content(prompt)
-        cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
-        result = json.loads(cleaned_text)
-        return result
+        return await model_tiers.generate(prompt, parse=model_tiers.parse_json)
     except Exception as e:
         print(f"Error suggesting breakdown: {e}")
+        metrics.record_fallback()
         return {
             "should_break_down": False,
             "reason": "Unable to analyze task complexity",
@@ -290,6 +305,7 @@ async def suggest_task_breakdown(task_name: str, task_description: str = None) -
         }
 
 
+@metrics.llm_site
 async def generate_daily_summary(tasks: List[Dict[str, Any]], date: datetime = None) -> str:
     """
     Generate end-of-day summary with celebration or encouragement.
@@ -331,10 +347,10 @@ async def generate_daily_summary(tasks: List[Dict[str, Any]], date: datetime = N
     """
     
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return await model_tiers.generate(prompt)
     except Exception as e:
         print(f"Error generating summary: {e}")
+        metrics.record_fallback()
         if len(completed) == len(tasks) and len(tasks) > 0:
             return f"🎉 Amazing work! You completed all {len(tasks)} tasks today!"
         elif len(completed) > 0:
@@ -343,6 +359,7 @@ async def generate_daily_summary(tasks: List[Dict[str, Any]], date: datetime = N
             return "Let's make tomorrow count! 💪"
 
 
+@metrics.llm_site
 async def analyze_productivity_patterns(task_history: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Analyze historical task data for productivity insights.
@@ -384,12 +401,10 @@ async def analyze_productivity_patterns(task_history: List[Dict[str, Any]]) -> D
     """
     
     try:
-        response = model.generate_content(prompt)
-        cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
-        result = json.loads(cleaned_text)
-        return result
+        return await model_tiers.generate(prompt, parse=model_tiers.parse_json)
     except Exception as e:
         print(f"Error analyzing patterns: {e}")
+        metrics.record_fallback()
         return {
             "most_productive_day": "Unknown",
             "completion_rate": 0.0,
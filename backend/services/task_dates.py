@@ -0,0 +1,160 @@
+"""Normalization of task dates.
+
+Tasks store `scheduled_date` and `due_date` as UTC datetimes, and
+`scheduled_day`, the local calendar day of `scheduled_date` ("YYYY-MM-DD").
+Day lookups and day ranges query `scheduled_day`. It is an ISO string, so
+equality and range scans on it are index-friendly, and it is correct whatever
+format the LLM produced.
+
+Input strings are read as local wall-clock time unless they carry an offset.
+A date without a time is local midnight of that day. Naive datetimes are taken
+to be UTC already, as MongoDB returns them. A value that cannot be parsed is
+stored as None, and the original text is kept in `<field>_text`.
+"""
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+TASK_DATE_FIELDS = ("scheduled_date", "due_date")
+DAY_FORMAT = "%Y-%m-%d"
+
+# Tried in order after ISO 8601; day-first, as users write dates here
+_FORMATS = [
+    "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y",
+    "%Y-%m-%d %H:%M", "%Y-%m-%d %I:%M %p", "%d/%m/%Y %H:%M",
+    "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y", "%A, %B %d, %Y", "%a, %b %d, %Y",
+]
+_EMPTY = {"", "null", "none", "n/a", "tbd"}
+
+
+def _to_utc(value: datetime) -> datetime:
+    """Naive UTC datetime for an aware value, or for a naive one in local time."""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _parse_string(text: str) -> Tuple[Optional[datetime], Optional[str]]:
+    """(UTC datetime, name of the matching format) for a date string; (None, None) if unparseable."""
+    try:
+        parsed = datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith("Z") else text)
+        return _to_utc(parsed), "iso" if ("T" in text or " " in text) else DAY_FORMAT
+    except ValueError:
+        pass
+    for fmt in _FORMATS:
+        try:
+            return _to_utc(datetime.strptime(text, fmt)), fmt
+        except ValueError:
+            continue
+    return None, None
+
+
+def parse_task_date(value: Any) -> Optional[datetime]:
+    """UTC datetime for a task date in any supported form; None if empty or unparseable."""
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    if isinstance(value, date):
+        return _to_utc(datetime.combine(value, time.min))
+    if isinstance(value, str) and value.strip().lower() not in _EMPTY:
+        return _parse_string(value.strip())[0]
+    return None
+
+
+def day_key(value: Optional[datetime]) -> Optional[str]:
+    """Local calendar day of a UTC datetime, e.g. "2025-12-20"."""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc).astimezone().strftime(DAY_FORMAT)
+
+
+def local_day(value: Any) -> Optional[str]:
+    """Day key for user input such as ?date=2025-12-20 or a local datetime."""
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.strftime(DAY_FORMAT)     # callers pass local datetimes (datetime.now(), strptime)
+    return day_key(parse_task_date(value))
+
+
+def scheduled_day_of(task: Dict[str, Any]) -> Optional[str]:
+    """A task's day, also for documents the migration has not reached yet."""
+    return task.get("scheduled_day") or day_key(parse_task_date(task.get("scheduled_date")))
+
+
+def normalize_task_dates(task: Dict[str, Any]) -> List[str]:
+    """Convert the date fields present in `task` (a new task or an update) in place.
+
+    Returns the fields whose value could not be parsed.
+    """
+    unparseable = []
+    for field in TASK_DATE_FIELDS:
+        if field not in task:
+            continue
+        value = task[field]
+        parsed = parse_task_date(value)
+        if parsed is None and isinstance(value, str) and value.strip().lower() not in _EMPTY:
+            print(f"Unrecognised {field} {value!r}; storing it as text")
+            task[f"{field}_text"] = value
+            unparseable.append(field)
+        task[field] = parsed
+    if "scheduled_date" in task:
+        task["scheduled_day"] = day_key(task["scheduled_date"])
+    return unparseable
+
+
+async def migrate_task_dates(tasks_collection, batch_size: int = 500, dry_run: bool = False) -> Dict[str, Any]:
+    """Rewrite string task dates as UTC datetimes and fill `scheduled_day`, reporting progress.
+
+    Values that cannot be parsed are handled as in normalize_task_dates: stored as None with the
+    original kept in `<field>_text`, and listed in the report. Every field is then a date or None,
+    so re-running only picks up tasks that still need converting.
+    """
+    query = {"$or": [
+        {"scheduled_date": {"$type": "string"}},
+        {"due_date": {"$type": "string"}},
+        {"scheduled_date": {"$type": "date"}, "scheduled_day": {"$exists": False}},
+    ]}
+    total = await tasks_collection.count_documents(query)
+    print(f"{total} tasks to {'check' if dry_run else 'migrate'}")
+
+    scanned = converted = 0
+    formats: Dict[str, int] = {}
+    unparseable: List[Dict[str, Any]] = []
+    batch: List[UpdateOne] = []
+    cursor = tasks_collection.find(query, {field: 1 for field in TASK_DATE_FIELDS}).batch_size(batch_size)
+    async for task in cursor:
+        scanned += 1
+        updates: Dict[str, Any] = {}
+        for field in TASK_DATE_FIELDS:
+            value = task.get(field)
+            if not isinstance(value, str):
+                continue
+            if value.strip().lower() in _EMPTY:
+                updates[field] = None
+                continue
+            parsed, fmt = _parse_string(value.strip())
+            if parsed is None:
+                unparseable.append({"_id": str(task["_id"]), "field": field, "value": value})
+                updates[f"{field}_text"] = value
+            else:
+                formats[fmt] = formats.get(fmt, 0) + 1
+            updates[field] = parsed
+        scheduled = updates.get("scheduled_date", task.get("scheduled_date"))
+        if isinstance(scheduled, datetime) or (scheduled is None and "scheduled_date" in updates):
+            updates["scheduled_day"] = day_key(scheduled)
+        if updates:
+            batch.append(UpdateOne({"_id": task["_id"]}, {"$set": updates}))
+            converted += 1
+        if len(batch) >= batch_size:
+            if not dry_run:
+                await tasks_collection.bulk_write(batch, ordered=False)
+            batch = []
+            print(f"{scanned}/{total} tasks scanned ({scanned * 100 // max(total, 1)}%), "
+                  f"{converted} converted, {len(unparseable)} unparseable")
+    if batch and not dry_run:
+        await tasks_collection.bulk_write(batch, ordered=False)
+
+    return {
+        "scanned": scanned,
+        "converted": converted,
+        "dry_run": dry_run,
+        "formats": formats,
+        "unparseable": unparseable,
+    }
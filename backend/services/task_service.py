@@ -1,7 +1,14 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from bson import ObjectId
 
+from services import task_dates
+from services.pagination import fetch_page
+from services.tracing import traced
+
+# Task lists are ordered by schedule; _id breaks ties so cursors are exact
+TASK_SORT = [("scheduled_date", 1), ("_id", 1)]
+
 
 class TaskService:
     """Business logic for task operations"""
@@ -10,8 +17,12 @@ class TaskService:
         self.tasks_collection = tasks_collection
         self.task_history_collection = task_history_collection
     
+    @traced
     async def create_task(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new task and save to database"""
+        # Store dates as UTC datetimes with a day key for lookups
+        task_dates.normalize_task_dates(task_data)
+        
         # Add timestamps
         task_data['created_at'] = datetime.now()
         task_data['updated_at'] = datetime.now()
@@ -25,6 +36,7 @@ class TaskService:
         
         return task_data
     
+    @traced
     async def get_task_by_id(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get a single task by ID"""
         try:
@@ -35,11 +47,12 @@ class TaskService:
         except:
             return None
     
+    @traced
     async def get_tasks(self, filters: Dict[str, Any] = None, limit: int = 100) -> List[Dict[str, Any]]:
         """Get tasks with optional filtering"""
         query = filters or {}
         
-        cursor = self.tasks_collection.find(query).sort("scheduled_date", 1).limit(limit)
+        cursor = self.tasks_collection.find(query).sort(TASK_SORT).limit(limit)
         tasks = await cursor.to_list(length=limit)
         
         # Convert ObjectId to string
@@ -48,12 +61,25 @@ class TaskService:
         
         return tasks
     
+    @traced
+    async def get_tasks_page(self, filters: Dict[str, Any] = None, limit: int = 100,
+                             cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of tasks after `cursor`, and the cursor of the next page (None on the last).
+        
+        Raises ValueError for a malformed cursor.
+        """
+        tasks, next_cursor = await fetch_page(self.tasks_collection, filters or {}, TASK_SORT, limit, cursor)
+        for task in tasks:
+            task['_id'] = str(task['_id'])
+        return tasks, next_cursor
+    
+    @traced
     async def get_tasks_by_date_range(self, start_date: datetime, end_date: datetime, status: str = None) -> List[Dict[str, Any]]:
         """Get tasks within a date range"""
         query = {
-            "scheduled_date": {
-                "$gte": start_date.strftime("%Y-%m-%d"),
-                "$lte": end_date.strftime("%Y-%m-%d")
+            "scheduled_day": {
+                "$gte": task_dates.local_day(start_date),
+                "$lte": task_dates.local_day(end_date)
             }
         }
         
@@ -62,19 +88,25 @@ class TaskService:
         
         return await self.get_tasks(query)
     
+    @traced
     async def get_tasks_for_day(self, date: datetime, status: str = None) -> List[Dict[str, Any]]:
         """Get all tasks for a specific day"""
-        date_str = date.strftime("%Y-%m-%d")
-        query = {"scheduled_date": date_str}
+        query = {"scheduled_day": task_dates.local_day(date)}
         
         if status:
             query["status"] = status
         
         return await self.get_tasks(query)
     
+    @traced
     async def update_task(self, task_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Update a task"""
         try:
+            task_dates.normalize_task_dates(updates)
+            if 'scheduled_day' in updates:
+                # Keep the precomputed flag right for a rescheduled task until the next flagging run
+                updates['is_overdue'] = bool(updates['scheduled_day']) and \
+                    updates['scheduled_day'] < task_dates.local_day(datetime.now())
             updates['updated_at'] = datetime.now()
             
             result = await self.tasks_collection.update_one(
@@ -91,6 +123,7 @@ class TaskService:
         except:
             return None
     
+    @traced
     async def complete_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Mark a task as completed"""
         updates = {
@@ -105,6 +138,7 @@ class TaskService:
         
         return task
     
+    @traced
     async def update_quantitative_progress(self, task_id: str, amount: int, is_increment: bool = True) -> Optional[Dict[str, Any]]:
         """Update progress for quantitative tasks"""
         task = await self.get_task_by_id(task_id)
@@ -135,6 +169,7 @@ class TaskService:
         
         return await self.update_task(task_id, updates)
     
+    @traced
     async def delete_task(self, task_id: str) -> bool:
         """Delete a task"""
         try:
@@ -144,6 +179,7 @@ class TaskService:
         except:
             return False
     
+    @traced
     async def create_recurring_tasks(self, template_task: Dict[str, Any], occurrences: int = 7) -> List[Dict[str, Any]]:
         """Generate recurring task instances"""
         created_tasks = []
@@ -152,11 +188,11 @@ class TaskService:
         if recurrence == 'none':
             return []
         
-        base_date_str = template_task.get('scheduled_date')
-        if not base_date_str:
+        base_day = task_dates.scheduled_day_of(template_task)
+        if not base_day:
             return []
         
-        base_date = datetime.strptime(base_date_str, "%Y-%m-%d")
+        base_date = datetime.strptime(base_day, task_dates.DAY_FORMAT)
         
         # Determine interval
         if recurrence == 'daily':
@@ -182,17 +218,75 @@ class TaskService:
         
         return created_tasks
     
-    async def get_overdue_tasks(self) -> List[Dict[str, Any]]:
-        """Get all overdue tasks"""
-        today = datetime.now().strftime("%Y-%m-%d")
+    @traced
+    async def extend_recurring_tasks(self, horizon_days: int = 7) -> int:
+        """Create missing instances of recurring templates up to `horizon_days` ahead"""
+        horizon = (datetime.now() + timedelta(days=horizon_days)).strftime("%Y-%m-%d")
+        deltas = {'daily': timedelta(days=1), 'weekly': timedelta(weeks=1), 'monthly': timedelta(days=30)}
         
+        templates = await self.tasks_collection.find({
+            "recurrence": {"$in": list(deltas)},
+            "parent_recurrence_id": None,
+            "status": {"$ne": "cancelled"}
+        }).to_list(length=None)
+        
+        created = 0
+        for template in templates:
+            template['_id'] = str(template['_id'])
+            latest = await self.tasks_collection.find_one(
+                {"parent_recurrence_id": template['_id']},
+                sort=[("scheduled_date", -1)]
+            )
+            last_day = task_dates.scheduled_day_of(latest or template)
+            if not last_day:
+                continue
+            
+            next_date = datetime.strptime(last_day, task_dates.DAY_FORMAT) + deltas[template['recurrence']]
+            while next_date.strftime("%Y-%m-%d") <= horizon:
+                new_task = template.copy()
+                new_task['scheduled_date'] = next_date.strftime("%Y-%m-%d")
+                new_task['parent_recurrence_id'] = template['_id']
+                new_task['status'] = "pending"
+                new_task.pop('_id', None)
+                new_task.pop('completed_at', None)
+                new_task.pop('is_overdue', None)
+                await self.create_task(new_task)
+                created += 1
+                next_date += deltas[template['recurrence']]
+        
+        return created
+    
+    @traced
+    async def flag_overdue_tasks(self) -> Dict[str, int]:
+        """Precompute the `is_overdue` flag on open tasks scheduled before today"""
+        today = task_dates.local_day(datetime.now())
+        open_statuses = ["pending", "in_progress"]
+        
+        flagged = await self.tasks_collection.update_many(
+            {"scheduled_day": {"$lt": today}, "status": {"$in": open_statuses}, "is_overdue": {"$ne": True}},
+            {"$set": {"is_overdue": True}}
+        )
+        cleared = await self.tasks_collection.update_many(
+            {"is_overdue": True, "$or": [
+                {"status": {"$nin": open_statuses}},
+                {"scheduled_day": {"$gte": today}}
+            ]},
+            {"$set": {"is_overdue": False}}
+        )
+        return {"flagged": flagged.modified_count, "cleared": cleared.modified_count}
+    
+    @traced
+    async def get_overdue_tasks(self) -> List[Dict[str, Any]]:
+        """Get all overdue tasks, as flagged by the overdue_flagging job"""
+        # The status check drops tasks completed since the last flagging run
         query = {
-            "scheduled_date": {"$lt": today},
+            "is_overdue": True,
             "status": {"$in": ["pending", "in_progress"]}
         }
         
         return await self.get_tasks(query)
     
+    @traced
     async def get_task_statistics(self, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
         """Get task completion statistics for analysis"""
         tasks = await self.get_tasks_by_date_range(start_date, end_date)
@@ -0,0 +1,190 @@
+"""Lightweight request tracing: route -> service -> MongoDB -> LLM spans.
+
+A trace is started per request by `http_middleware` when exporting is enabled
+(TRACE_EXPORT=json|otlp, written to TRACE_FILE) or when the client sends an
+`X-Debug-Timing` header, in which case the response carries a per-request
+breakdown in the same header. The current trace and span travel in contextvars,
+so spans opened in gathered tasks and `asyncio.to_thread` workers nest correctly.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+DEBUG_HEADER = "X-Debug-Timing"
+
+_export_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(span)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_span_id() -> Optional[str]:
+    return _current_span.get()
+
+
+def _new_span_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any):
+    """Record a span for the enclosed block if a trace is active; otherwise a no-op."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    span_id = _new_span_id()
+    record = {
+        "name": name, "kind": kind, "span_id": span_id, "parent_id": _current_span.get(),
+        "start_ns": time.time_ns(), "end_ns": None, "status": "ok", "attributes": attributes,
+    }
+    token = _current_span.set(span_id)
+    try:
+        yield record
+    except Exception as e:
+        record["status"] = "error"
+        record["attributes"]["error"] = str(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        record["end_ns"] = time.time_ns()
+        trace.add(record)
+
+
+def add_completed_span(trace: Trace, name: str, kind: str, parent_id: Optional[str], start_ns: int,
+                       duration_ns: int, status: str = "ok", **attributes: Any):
+    """Attach a span measured elsewhere (e.g. by a MongoDB command listener)."""
+    trace.add({
+        "name": name, "kind": kind, "span_id": _new_span_id(), "parent_id": parent_id,
+        "start_ns": start_ns, "end_ns": start_ns + duration_ns, "status": status, "attributes": attributes,
+    })
+
+
+def traced(func: Callable) -> Callable:
+    """Wrap an async function in a span named after its qualified name."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with span(func.__qualname__, kind="service"):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def _duration_ms(s: Dict[str, Any]) -> float:
+    return ((s["end_ns"] or s["start_ns"]) - s["start_ns"]) / 1_000_000
+
+
+def timing_breakdown(trace: Trace, limit: int = 15) -> str:
+    """Compact per-request summary: total, then time and count per span name, largest first."""
+    root = next((s for s in trace.spans if s["parent_id"] is None), None)
+    totals: Dict[str, List[float]] = {}
+    for s in trace.spans:
+        if s is root:
+            continue
+        key = {"llm": "llm", "db": "mongo"}.get(s["kind"], s["name"].split(".")[-1])
+        entry = totals.setdefault(key, [0.0, 0])
+        entry[0] += _duration_ms(s)
+        entry[1] += 1
+    parts = [f"total={_duration_ms(root):.1f}ms"] if root else []
+    for key, (ms, count) in sorted(totals.items(), key=lambda kv: kv[1][0], reverse=True)[:limit]:
+        parts.append(f"{key}={ms:.1f}ms" + (f"/{count}" if count > 1 else ""))
+    return "; ".join(parts)
+
+
+def _to_json(trace: Trace) -> Dict[str, Any]:
+    return {
+        "trace_id": trace.trace_id,
+        "name": trace.name,
+        "spans": [{**s, "duration_ms": round(_duration_ms(s), 3)} for s in trace.spans],
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp(trace: Trace) -> Dict[str, Any]:
+    """One OTLP/JSON ExportTraceServiceRequest, as written by the collector's file exporter."""
+    kinds = {"server": 2, "db": 3, "llm": 3}
+    spans = []
+    for s in trace.spans:
+        attributes = [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()]
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": s["span_id"],
+            "parentSpanId": s["parent_id"] or "",
+            "name": s["name"],
+            "kind": kinds.get(s["kind"], 1),
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"] or s["start_ns"]),
+            "attributes": attributes,
+            "status": {"code": 2 if s["status"] == "error" else 1},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "journal-backend"}}]},
+        "scopeSpans": [{"scope": {"name": "services.tracing"}, "spans": spans}],
+    }]}
+
+
+def export(trace: Trace):
+    if TRACE_EXPORT not in ("json", "otlp"):
+        return
+    payload = _to_otlp(trace) if TRACE_EXPORT == "otlp" else _to_json(trace)
+    line = json.dumps(payload, separators=(",", ":"), default=str) + "\n"
+    with _export_lock:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+async def http_middleware(request, call_next):
+    debug = DEBUG_HEADER.lower() in request.headers
+    if not debug and TRACE_EXPORT not in ("json", "otlp"):
+        return await call_next(request)
+
+    trace = Trace(f"{request.method} {request.url.path}")
+    trace_token = _current_trace.set(trace)
+    try:
+        with span(f"{request.method} {request.url.path}", kind="server", path=request.url.path) as root:
+            response = await call_next(request)
+            route = request.scope.get("route")
+            root["name"] = f"{request.method} {getattr(route, 'path', request.url.path)}"
+            root["attributes"]["status"] = response.status_code
+    finally:
+        _current_trace.reset(trace_token)
+
+    trace.name = root["name"]
+    export(trace)
+    if debug:
+        response.headers[DEBUG_HEADER] = timing_breakdown(trace)
+        response.headers["X-Trace-Id"] = trace.trace_id
+    return response
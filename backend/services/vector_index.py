@@ -0,0 +1,752 @@
+"""Approximate nearest-neighbour search over journal embeddings (IVF, pure NumPy).
+
+Vectors are L2-normalised so that a dot product is cosine similarity. They are
+partitioned into `nlist` cells by spherical k-means. A query scans only the
+`nprobe` cells whose centroids are closest: more probes give better recall and
+slower queries. Inserts are assigned to their nearest existing centroid. Deletes
+are tombstoned and compacted away once they pile up. The index is retrained by
+the nightly job, and in the background once it has grown well past its trained
+size. Clustering runs in a worker thread; searches keep being served meanwhile.
+
+Below ANN_MIN_VECTORS the index stays untrained and answers by exact scan,
+which is already fast at that size.
+
+Searches can be filtered on date range, tags, mood and goal
+(services/search_filters): the filter is turned into a mask over the rows
+from per-row timestamps and label postings kept in the index. When the filter
+selects few rows (up to a few times what the probed lists would hold), exactly
+those rows are scored; otherwise proportionally more lists are probed with the mask applied.
+
+With ANN_QUANTIZATION=int8|binary the probed lists are scanned on compact codes
+(services/quantization) and only the best ANN_RERANK_FACTORS[format] * k
+candidates are scored on the float vectors.
+
+Each worker opens the current on-disk snapshot (services/embedding_store) as
+memory-mapped arrays, so a restart serves searches straight away and the vectors
+are shared between workers through the page cache. New entries go into a
+private in-memory tail and into the snapshot's write-ahead log. The log is
+tailed every ANN_WAL_POLL_SECONDS, so other workers' entries show up quickly.
+MongoDB is polled every ANN_SYNC_SECONDS for anything else. Without a snapshot
+(first start, or VECTOR_STORE_DIR unset) the index is loaded from MongoDB and a
+snapshot is written.
+
+The nightly rebuild runs in one worker when VECTOR_STORE_DIR is set (the others
+attach its snapshot on their next sync) and in every worker when it is not.
+"""
+import asyncio
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from database import journal_collection
+from services import embedding_store, quantization as quantization_codes, search_filters
+from services.search_filters import Metadata, SearchFilter
+from services.tracing import traced
+
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "20000"))
+ANN_SYNC_SECONDS = float(os.getenv("ANN_SYNC_SECONDS", "30"))
+ANN_WAL_POLL_SECONDS = float(os.getenv("ANN_WAL_POLL_SECONDS", "1"))
+ANN_QUANTIZATION = os.getenv("ANN_QUANTIZATION", "none")     # none | int8 | binary
+# Candidates re-ranked on floats per requested result; sign bits need a far longer shortlist.
+ANN_RERANK_FACTORS = {
+    "int8": int(os.getenv("ANN_RERANK_INT8", "4")),
+    "binary": int(os.getenv("ANN_RERANK_BINARY", "40")),
+}
+# A filter selecting up to this many times the rows of an unfiltered probe is searched exactly:
+# scoring those rows costs less than probing the many more lists needed to find k of them.
+ANN_FILTER_EXACT_FACTOR = 4
+ANN_RETRAIN_GROWTH = 4.0        # retrain once the index is this many times its trained size
+ANN_COMPACT_DEAD_FRACTION = 0.25
+KMEANS_ITERATIONS = 12
+KMEANS_SAMPLE_PER_LIST = 64
+ID_DTYPE = "S24"                 # ObjectId hex
+_CHUNK = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def default_nlist(count: int) -> int:
+    return max(1, int(4 * math.sqrt(count)))
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k largest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0,
+           batch: int = 65536) -> np.ndarray:
+    """Spherical k-means on a sample of `vectors` (already normalised); returns normalised centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), k * KMEANS_SAMPLE_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)] if sample_size < len(vectors) else vectors
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.concatenate([
+            np.argmax(sample[i:i + batch] @ centroids.T, axis=1) for i in range(0, len(sample), batch)
+        ])
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class _Rows:
+    """A per-row array in two segments: a frozen base (often memory-mapped) and a growable private tail."""
+
+    def __init__(self, row_shape: Tuple[int, ...], dtype):
+        self.row_shape = row_shape
+        self.dtype = np.dtype(dtype)
+        self.base = np.empty((0,) + row_shape, dtype=self.dtype)
+        self.tail = np.empty((0,) + row_shape, dtype=self.dtype)
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        base_count = len(self.base)
+        if len(rows) == 0 or rows.max() < base_count:
+            return self.base[rows]
+        if rows.min() >= base_count:
+            return self.tail[rows - base_count]
+        in_base = rows < base_count
+        out = np.empty((len(rows),) + self.row_shape, dtype=self.dtype)
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self.tail[rows[~in_base] - base_count]
+        return out
+
+    def chunks(self, count: int):
+        """The first `count` rows as consecutive slices, without copying a mapped base."""
+        for segment in (self.base, self.tail[:count - len(self.base)]):
+            for i in range(0, len(segment), _CHUNK):
+                yield segment[i:i + _CHUNK]
+
+    def put(self, start: int, values: np.ndarray, count: int):
+        """Write rows start..start+len(values) (all in the tail); `count` rows are currently in use."""
+        offset = start - len(self.base)
+        needed = offset + len(values)
+        if needed > len(self.tail):
+            tail = np.empty((max(needed, len(self.tail) * 2, 1024),) + self.row_shape, dtype=self.dtype)
+            used = count - len(self.base)
+            tail[:used] = self.tail[:used]
+            self.tail = tail
+        self.tail[offset:needed] = values
+
+    def reset(self, base: Optional[np.ndarray] = None, tail: Optional[np.ndarray] = None):
+        empty = np.empty((0,) + self.row_shape, dtype=self.dtype)
+        self.base = base if base is not None else empty
+        self.tail = tail if tail is not None else empty
+
+
+class IVFIndex:
+    """Inverted-file index over normalised vectors, keyed by string ids.
+
+    Rows live in two segments: a frozen base (normally the read-only, memory-mapped
+    arrays of a snapshot) followed by a private, growable tail that takes inserts.
+    With `quantization` set, lists are scanned on compact codes and only the best
+    candidates are re-ranked on the float vectors, so the floats of a mapped base
+    are mostly left on disk.
+    """
+
+    def __init__(self, dim: int, dtype=np.float32, quantization: str = "none"):
+        if quantization not in quantization_codes.CODE_FORMATS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.quantization = quantization
+        self._vectors = _Rows((dim,), self.dtype)
+        self._times = _Rows((), np.int64)
+        self._labels = search_filters.LabelPostings()
+        self._codes: Optional[_Rows] = None
+        self._scales: Optional[_Rows] = None
+        if quantization == "int8":
+            self._codes, self._scales = _Rows((dim,), np.int8), _Rows((), np.float32)
+        elif quantization == "binary":
+            self._codes = _Rows(((dim + 7) // 8,), np.uint8)
+        self._base_ids = np.empty(0, dtype=ID_DTYPE)
+        self._base_sorted = self._base_ids
+        self._base_order = np.empty(0, dtype=np.int64)
+        self._tail_ids: List[str] = []
+        self._tail_rows: Dict[str, int] = {}
+        self.count = 0                        # rows in use across both segments
+        self.alive = np.empty(0, dtype=bool)
+        self.assign = np.empty(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._cell_base: List[np.ndarray] = []          # rows of each list as of the last training
+        self._cell_extra: List[List[int]] = []          # rows assigned since
+        self._cell_cache: List[Optional[np.ndarray]] = []
+        self._dead = 0
+        self._version = 0                     # bumped when rows are renumbered
+
+    def __len__(self) -> int:
+        return self.count - self._dead
+
+    def __contains__(self, item_id: str) -> bool:
+        return self._row(item_id) is not None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def base_count(self) -> int:
+        return len(self._vectors.base)
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Bytes per part for the live rows: floats, and the codes scanned instead when quantized."""
+        rows = len(self)
+        code_bytes = 0
+        if self._codes is not None:
+            code_bytes = rows * int(np.prod(self._codes.row_shape)) * self._codes.dtype.itemsize
+        if self._scales is not None:
+            code_bytes += rows * self._scales.dtype.itemsize
+        return {"vectors": rows * self.dim * self.dtype.itemsize, "codes": code_bytes}
+
+    def _row(self, item_id: str) -> Optional[int]:
+        row = self._tail_rows.get(item_id)
+        if row is not None:
+            return row
+        if not len(self._base_sorted):
+            return None
+        key = item_id.encode()
+        i = int(np.searchsorted(self._base_sorted, key))
+        if i < len(self._base_sorted) and self._base_sorted[i] == key:
+            row = int(self._base_order[i])
+            return row if self.alive[row] else None
+        return None
+
+    def _id(self, row: int) -> str:
+        if row < self.base_count:
+            return self._base_ids[row].decode()
+        return self._tail_ids[row - self.base_count]
+
+    def _gather(self, rows: np.ndarray) -> np.ndarray:
+        return self._vectors.gather(rows)
+
+    def _grow(self, needed: int):
+        if needed > len(self.alive):
+            capacity = max(needed, len(self.alive) * 2, 1024)
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:self.count] = self.alive[:self.count]
+            assign = np.full(capacity, -1, dtype=np.int32)
+            assign[:self.count] = self.assign[:self.count]
+            self.alive, self.assign = alive, assign
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        if self.quantization == "int8":
+            return quantization_codes.int8_encode(vectors)
+        return quantization_codes.binary_encode(vectors), None
+
+    def _put_codes(self, start: int, vectors: np.ndarray):
+        if self._codes is None:
+            return
+        codes, scales = self._encode(vectors)
+        self._codes.put(start, codes, self.count)
+        if self._scales is not None:
+            self._scales.put(start, scales, self.count)
+
+    def add(self, ids: Sequence[str], vectors: Iterable[Sequence[float]],
+            metadata: Optional[Sequence[Optional[Metadata]]] = None):
+        vectors = normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        for item_id in ids:
+            self.remove(item_id)
+        start = self.count
+        self._grow(start + len(ids))
+        self._vectors.put(start, vectors, self.count)
+        self._put_codes(start, vectors)
+        metadata = metadata or [None] * len(ids)
+        times = [meta[0] if meta else search_filters.NO_TIME for meta in metadata]
+        self._times.put(start, np.asarray(times, dtype=np.int64), self.count)
+        for i, meta in enumerate(metadata):
+            if meta:
+                self._labels.add(start + i, meta[1])
+        self.alive[start:start + len(ids)] = True
+        for i, item_id in enumerate(ids):
+            self._tail_rows[item_id] = start + i
+        self._tail_ids.extend(ids)
+        self.count += len(ids)
+        if self.trained:
+            cells = self._assign(vectors)
+            self.assign[start:self.count] = cells
+            for i, cell in enumerate(cells):
+                self._cell_extra[cell].append(start + i)
+                self._cell_cache[cell] = None
+
+    def remove(self, item_id: str) -> bool:
+        row = self._row(item_id)
+        if row is None:
+            return False
+        self._tail_rows.pop(item_id, None)
+        self.alive[row] = False
+        self._dead += 1
+        if self._dead > ANN_COMPACT_DEAD_FRACTION * max(self.count, 1):
+            self.compact()
+        return True
+
+    def set_metadata(self, item_id: str, metadata: Metadata):
+        """Attach filter metadata to a row added without it (WAL replay: the M record follows the A record)."""
+        row = self._row(item_id)
+        if row is None or row < self.base_count or self._times.gather(np.array([row]))[0] != search_filters.NO_TIME:
+            return
+        self._times.put(row, np.array([metadata[0]], dtype=np.int64), self.count)
+        self._labels.add(row, metadata[1])
+
+    def _renumbering(self, keep: np.ndarray) -> np.ndarray:
+        mapping = np.full(self.count, -1, dtype=np.int64)
+        mapping[keep] = np.arange(len(keep))
+        return mapping
+
+    def compact(self):
+        """Drop tombstoned rows and renumber the rest into a private tail."""
+        keep = np.flatnonzero(self.alive[:self.count])
+        ids = [self._id(row) for row in keep]
+        for rows in (self._vectors, self._times, self._codes, self._scales):
+            if rows is not None:
+                rows.reset(tail=rows.gather(keep))
+        self._labels = self._labels.renumbered(self._renumbering(keep))
+        self._tail_ids = ids
+        self._tail_rows = {item_id: row for row, item_id in enumerate(ids)}
+        self._base_ids = self._base_sorted = np.empty(0, dtype=ID_DTYPE)
+        self._base_order = np.empty(0, dtype=np.int64)
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.assign = self.assign[keep].copy()
+        self.count = len(keep)
+        self._dead = 0
+        self._version += 1
+        if self.trained:
+            self._rebuild_cells()
+
+    def _set_cells(self, order: np.ndarray, bounds: np.ndarray):
+        nlist = len(self.centroids)
+        self._cell_base = [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+        self._cell_extra = [[] for _ in range(nlist)]
+        self._cell_cache = [None] * nlist
+
+    def _rebuild_cells(self):
+        assign = self.assign[:self.count]
+        order = np.argsort(assign, kind="stable")
+        self._set_cells(order, np.searchsorted(assign[order], np.arange(len(self.centroids) + 1)))
+
+    def fit(self, nlist: Optional[int] = None, seed: int = 0) -> Optional[Tuple[np.ndarray, np.ndarray, int, int]]:
+        """Cluster the current rows. Safe to run in a worker thread while the loop keeps adding."""
+        count, version = self.count, self._version
+        if count == 0:
+            return None
+        nlist = min(nlist or default_nlist(len(self)), count)
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, nlist * KMEANS_SAMPLE_PER_LIST)
+        sample_rows = np.sort(rng.choice(count, sample_size, replace=False))
+        centroids = kmeans(self._gather(sample_rows).astype(np.float32), nlist, seed=seed)
+        assign = np.concatenate([
+            np.argmax(chunk @ centroids.T, axis=1) for chunk in self._vectors.chunks(count)
+        ]).astype(np.int32)
+        return centroids, assign, count, version
+
+    def install(self, fitted: Optional[Tuple[np.ndarray, np.ndarray, int, int]]) -> bool:
+        """Switch to centroids from fit(); rows added since are assigned here. False if rows were renumbered."""
+        if fitted is None:
+            return False
+        centroids, assign, count, version = fitted
+        if version != self._version:
+            return False
+        self.centroids = centroids
+        self.assign[:count] = assign
+        if self.count > count:
+            self.assign[count:self.count] = self._assign(self._gather(np.arange(count, self.count)))
+        self.trained_size = len(self)
+        self._rebuild_cells()
+        return True
+
+    def train(self, nlist: Optional[int] = None, seed: int = 0):
+        if self._dead:
+            self.compact()
+        self.install(self.fit(nlist, seed))
+
+    def needs_training(self) -> bool:
+        if len(self) < ANN_MIN_VECTORS:
+            return False
+        return not self.trained or len(self) > ANN_RETRAIN_GROWTH * self.trained_size
+
+    def _cell_rows(self, cell: int) -> np.ndarray:
+        rows = self._cell_cache[cell]
+        if rows is None:
+            extra = self._cell_extra[cell]
+            rows = self._cell_base[cell]
+            if extra:
+                rows = np.concatenate([rows, np.asarray(extra, dtype=np.int64)])
+            self._cell_cache[cell] = rows
+        return rows
+
+    def _approx_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self.quantization == "int8":
+            return quantization_codes.int8_scores(self._codes.gather(rows), self._scales.gather(rows), query)
+        return quantization_codes.binary_scores(self._codes.gather(rows), query)
+
+    def _rank(self, rows: np.ndarray, query: np.ndarray, k: int, rerank: Optional[int] = None) -> List[Tuple[str, float]]:
+        if len(rows) == 0:
+            return []
+        rows = rows[self.alive[rows]]
+        if self.quantization != "none":
+            shortlist = max(k, k * (rerank or ANN_RERANK_FACTORS[self.quantization]))
+            if len(rows) > shortlist:
+                rows = rows[_top_k(self._approx_scores(rows, query), shortlist)]
+        scores = self._gather(rows) @ query
+        best = _top_k(scores, k)
+        return [(self._id(int(rows[i])), float(scores[i])) for i in best]
+
+    def search_exact(self, query: Sequence[float], k: int) -> List[Tuple[str, float]]:
+        query = normalize(np.asarray(query, dtype=np.float32))
+        scores = np.concatenate([np.empty(0, dtype=np.float32)] + [
+            chunk @ query for chunk in self._vectors.chunks(self.count)
+        ])
+        scores[~self.alive[:self.count]] = -np.inf
+        best = _top_k(scores, min(k, len(self)))
+        return [(self._id(int(row)), float(scores[row])) for row in best]
+
+    def filter_mask(self, filters: SearchFilter) -> np.ndarray:
+        """Pre-filter bitmap: True for live rows whose metadata matches `filters`."""
+        mask = filters.mask(self.count, self._times.chunks(self.count), self._labels)
+        return mask & self.alive[:self.count]
+
+    def search(self, query: Sequence[float], k: int, nprobe: Optional[int] = None,
+               rerank: Optional[int] = None, filters: Optional[SearchFilter] = None) -> List[Tuple[str, float]]:
+        if filters:
+            return self.search_filtered(query, k, self.filter_mask(filters), nprobe, rerank)
+        if not self.trained:
+            return self.search_exact(query, k)
+        query = normalize(np.asarray(query, dtype=np.float32))
+        nprobe = min(nprobe or ANN_NPROBE, len(self.centroids))
+        cells = _top_k(self.centroids @ query, nprobe)
+        rows = np.concatenate([self._cell_rows(c) for c in cells])
+        return self._rank(rows, query, k, rerank)
+
+    def search_filtered(self, query: Sequence[float], k: int, allowed: np.ndarray, nprobe: Optional[int] = None,
+                        rerank: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Search only the rows set in `allowed`.
+
+        A selective filter (up to ANN_FILTER_EXACT_FACTOR times the rows the
+        probed lists would hold) scores exactly those rows, which is fast and
+        exact. A broad one probes more lists, in proportion to the share of rows
+        it removes, so that about as many candidates are scored as in an
+        unfiltered search. It falls back to the selected rows if the lists hold
+        fewer than k of them.
+        """
+        query = normalize(np.asarray(query, dtype=np.float32))
+        rows = np.flatnonzero(allowed)
+        if self.trained and len(rows):
+            nlist = len(self.centroids)
+            nprobe = min(nprobe or ANN_NPROBE, nlist)
+            if len(rows) > ANN_FILTER_EXACT_FACTOR * len(self) * nprobe / nlist:
+                nprobe = min(nlist, math.ceil(nprobe * len(self) / len(rows)))
+                cells = _top_k(self.centroids @ query, nprobe)
+                probed = np.concatenate([self._cell_rows(c) for c in cells])
+                probed = probed[allowed[probed]]
+                if len(probed) >= k:
+                    rows = probed
+        return self._rank(rows, query, k, rerank)
+
+    def export(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Arrays and metadata for embedding_store.write_snapshot (live rows only)."""
+        count = self.count
+        rows = np.flatnonzero(self.alive[:count])
+        in_base = rows[rows < self.base_count]
+        in_tail = rows[rows >= self.base_count] - self.base_count
+        ids = np.concatenate([
+            np.asarray(self._base_ids[in_base], dtype=ID_DTYPE),
+            np.array([self._tail_ids[i] for i in in_tail], dtype=ID_DTYPE),
+        ])
+        order = np.argsort(ids, kind="stable")
+        arrays = {"vectors": self._gather(rows), "ids": ids, "ids_sorted": ids[order], "ids_order": order,
+                  "timestamps": self._times.gather(rows)}
+        arrays.update(self._labels.export(self._renumbering(rows)))
+        if self._codes is not None:
+            arrays["codes"] = self._codes.gather(rows)
+        if self._scales is not None:
+            arrays["scales"] = self._scales.gather(rows)
+        meta: Dict[str, Any] = {"dim": self.dim, "dtype": self.dtype.name, "rows": len(rows),
+                                "quantization": self.quantization,
+                                "trained_size": self.trained_size if self.trained else 0}
+        if self.trained:
+            assign = self.assign[rows]
+            cell_order = np.argsort(assign, kind="stable")
+            arrays.update(centroids=self.centroids, assign=assign, cell_order=cell_order,
+                          cell_bounds=np.searchsorted(assign[cell_order], np.arange(len(self.centroids) + 1)))
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any],
+                    quantization: Optional[str] = None) -> "IVFIndex":
+        """Index over snapshot arrays; vectors, codes and ids are used in place (no copy).
+
+        Codes are computed here if the snapshot was written with another `quantization`.
+        """
+        quantization = quantization or meta.get("quantization", "none")
+        index = cls(meta["dim"], meta["dtype"], quantization)
+        index._vectors.reset(base=arrays["vectors"])
+        index._base_ids = arrays["ids"]
+        index._base_sorted = arrays["ids_sorted"]
+        index._base_order = arrays["ids_order"]
+        index.count = len(index._vectors.base)
+        index.alive = np.ones(index.count, dtype=bool)
+        if "timestamps" in arrays:
+            index._times.reset(base=arrays["timestamps"])
+        else:
+            index._times.reset(tail=np.full(index.count, search_filters.NO_TIME, dtype=np.int64))
+        index._labels = search_filters.LabelPostings.from_arrays(arrays)
+        if quantization != "none":
+            if meta.get("quantization") == quantization:
+                index._codes.reset(base=arrays["codes"])
+                if index._scales is not None:
+                    index._scales.reset(base=arrays["scales"])
+            elif index.count:
+                encoded = [index._encode(np.asarray(chunk, dtype=np.float32))
+                           for chunk in index._vectors.chunks(index.count)]
+                index._codes.reset(tail=np.concatenate([codes for codes, _ in encoded]))
+                if index._scales is not None:
+                    index._scales.reset(tail=np.concatenate([scales for _, scales in encoded]))
+        if "centroids" in arrays:
+            index.centroids = np.array(arrays["centroids"])
+            index.assign = np.array(arrays["assign"], dtype=np.int32)
+            index.trained_size = meta.get("trained_size") or index.count
+            index._set_cells(arrays["cell_order"], arrays["cell_bounds"])
+        else:
+            index.assign = np.full(index.count, -1, dtype=np.int32)
+        return index
+
+
+# --- process-wide index over journal_entries.embedding_vector ------------------
+
+_index: Optional[IVFIndex] = None
+_lock = asyncio.Lock()
+_training: Optional[asyncio.Task] = None
+_last_sync = 0.0
+_last_wal_poll = 0.0
+_synced_until: Optional[datetime] = None
+_snapshot: Optional[str] = None
+_wal: Optional[embedding_store.WriteAheadLog] = None
+_wal_offset = 0
+_SYNC_OVERLAP = timedelta(minutes=1)   # ObjectIds from other workers may be slightly out of order
+
+
+Loaded = Tuple[List[str], List[np.ndarray], List[Metadata]]
+
+
+async def _load(query: dict) -> Loaded:
+    ids, vectors, metadata = [], [], []
+    cursor = journal_collection.find(
+        {**query, **quantization_codes.HAS_EMBEDDING},
+        {**quantization_codes.EMBEDDING_FIELDS, **search_filters.METADATA_FIELDS},
+    ).batch_size(5000)
+    async for doc in cursor:
+        vec = quantization_codes.decode_stored(doc)
+        if vec is not None and len(vec):
+            ids.append(str(doc["_id"]))
+            vectors.append(vec)
+            metadata.append(search_filters.entry_metadata(doc))
+    return ids, vectors, metadata
+
+
+def _add_loaded(index: Optional[IVFIndex], loaded: Loaded) -> Optional[IVFIndex]:
+    ids, vectors, metadata = loaded
+    if not ids:
+        return index
+    if index is None:
+        index = IVFIndex(len(vectors[0]), embedding_store.VECTOR_STORE_DTYPE, ANN_QUANTIZATION)
+    keep = [i for i, v in enumerate(vectors) if len(v) == index.dim]
+    if keep:
+        index.add([ids[i] for i in keep], [vectors[i] for i in keep], [metadata[i] for i in keep])
+    return index
+
+
+def _write_snapshot(index: IVFIndex, synced_until: datetime) -> str:
+    arrays, meta = index.export()
+    meta["synced_until"] = synced_until.isoformat()
+    return embedding_store.write_snapshot(arrays, meta)
+
+
+async def _persist(index: IVFIndex, synced_until: datetime) -> Optional[str]:
+    """Write `index` as the current snapshot in a worker thread; None if the store is off or failed."""
+    if not embedding_store.enabled():
+        return None
+    started = time.perf_counter()
+    try:
+        name = await asyncio.to_thread(_write_snapshot, index, synced_until)
+    except Exception as e:
+        print(f"Error writing vector index snapshot: {e}")
+        return None
+    print(f"Vector index snapshot {name}: {len(index)} vectors in {time.perf_counter() - started:.1f}s")
+    return name
+
+
+async def _attach(name: str) -> bool:
+    """Serve from the memory-mapped snapshot `name`; entries since it was written come from its WAL and MongoDB.
+
+    False (and nothing changes) if the snapshot predates search filters and has no per-row metadata.
+    """
+    global _index, _snapshot, _synced_until, _wal, _wal_offset
+    arrays, meta = await asyncio.to_thread(embedding_store.open_snapshot, name)
+    if "timestamps" not in arrays:
+        print(f"Vector index snapshot {name} has no filter metadata; reloading from MongoDB")
+        return False
+    _index = await asyncio.to_thread(IVFIndex.from_arrays, arrays, meta, ANN_QUANTIZATION)
+    _snapshot = name
+    _synced_until = datetime.fromisoformat(meta["synced_until"])
+    _wal, _wal_offset = embedding_store.WriteAheadLog(embedding_store.wal_path(name), _index.dim), 0
+    _replay_wal()
+    await _catch_up()
+    return True
+
+
+def _replay_wal():
+    global _wal_offset, _last_wal_poll
+    _last_wal_poll = time.monotonic()
+    if _wal is None or _index is None:
+        return
+    records, _wal_offset = _wal.read_from(_wal_offset)
+    for op, entry_id, value in records:
+        if op == "A" and entry_id not in _index:
+            _index.add([entry_id], [value])
+        elif op == "M":
+            _index.set_metadata(entry_id, (value["t"], value["l"]))
+        elif op == "D":
+            _index.remove(entry_id)
+
+
+async def _catch_up():
+    """Add entries written to MongoDB since the last sync that this worker has not seen."""
+    global _synced_until, _last_sync
+    started = datetime.utcnow()
+    since = ObjectId.from_datetime(_synced_until - _SYNC_OVERLAP)
+    ids, vectors, metadata = await _load({"_id": {"$gte": since}})
+    fresh = [i for i, item_id in enumerate(ids) if item_id not in _index]
+    _add_loaded(_index, ([ids[i] for i in fresh], [vectors[i] for i in fresh], [metadata[i] for i in fresh]))
+    _synced_until = started
+    _last_sync = time.monotonic()
+
+
+async def _train(index: IVFIndex):
+    """Cluster in a worker thread, then switch over on the loop; searches keep running meanwhile."""
+    started = time.perf_counter()
+    fitted = await asyncio.to_thread(index.fit)
+    if not index.install(fitted):
+        return
+    print(f"Vector index trained: {len(index)} vectors, {len(index.centroids)} lists "
+          f"in {time.perf_counter() - started:.1f}s")
+    if _index is not index:
+        return
+    name = await _persist(index, _synced_until)
+    if name is not None:
+        async with _lock:
+            if _index is index:
+                await _attach(name)
+
+
+def _schedule_training(index: IVFIndex):
+    global _training
+    if index.needs_training() and (_training is None or _training.done()):
+        _training = asyncio.create_task(_train(index))
+
+
+async def _sync():
+    global _index, _synced_until, _last_sync
+    if embedding_store.enabled():
+        name = await asyncio.to_thread(embedding_store.current_name)
+        # First start, or another worker wrote a newer snapshot. One without filter metadata is rebuilt.
+        if name is not None and name != _snapshot and not await _attach(name):
+            _index = None
+    if _index is None:
+        started = datetime.utcnow()
+        loaded = await _load({})
+        _index = await asyncio.to_thread(_add_loaded, None, loaded)
+        _synced_until, _last_sync = started, time.monotonic()
+        if _index is not None:
+            name = await _persist(_index, started)
+            if name is not None:
+                await _attach(name)
+    elif time.monotonic() - _last_sync > ANN_SYNC_SECONDS:
+        await _catch_up()
+    if _index is not None:
+        _schedule_training(_index)
+
+
+async def get_index() -> Optional[IVFIndex]:
+    if _index is None or time.monotonic() - _last_sync > ANN_SYNC_SECONDS:
+        async with _lock:
+            if _index is None or time.monotonic() - _last_sync > ANN_SYNC_SECONDS:
+                await _sync()
+    elif time.monotonic() - _last_wal_poll > ANN_WAL_POLL_SECONDS:
+        _replay_wal()
+    return _index
+
+
+def add_entry(entry_id: str, vector: Sequence[float], doc: Optional[Dict[str, Any]] = None):
+    """Make a just-written entry searchable here at once, and in other workers at their next WAL poll.
+
+    `doc` is the saved entry, whose timestamp, tags, mood and goals are kept for search filters.
+    """
+    if _index is None or vector is None or len(vector) != _index.dim:
+        return
+    metadata = search_filters.entry_metadata(doc or {})
+    _index.add([entry_id], [vector], [metadata])
+    if _wal is not None:
+        try:
+            _wal.append(entry_id, vector, {"t": metadata[0], "l": metadata[1]})
+        except OSError as e:
+            print(f"Error appending to vector WAL: {e}")
+
+
+def remove_entry(entry_id: str):
+    if _index is None:
+        return
+    _index.remove(entry_id)
+    if _wal is not None:
+        try:
+            _wal.append_delete(entry_id)
+        except OSError as e:
+            print(f"Error appending to vector WAL: {e}")
+
+
+@traced
+async def search(query_embedding: Sequence[float], k: int = 5, nprobe: Optional[int] = None,
+                 filters: Optional[SearchFilter] = None) -> List[Tuple[str, float]]:
+    """Top-k (entry id, cosine similarity). Runs on the loop: a probe scans a few thousand rows."""
+    index = await get_index()
+    if index is None or len(index) == 0 or len(query_embedding) != index.dim:
+        return []
+    return index.search(query_embedding, k, nprobe, filters=filters)
+
+
+async def rebuild() -> Dict[str, int]:
+    """Reload every vector, retrain and write a fresh snapshot off to the side, then swap (nightly job)."""
+    global _index, _last_sync, _synced_until
+    started = datetime.utcnow()
+    loaded = await _load({})
+    index = await asyncio.to_thread(_add_loaded, None, loaded)
+    if index is not None and len(index) >= ANN_MIN_VECTORS:
+        await asyncio.to_thread(index.train)
+    name = await _persist(index, started) if index is not None else None
+    async with _lock:
+        if name is not None:
+            await _attach(name)
+        else:
+            _index, _synced_until, _last_sync = index, started, time.monotonic()
+    return {"vectors": len(index) if index else 0, "lists": len(index.centroids) if index and index.trained else 0}
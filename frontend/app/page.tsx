@@ -18,6 +18,8 @@ import GoalsPanel from '@/components/GoalsPanel';
 export default function Home() {
   const [entries, setEntries] = useState<any[]>([]);
   const [tasks, setTasks] = useState<any[]>([]);
+  const [tasksCursor, setTasksCursor] = useState<string | null>(null);
+  const [loadingMoreTasks, setLoadingMoreTasks] = useState(false);
   const [activeTab, setActiveTab] = useState<'tasks' | 'summary' | 'insights' | 'journal' | 'ask' | 'timeline' | 'goals'>('tasks');
   const [timeline, setTimeline] = useState<Record<string, any[]>>({});
   const [story, setStory] = useState<string | null>(null);
@@ -38,15 +40,50 @@ export default function Home() {
       const response = await axios.get('http://localhost:8000/api/tasks?limit=100');
       if (response.data.success) {
         setTasks(response.data.tasks);
+        setTasksCursor(response.data.next_cursor);
       }
     } catch (error) {
       console.error("Failed to fetch tasks", error);
     }
   };
 
+  const loadMoreTasks = async () => {
+    if (!tasksCursor) return;
+    setLoadingMoreTasks(true);
+    try {
+      const response = await axios.get('http://localhost:8000/api/tasks', {
+        params: { limit: 100, cursor: tasksCursor }
+      });
+      if (response.data.success) {
+        setTasks((prev) => [...prev, ...response.data.tasks]);
+        setTasksCursor(response.data.next_cursor);
+      }
+    } catch (error) {
+      console.error("Failed to load more tasks", error);
+    } finally {
+      setLoadingMoreTasks(false);
+    }
+  };
+
+  // Initial load: entries and tasks in one round trip. Summary and insights
+  // may call Gemini, so their tabs fetch them when opened.
+  const fetchDashboard = async () => {
+    try {
+      const { data } = await axios.get('http://localhost:8000/api/dashboard');
+      if (Array.isArray(data.journal)) setEntries(data.journal);
+      if (data.tasks && !data.tasks.error) {
+        setTasks(data.tasks.tasks);
+        setTasksCursor(data.tasks.next_cursor);
+      }
+    } catch (error) {
+      console.error("Failed to fetch dashboard", error);
+      fetchEntries();
+      fetchTasks();
+    }
+  };
+
   useEffect(() => {
-    fetchEntries();
-    fetchTasks();
+    fetchDashboard();
   }, []);
 
   useEffect(() => {
@@ -149,7 +186,13 @@ export default function Home() {
             <div className="space-y-6">
               <TaskInput onTasksCreated={fetchTasks} />
               <TaskCompletion onTaskUpdate={fetchTasks} />
-              <TaskList tasks={tasks} onTaskUpdate={fetchTasks} />
+              <TaskList
+                tasks={tasks}
+                onTaskUpdate={fetchTasks}
+                hasMore={tasksCursor !== null}
+                loadingMore={loadingMoreTasks}
+                onLoadMore={loadMoreTasks}
+              />
             </div>
           ) : activeTab === 'summary' ? (
             <DailySummary />
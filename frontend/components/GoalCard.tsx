@@ -10,6 +10,8 @@ interface Goal {
   status?: string;
   target_date?: string;
   progress?: { date?: string; note?: string; amount?: number }[];
+  recent_progress?: { date?: string; note?: string; amount?: number }[];
+  progress_count?: number;
 }
 
 export default function GoalCard({ goal, onUpdated }: { goal: Goal; onUpdated?: (g: any) => void }) {
@@ -24,6 +26,7 @@ export default function GoalCard({ goal, onUpdated }: { goal: Goal; onUpdated?:
   };
 
   const isCompleted = (goal.status || '').toLowerCase() === 'completed';
+  const recentProgress = goal.recent_progress ?? goal.progress ?? [];
 
   return (
     <div className="bg-white p-4 rounded-lg shadow-sm border border-gray-100">
@@ -38,11 +41,13 @@ export default function GoalCard({ goal, onUpdated }: { goal: Goal; onUpdated?:
         </div>
       </div>
 
-      {goal.progress && goal.progress.length > 0 && (
+      {recentProgress.length > 0 && (
         <div className="mt-3 text-sm text-gray-700">
-          <div className="font-medium text-gray-600">Progress</div>
+          <div className="font-medium text-gray-600">
+            Progress{goal.progress_count ? ` (${goal.progress_count} updates)` : ''}
+          </div>
           <ul className="list-disc list-inside">
-            {goal.progress.map((p, i) => (
+            {recentProgress.map((p, i) => (
               <li key={i}>{p.note || p.amount || 'Update'} — {p.date ? new Date(p.date).toLocaleDateString() : ''}</li>
             ))}
           </ul>
@@ -8,16 +8,33 @@ import FutureYouCard from './FutureYouCard';
 
 export default function GoalsPanel() {
   const [goals, setGoals] = useState<any[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const fetchGoals = async () => {
     try {
       const res = await axios.get('http://localhost:8000/api/goals');
-      setGoals(res.data);
+      setGoals(res.data.goals);
+      setCursor(res.data.next_cursor);
     } catch (err) {
       console.error('Failed to fetch goals', err);
     }
   };
 
+  const loadMoreGoals = async () => {
+    if (!cursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await axios.get('http://localhost:8000/api/goals', { params: { cursor } });
+      setGoals((prev) => [...prev, ...res.data.goals]);
+      setCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error('Failed to load more goals', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => { fetchGoals(); }, []);
 
   const handleAdded = (g: any) => {
@@ -41,6 +58,17 @@ export default function GoalsPanel() {
               goals.map((g) => <GoalCard key={g._id || g.title} goal={g} onUpdated={handleUpdated} />)
             )}
           </div>
+          {cursor && (
+            <div className="mt-4 text-center">
+              <button
+                onClick={loadMoreGoals}
+                disabled={loadingMore}
+                className="px-4 py-2 rounded-lg text-sm font-medium bg-gray-100 text-gray-700 hover:bg-gray-200 disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more goals'}
+              </button>
+            </div>
+          )}
         </div>
 
         <div className="md:col-span-1">
@@ -9,6 +9,7 @@ interface Task {
     name: string;
     description?: string;
     scheduled_date: string;
+    scheduled_day?: string;
     scheduled_time?: string;
     priority: 'low' | 'medium' | 'high' | 'urgent';
     status: 'pending' | 'in_progress' | 'completed' | 'cancelled';
@@ -24,9 +25,12 @@ interface Task {
 interface TaskListProps {
     tasks: Task[];
     onTaskUpdate?: () => void;
+    hasMore?: boolean;
+    loadingMore?: boolean;
+    onLoadMore?: () => void;
 }
 
-export default function TaskList({ tasks, onTaskUpdate }: TaskListProps) {
+export default function TaskList({ tasks, onTaskUpdate, hasMore, loadingMore, onLoadMore }: TaskListProps) {
     const [expandedTask, setExpandedTask] = useState<string | null>(null);
     const [filter, setFilter] = useState<'all' | 'pending' | 'completed'>('all');
     const [priorityFilter, setPriorityFilter] = useState<string>('all');
@@ -88,7 +92,7 @@ export default function TaskList({ tasks, onTaskUpdate }: TaskListProps) {
 
     // Group tasks by date
     const groupedTasks = filteredTasks.reduce((groups, task) => {
-        const date = task.scheduled_date;
+        const date = task.scheduled_day || '';
         if (!groups[date]) {
             groups[date] = [];
         }
@@ -97,7 +101,8 @@ export default function TaskList({ tasks, onTaskUpdate }: TaskListProps) {
     }, {} as Record<string, Task[]>);
 
     const formatDate = (dateStr: string) => {
-        const date = new Date(dateStr);
+        // Day keys are local calendar days; parse them as local midnight, not UTC
+        const date = new Date(`${dateStr}T00:00:00`);
         const today = new Date();
         const tomorrow = new Date(today);
         tomorrow.setDate(tomorrow.getDate() + 1);
@@ -297,6 +302,19 @@ export default function TaskList({ tasks, onTaskUpdate }: TaskListProps) {
                         ))
                 )}
             </div>
+
+            {/* Load More */}
+            {hasMore && onLoadMore && (
+                <div className="mt-6 text-center">
+                    <button
+                        onClick={onLoadMore}
+                        disabled={loadingMore}
+                        className="px-4 py-2 rounded-lg text-sm font-medium bg-gray-100 text-gray-700 hover:bg-gray-200 disabled:opacity-50"
+                    >
+                        {loadingMore ? 'Loading...' : 'Load more tasks'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 }